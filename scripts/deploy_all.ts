@@ -5,6 +5,8 @@ import path from "path";
 async function main() {
   console.log("🚀 FDS 종합 연구 환경 구축 시작...\n");
   const [deployer, watchtower] = await ethers.getSigners();
+  // 인덱서가 이 블록부터 Transfer 로그를 읽음 (포크 노드에서 배포 블록을 원격 RPC로 탐색하지 않도록)
+  const deployBlock = (await ethers.provider.getBlockNumber()) + 1;
 
   // 1. FDS Stablecoin 배포
   console.log("🪙 FDS Stablecoin 배포 중...");
@@ -63,7 +65,8 @@ async function main() {
     USDT: usdtAddr,
     Vault: vaultAddr,
     Oracle: oracleAddr,
-    DEX: dexAddr
+    DEX: dexAddr,
+    DeployBlock: deployBlock
   };
 
   const watchtowerDir = path.join(__dirname, "../watchtower");
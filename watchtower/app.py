@@ -1,7 +1,10 @@
 import streamlit as st
+import json
 import time
 import pandas as pd
-from lib.utils import load_contracts, get_web3, send_defense_tx
+from lib.amm import DumpImpactModel
+from lib.utils import load_contracts, get_web3, fetch_snapshot, wait_for_next_block, get_state_store
+from lib.daemon import evaluate_snapshot, DEPEG_THRESHOLD
 
 # --------------------------------------------------------------------------
 # Page Config & Title
@@ -25,17 +28,34 @@ if not contracts:
 
 w3 = get_web3()
 fds = contracts["FDS"]
-vault = contracts["Vault"]
-oracle = contracts["Oracle"]
-dex = contracts["DEX"]
+
+# 탐지/방어는 watchtowerd가 담당하고, 페이지는 공유 저장소를 읽기만 한다
+store = get_state_store()
+daemon = store.status() if store else {"online": False}
+
+# 대시보드에 필요한 모든 값을 한 블록 기준으로 한 번에 조회
+# (daemon이 최신 블록을 이미 기록했으면 그 스냅샷 사용)
+snap = store.latest_snapshot() if daemon["online"] else None
+if snap is None or snap.block_number != w3.eth.block_number:
+    snap = fetch_snapshot(contracts)
 
 # --------------------------------------------------------------------------
 # Sidebar & Status
 # --------------------------------------------------------------------------
 st.sidebar.header("System Control")
-auto_defense = st.sidebar.toggle("Auto Defense Mode", value=True)
+if daemon["online"]:
+    st.sidebar.success(f"🛰️ watchtowerd online (pid {daemon['pid']}, {daemon['feed']})")
+    auto_defense = st.sidebar.toggle("Auto Defense Mode", value=daemon["auto_defense"])
+    if auto_defense != daemon["auto_defense"]:
+        # daemon이 다음 heartbeat에서 반영
+        store.send_command("auto_defense", auto_defense)
+        st.toast(f"Auto Defense {'ON' if auto_defense else 'OFF'} 요청", icon="🛰️")
+else:
+    st.sidebar.error("🛰️ watchtowerd offline")
+    st.sidebar.caption("탐지/자동 방어가 동작하지 않습니다. `python watchtower/watchtowerd.py` 로 실행하세요.")
+live_monitor = st.sidebar.toggle("Live Monitor (New Blocks)", value=False, help="새 블록이 도착할 때마다 상태를 다시 읽고 이상 징후를 평가합니다.")
 
-is_paused = fds.functions.paused().call()
+is_paused = snap.paused
 status_color = "🔴 PAUSED" if is_paused else "🟢 NORMAL"
 st.sidebar.metric("System Status", status_color)
 
@@ -56,33 +76,30 @@ if st.sidebar.button("Resume Service (Unpause)"):
 col1, col2, col3, col4 = st.columns(4)
 
 # 1. Total Supply
-supply = float(w3.from_wei(fds.functions.totalSupply().call(), 'ether'))
+supply = float(w3.from_wei(snap.total_supply, 'ether'))
 col1.metric("FDS Total Supply", f"{supply:,.0f}")
 
 # 2. Vault Balance
-vault_bal = float(w3.from_wei(contracts["USDT"].functions.balanceOf(contracts["ADDRS"]["Vault"]).call(), 'ether'))
+vault_bal = float(w3.from_wei(snap.vault_usdt, 'ether'))
 col2.metric("Vault Reserves (USDT)", f"${vault_bal:,.0f}")
 
 # 2-B. DEX Pool Status (New User Request)
-pool_fds = float(w3.from_wei(dex.functions.reserveFDS().call(), 'ether'))
-pool_usdt = float(w3.from_wei(dex.functions.reserveUSDT().call(), 'ether'))
+pool_fds = float(w3.from_wei(snap.reserve_fds, 'ether'))
+pool_usdt = float(w3.from_wei(snap.reserve_usdt, 'ether'))
 
-# 3. Price Spread
-oracle_p = float(w3.from_wei(oracle.functions.getLatestPrice().call(), 'ether'))
-pool_fds = float(w3.from_wei(dex.functions.reserveFDS().call(), 'ether'))
-pool_usdt = float(w3.from_wei(dex.functions.reserveUSDT().call(), 'ether'))
-dex_p = (pool_usdt / pool_fds) if pool_fds > 0 else 0
-spread = abs(oracle_p - dex_p) / oracle_p * 100 if oracle_p > 0 else 0
+# 3. Price Spread (Experiment Runner와 같은 AMM 모델 사용)
+amm = DumpImpactModel.from_snapshot(snap)
+dex_p = amm.price
+spread = amm.spread_pct
 
 col3.metric("Price Spread", f"{spread:.2f}%", delta=f"{dex_p:.4f} (DEX)")
 
 # 4. Rate Limit Status (New)
-try:
-    period_mint = float(w3.from_wei(fds.functions.currentPeriodMintAmount().call(), 'ether'))
-    limit = float(w3.from_wei(fds.functions.mintLimitPerPeriod().call(), 'ether'))
-    usage_pct = (period_mint / limit) * 100
-    col4.metric("Rate Limit Usage", f"{usage_pct:.1f}%", f"{period_mint:,.0f} / {limit:,.0f}")
-except:
+if snap.rate_limit_usage_pct is not None:
+    period_mint = float(w3.from_wei(snap.period_mint, 'ether'))
+    limit = float(w3.from_wei(snap.mint_limit, 'ether'))
+    col4.metric("Rate Limit Usage", f"{snap.rate_limit_usage_pct:.1f}%", f"{period_mint:,.0f} / {limit:,.0f}")
+else:
     col4.metric("Rate Limit", "N/A")
 
 # [New] DEX Pool Composition Visualization
@@ -103,6 +120,13 @@ with st.container():
         spot_price_fds = 1 / dex_p if dex_p > 0 else 0
         st.markdown(f"💱 **Current Spot Price**: `1 FDS` ≈ **${spot_price_usdt:,.4f}** USDT | `1 USDT` ≈ **{spot_price_fds:,.4f}** FDS")
 
+        # 현재 준비금 기준으로 괴리 임계값까지 남은 덤프 물량 (RPC 추가 없이 계산)
+        headroom = amm.dump_to_breach(DEPEG_THRESHOLD)
+        if headroom == float("inf"):
+            st.caption(f"🧮 Dump headroom: {DEPEG_THRESHOLD}% spread unreachable by dumping")
+        else:
+            st.caption(f"🧮 Dump headroom: **{headroom:,.0f} FDS** until {DEPEG_THRESHOLD}% spread")
+
 
 st.divider()
 
@@ -110,34 +134,107 @@ st.divider()
 # Simple Anomaly Monitor (Legacy Logic)
 # --------------------------------------------------------------------------
 st.subheader("⚠️ Live Anomaly Monitor")
+st.caption(f"Snapshot @ Block #{snap.block_number}")
 
 if not is_paused:
-    alerts = []
-    
-    # Check 1: Rate Limit Warning
-    if period_mint > limit * 0.8:
-        alerts.append(f"🔥 High Mint Volume: {period_mint:,.0f} FDS (Limit: {limit:,.0f})")
-    
-    # Check 2: Drain Warning
-    THRESHOLD_VAULT = 2000000 # Initial logic reference
-    if vault_bal < THRESHOLD_VAULT * 0.9: 
-         alerts.append(f"💧 Reserve Low: ${vault_bal:,.0f}")
-
-    # Check 3: Depeg
-    if spread > 5.0:
-        alerts.append(f"📉 Severe Depeg: {spread:.2f}%")
-
+    # watchtowerd와 같은 규칙 (방어 TX는 daemon만 발사)
+    alerts = evaluate_snapshot(snap, DEPEG_THRESHOLD)
     if alerts:
-        for alert in alerts:
-            st.error(alert)
-        
-        if auto_defense and spread > 5.0: # Auto trigger for depeg example
-            r, l = send_defense_tx(contracts, "Depeg detected Main")
-            st.success(f"🛡️ Auto-Defense Triggered! (Initial Block: {r['blockNumber']})")
-            time.sleep(2)
-            st.rerun()
+        for _, message in alerts:
+            st.error(message)
     else:
         st.info("No active anomalies detected. System is healthy.")
 
 else:
     st.warning("System is currently PAUSED by Circuit Breaker or Admin.")
+
+# 창 통계 기반 적응형 임계값 (watchtowerd가 블록마다 O(1)로 갱신)
+if daemon.get("online") and daemon.get("anomaly"):
+    st.markdown("##### 📊 Adaptive Thresholds (EWMA ± k·σ, rolling window)")
+    st.dataframe(pd.DataFrame([
+        {
+            "Metric": name,
+            "Value": s["value"],
+            "EWMA": s["ewma"],
+            "Limit": s["threshold"],
+            "z": s["z"],
+            "Δ/block": s["roc"],
+            "Warm": s["ready"],
+        }
+        for name, s in daemon["anomaly"].items()
+    ]), use_container_width=True, hide_index=True)
+    stat_alerts = [a for a in store.alerts(limit=50) if a["source"] == "stats"][:5]
+    for a in stat_alerts:
+        st.warning(f"#{a['block_number']} {a['message']}")
+
+if store is not None:
+    defenses = store.defenses(limit=10)
+    if defenses:
+        st.markdown("##### 🛡️ Auto-Defense Log (watchtowerd)")
+        st.dataframe(pd.DataFrame([
+            {
+                "Time": time.strftime("%H:%M:%S", time.localtime(d["created_at"])),
+                "Reason": d["reason"],
+                "Status": d["status"],
+                "Block": d["block_number"],
+                "Gas (Gwei)": (d["gas_price"] or 0) / 1e9,
+                "Latency (s)": d["latency"],
+                "TX": d["tx_hash"],
+            }
+            for d in defenses
+        ]), use_container_width=True, hide_index=True)
+    if daemon.get("online") and daemon.get("broadcast"):
+        # 다중 endpoint 전송 시 endpoint별 수락/최초 수락 횟수 (지연 분포는 Latency 페이지)
+        st.caption("Broadcast endpoints: " + " · ".join(
+            f"{host} {s['first']}/{s['accepted']}/{s['sent']} (first/accepted/sent)"
+            for host, s in daemon["broadcast"].items()
+        ))
+    if daemon.get("online") and daemon.get("relayers"):
+        relayers = daemon["relayers"]
+        st.caption(f"Relayers: {len(relayers['relayers'])} submitters · {relayers['relayed']} relayed · "
+                   f"{relayers['won']} won · {relayers['cancelled']} cancelled · "
+                   f"{sum(r['in_flight'] for r in relayers['relayers'].values())} in flight")
+    if daemon.get("online") and daemon.get("feed_stats", {}).get("last_error"):
+        feed_stats = daemon["feed_stats"]
+        st.caption(f"⚠️ Block handler: {feed_stats['errors']} errors (last: {feed_stats['last_error']})")
+    if daemon.get("online") and daemon.get("receipts", {}).get("last_error"):
+        receipts = daemon["receipts"]
+        st.caption(f"⚠️ Receipt resolver: {receipts['errors']} errors (last: {receipts['last_error']})")
+    if daemon.get("online") and daemon.get("mempool_stats", {}).get("last_error"):
+        mempool_stats = daemon["mempool_stats"]
+        st.caption(f"⚠️ Mempool alert handler: {mempool_stats['errors']} errors (last: {mempool_stats['last_error']})")
+
+# --------------------------------------------------------------------------
+# Mempool Watch: 채굴 전 공격 TX 탐지 (Front-run 방어, watchtowerd)
+# --------------------------------------------------------------------------
+st.subheader("🕵️ Mempool Watch")
+stats = daemon.get("mempool_stats", {})
+m1, m2, m3, m4 = st.columns(4)
+m1.metric("Feed", daemon.get("mempool_feed", "offline") if daemon["online"] else "offline")
+m2.metric("Pending Seen", f"{stats.get('seen', 0):,}")
+m3.metric("Matched / Alerts", f"{stats.get('matched', 0):,} / {stats.get('alerts', 0):,}")
+m4.metric("Defense Fired", daemon.get("stats", {}).get("fired", 0))
+
+mempool_alerts = [a for a in store.alerts(limit=50) if a["source"] == "mempool"][:20] if store else []
+if mempool_alerts:
+    st.dataframe(pd.DataFrame([
+        {
+            "Time": time.strftime("%H:%M:%S", time.localtime(a["created_at"])),
+            "Rule": a["rule"],
+            "Alert": a["message"],
+            "Function": json.loads(a["details"]).get("function"),
+            "From": json.loads(a["details"]).get("from"),
+            "Gas (Gwei)": json.loads(a["details"]).get("gas_price", 0) / 1e9,
+            "TX": a["tx_hash"],
+        }
+        for a in mempool_alerts
+    ]), use_container_width=True, hide_index=True)
+else:
+    st.caption("No suspicious pending transactions. (Hardhat automine 모드에서는 TX가 즉시 채굴되어 mempool에 머물지 않습니다)")
+
+# --------------------------------------------------------------------------
+# Live Monitor: 새 블록이 도착하면 재평가
+# --------------------------------------------------------------------------
+if live_monitor:
+    wait_for_next_block(snap.block_number, status=st.sidebar.empty())
+    st.rerun()
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+# --------------------------------------------------------------------------
+# 상수 및 설정
+# --------------------------------------------------------------------------
+HIST_BINS = 40
+GRID_BINS = 50
+SAMPLE_POINTS = 3000
+MIN_PER_GROUP = 200  # 층화 표본에서 작은 그룹(예: 실패 케이스)도 최소 이만큼은 남김
+
+# --------------------------------------------------------------------------
+# 구간 경계
+# --------------------------------------------------------------------------
+def bin_edges(values, bins):
+    """
+    정수형이고 값 종류가 bins 이하면 값마다 한 칸 (BlockDiff 등 -> 원래 값이 그대로 보임),
+    그 외에는 [min, max]를 bins등분. NaN만 있으면 None.
+    """
+    values = values[~np.isnan(values)] if values.dtype.kind == "f" else values
+    if len(values) == 0:
+        return None
+    lo, hi = float(values.min()), float(values.max())
+    if values.dtype.kind in "iub" or np.all(np.mod(values, 1) == 0):
+        if hi - lo + 1 <= bins:
+            return np.arange(lo - 0.5, hi + 1.5)
+    if lo == hi:
+        return np.array([lo - 0.5, hi + 0.5])
+    return np.linspace(lo, hi, bins + 1)
+
+def _groups(df, by):
+    if by is None:
+        return [(None, df)]
+    return list(df.groupby(by, sort=True, observed=True))
+
+# --------------------------------------------------------------------------
+# 집계 (브라우저로는 구간별 결과만 전달)
+# --------------------------------------------------------------------------
+def histogram(df, column, by=None, bins=HIST_BINS):
+    """
+    모든 그룹이 같은 구간을 쓰는 히스토그램.
+    반환 컬럼: bin_start, bin_end, count (+ by)
+    """
+    edges = bin_edges(df[column].to_numpy(dtype=float), bins)
+    if edges is None:
+        return pd.DataFrame(columns=["bin_start", "bin_end", "count"] + ([by] if by else []))
+    frames = []
+    for key, group in _groups(df, by):
+        values = group[column].to_numpy(dtype=float)
+        counts, _ = np.histogram(values[~np.isnan(values)], bins=edges)
+        frame = pd.DataFrame({"bin_start": edges[:-1], "bin_end": edges[1:], "count": counts})
+        if by:
+            frame[by] = key
+        frames.append(frame[frame["count"] > 0])
+    return pd.concat(frames, ignore_index=True)
+
+def density_grid(df, x, y, bins=GRID_BINS, rate=None):
+    """
+    2차원 밀도 격자 (산점도 대체). rate 컬럼(bool)이 주어지면 칸별 비율도 계산.
+    반환 컬럼: x_start, x_end, y_start, y_end, count (+ rate)
+    """
+    sub = df[[x, y] + ([rate] if rate else [])].dropna(subset=[x, y])
+    xv, yv = sub[x].to_numpy(dtype=float), sub[y].to_numpy(dtype=float)
+    x_edges, y_edges = bin_edges(xv, bins), bin_edges(yv, bins)
+    if x_edges is None or y_edges is None:
+        return pd.DataFrame(columns=["x_start", "x_end", "y_start", "y_end", "count"] + ([rate] if rate else []))
+    counts, _, _ = np.histogram2d(xv, yv, bins=[x_edges, y_edges])
+    ix, iy = np.nonzero(counts)
+    grid = pd.DataFrame({
+        "x_start": x_edges[ix], "x_end": x_edges[ix + 1],
+        "y_start": y_edges[iy], "y_end": y_edges[iy + 1],
+        "count": counts[ix, iy].astype(int),
+    })
+    if rate:
+        hits, _, _ = np.histogram2d(xv, yv, bins=[x_edges, y_edges], weights=sub[rate].to_numpy(dtype=float))
+        grid[rate] = hits[ix, iy] / counts[ix, iy]
+    return grid
+
+def stratified_sample(df, by, n=SAMPLE_POINTS, min_per_group=MIN_PER_GROUP, seed=0):
+    """
+    그룹 비율대로 n행 표본 추출 (작은 그룹은 min_per_group까지 보장).
+    n 이하면 원본 그대로.
+    """
+    if len(df) <= n:
+        return df
+    frames = []
+    for _, group in _groups(df, by):
+        share = max(int(round(n * len(group) / len(df))), min(min_per_group, len(group)))
+        frames.append(group.sample(min(share, len(group)), random_state=seed))
+    return pd.concat(frames).sort_index()
@@ -0,0 +1,84 @@
+from dataclasses import dataclass
+import numpy as np
+
+# --------------------------------------------------------------------------
+# MockDEX 가격 모델 (닫힌 형태)
+#
+#   simulateDump(x):  reserveFDS += x;  reserveUSDT -= x / 2
+#   getSpotPrice():   reserveUSDT / reserveFDS
+#
+# 준비금을 한 번만 읽으면 후보 덤프 물량 전체의 사후 가격/괴리를 RPC 없이 계산할 수 있다.
+# --------------------------------------------------------------------------
+def spot_price(reserve_fds, reserve_usdt):
+    """USDT / FDS (배열 가능, reserveFDS가 0이면 0)"""
+    reserve_fds = np.asarray(reserve_fds, dtype=float)
+    reserve_usdt = np.asarray(reserve_usdt, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(reserve_fds > 0, reserve_usdt / reserve_fds, 0.0)
+
+def oracle_spread_pct(price, oracle_price):
+    """오라클 가격(wei, 1e18 = $1) 대비 괴리율 %"""
+    oracle_p = oracle_price / 1e18
+    if oracle_p <= 0:
+        return np.zeros_like(np.asarray(price, dtype=float))
+    return np.abs(oracle_p - np.asarray(price, dtype=float)) / oracle_p * 100
+
+@dataclass(frozen=True)
+class DumpImpactModel:
+    """한 시점의 DEX 준비금/오라클 가격 (단위: wei)"""
+    reserve_fds: int
+    reserve_usdt: int
+    oracle_price: int
+
+    @classmethod
+    def from_snapshot(cls, snap):
+        return cls(snap.reserve_fds, snap.reserve_usdt, snap.oracle_price)
+
+    @classmethod
+    def read(cls, contracts, block_identifier=None):
+        # 준비금 2개 + 오라클 가격을 한 번의 호출로 조회
+        from lib.utils import aggregate_calls
+        dex = contracts["DEX"]
+        _, (reserve_fds, reserve_usdt, oracle_price) = aggregate_calls(dex.w3, [
+            dex.functions.reserveFDS(),
+            dex.functions.reserveUSDT(),
+            contracts["Oracle"].functions.getLatestPrice(),
+        ], block_identifier)
+        return cls(reserve_fds, reserve_usdt, oracle_price)
+
+    @property
+    def price(self):
+        return float(spot_price(self.reserve_fds, self.reserve_usdt))
+
+    @property
+    def spread_pct(self):
+        return float(oracle_spread_pct(self.price, self.oracle_price))
+
+    def impact(self, amounts):
+        """
+        덤프 물량(FDS 단위, 스칼라 또는 배열) -> (사후 가격, 괴리율 %, 실행 가능 여부)
+        실행 가능 여부: reserveUSDT -= x/2 가 underflow로 revert 되지 않는지
+        """
+        x = np.asarray(amounts, dtype=float) * 1e18
+        reserve_usdt = self.reserve_usdt - x / 2
+        feasible = reserve_usdt >= 0
+        price = spot_price(self.reserve_fds + x, np.maximum(reserve_usdt, 0))
+        return price, oracle_spread_pct(price, self.oracle_price), feasible
+
+    def spread_after(self, amounts):
+        return self.impact(amounts)[1]
+
+    def dump_to_breach(self, threshold_pct):
+        """
+        괴리율이 threshold_pct에 도달하는 최소 덤프 물량 (FDS 단위). 이미 넘었으면 0, 도달 불가면 inf.
+        (U - x/2) / (F + x) = P(1 - t)  ->  x = (U - P(1 - t)F) / (1/2 + P(1 - t))
+        """
+        if self.spread_pct >= threshold_pct:
+            return 0.0
+        target = self.oracle_price / 1e18 * (1 - threshold_pct / 100)
+        if target <= 0:
+            return float("inf")
+        x = (self.reserve_usdt - target * self.reserve_fds) / (0.5 + target)
+        if x < 0 or x / 2 > self.reserve_usdt:
+            return float("inf")
+        return x / 1e18
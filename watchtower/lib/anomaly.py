@@ -0,0 +1,169 @@
+import math
+from collections import deque
+from dataclasses import dataclass
+
+# --------------------------------------------------------------------------
+# 상수 및 설정
+# --------------------------------------------------------------------------
+WINDOW = 64  # 블록
+ALPHA = 0.1  # EWMA 가중치 (최근 블록 비중)
+Z_THRESHOLD = 4.0
+WARMUP = 8  # 이 블록 수 이전에는 판정하지 않음
+
+@dataclass(frozen=True)
+class MetricSpec:
+    name: str
+    direction: str  # "up": 커질 때 이상, "down": 작아질 때 이상
+    min_std: float  # 변동이 거의 없는 구간에서 임계값이 0으로 붙지 않도록 하는 최소 표준편차
+    label: str
+
+# 블록마다 StateSnapshot 두 개(이전/현재)로부터 계산하는 지표
+METRICS = [
+    MetricSpec("mint_volume", "up", 1000.0, "🔥 Mint volume spike"),  # FDS / block
+    MetricSpec("vault_outflow", "up", 1000.0, "💧 Vault outflow spike"),  # USDT / block
+    MetricSpec("reserve_ratio", "down", 0.005, "🏦 Reserve ratio drop"),  # Vault USDT / FDS 공급량
+    MetricSpec("spread_pct", "up", 0.25, "📉 Spread spike"),  # %
+]
+
+def block_metrics(prev, snap):
+    """연속된 두 스냅샷 -> {지표: 값}. 첫 블록(prev=None)은 흐름 지표를 0으로"""
+    supply = snap.total_supply / 1e18
+    return {
+        "mint_volume": max(snap.total_supply - prev.total_supply, 0) / 1e18 if prev else 0.0,
+        "vault_outflow": max(prev.vault_usdt - snap.vault_usdt, 0) / 1e18 if prev else 0.0,
+        "reserve_ratio": snap.vault_usdt / 1e18 / supply if supply else 0.0,
+        "spread_pct": snap.spread_pct,
+    }
+
+# --------------------------------------------------------------------------
+# 고정 크기 창 통계 (추가/제거 O(1))
+# --------------------------------------------------------------------------
+class RollingStat:
+    """최근 window개 값의 평균/표준편차(누적 합 유지)와 EWMA/EWM 분산을 함께 갱신한다."""
+
+    def __init__(self, window=WINDOW, alpha=ALPHA):
+        self.window = window
+        self.alpha = alpha
+        self.values = deque(maxlen=window)
+        self.sum = 0.0
+        self.sumsq = 0.0
+        self.ewma = None
+        self.ewm_var = 0.0
+        self.last = None
+
+    @property
+    def count(self):
+        return len(self.values)
+
+    @property
+    def mean(self):
+        return self.sum / len(self.values) if self.values else 0.0
+
+    @property
+    def std(self):
+        n = len(self.values)
+        if n < 2:
+            return 0.0
+        return math.sqrt(max(self.sumsq / n - (self.sum / n) ** 2, 0.0))
+
+    @property
+    def ewm_std(self):
+        return math.sqrt(self.ewm_var)
+
+    def update(self, x):
+        """x를 추가하고 직전 값 대비 변화율을 돌려준다 (직전이 0이면 None)"""
+        roc = (x - self.last) / abs(self.last) if self.last else None
+
+        if len(self.values) == self.window:
+            old = self.values[0]
+            self.sum -= old
+            self.sumsq -= old * old
+        self.values.append(x)
+        self.sum += x
+        self.sumsq += x * x
+
+        if self.ewma is None:
+            self.ewma = x
+        else:
+            diff = x - self.ewma
+            self.ewma += self.alpha * diff
+            self.ewm_var = (1 - self.alpha) * (self.ewm_var + self.alpha * diff * diff)
+        self.last = x
+        return roc
+
+# --------------------------------------------------------------------------
+# 블록 단위 이상 탐지기
+# --------------------------------------------------------------------------
+@dataclass(frozen=True)
+class Anomaly:
+    metric: str
+    value: float
+    threshold: float
+    z: float
+    roc: float
+    block_number: int
+    message: str
+
+class AnomalyDetector:
+    """
+    새 블록의 StateSnapshot을 넣으면 지표별 창 통계를 O(1)로 갱신하고,
+    적응형 임계값(EWMA ± k·σ)을 벗어난 지표를 Anomaly로 돌려준다.
+
+    σ는 창 표준편차와 EWM 표준편차 중 큰 값 (급변 직후 임계값이 너무 좁아지는 것 방지),
+    최소값은 MetricSpec.min_std.
+    """
+
+    def __init__(self, window=WINDOW, alpha=ALPHA, z_threshold=Z_THRESHOLD, warmup=WARMUP, metrics=METRICS):
+        self.window = window
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.warmup = warmup
+        self.metrics = {m.name: m for m in metrics}
+        self.reset()
+
+    def reset(self):
+        """통계 창과 직전 스냅샷을 비움 (노드 재시작 / evm_revert로 체인이 되돌아간 경우)"""
+        self.stats = {name: RollingStat(self.window, self.alpha) for name in self.metrics}
+        self.prev = None
+        self.latest = {}
+
+    def sigma(self, name):
+        stat = self.stats[name]
+        return max(stat.std, stat.ewm_std, self.metrics[name].min_std)
+
+    def threshold(self, name):
+        spec, stat = self.metrics[name], self.stats[name]
+        base = stat.ewma if stat.ewma is not None else 0.0
+        k = self.z_threshold if spec.direction == "up" else -self.z_threshold
+        return base + k * self.sigma(name)
+
+    def update(self, snap):
+        """같은 블록을 두 번 넣으면 무시 (빈 리스트). 블록 번호가 줄어들면 통계를 비우고 새 체인 기준으로 다시 시작"""
+        if self.prev is not None:
+            if snap.block_number == self.prev.block_number:
+                return []
+            if snap.block_number < self.prev.block_number:
+                self.reset()
+        values = block_metrics(self.prev, snap)
+        self.prev = snap
+
+        anomalies = []
+        for name, x in values.items():
+            spec, stat = self.metrics[name], self.stats[name]
+            # 현재 값은 갱신 전 통계로 판정 (이상치가 자기 임계값을 끌어올리지 않도록)
+            limit = self.threshold(name)
+            z = (x - (stat.ewma if stat.ewma is not None else x)) / self.sigma(name)
+            ready = stat.count >= self.warmup
+            roc = stat.update(x)
+            breached = x > limit if spec.direction == "up" else x < limit
+            self.latest[name] = {"value": x, "ewma": stat.ewma, "threshold": limit, "z": z, "roc": roc, "ready": ready}
+            if ready and breached:
+                anomalies.append(Anomaly(
+                    metric=name, value=x, threshold=limit, z=z, roc=roc, block_number=snap.block_number,
+                    message=f"{spec.label}: {x:,.4g} (adaptive limit {limit:,.4g}, z={z:+.1f})",
+                ))
+        return anomalies
+
+    def summary(self):
+        """{지표: {value, ewma, threshold, z, roc, ready}} (대시보드 표시용)"""
+        return dict(self.latest)
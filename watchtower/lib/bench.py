@@ -0,0 +1,315 @@
+import json
+import os
+import subprocess
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+from dataclasses import dataclass, asdict, field
+import numpy as np
+from web3 import Web3
+from lib.utils import WATCHTOWER_DIR, rpc_batch, fetch_snapshot, get_defense_engine, get_receipt_resolver
+from lib.experiment import BaselineSnapshot
+from lib.mempool import MempoolWatcher, MempoolRules
+from lib.amm import DumpImpactModel
+from lib.latency import PHASES, span, trace
+from lib.defense import BLACKLIST_GAS
+
+# --------------------------------------------------------------------------
+# 상수 및 설정
+# --------------------------------------------------------------------------
+BENCH_DIR = os.path.join(WATCHTOWER_DIR, "data", "bench")
+
+ATTACKS = ["exploitMint", "exploitDrain", "simulateDump"]
+DEFENSES = ["pause", "blacklist"]
+MINING_MODES = ["auto", "interval"]
+
+ATTACK_GAS = 200000  # estimateGas 생략 (rate limit revert도 체인에 기록되도록)
+ATTACK_GAS_PREMIUM = 2.0  # 공격자 가스비 = eth_gasPrice x 2 (gap이 음수여도 base fee 이상 유지)
+RECEIPT_TIMEOUT = 30
+
+LATENCY_COLUMNS = [f"{p}_ms" for p in PHASES] + ["total_ms"]
+
+@dataclass
+class BenchConfig:
+    attacks: list = field(default_factory=lambda: list(ATTACKS))
+    defenses: list = field(default_factory=lambda: list(DEFENSES))
+    mining: list = field(default_factory=lambda: list(MINING_MODES))
+    gas_gaps: list = field(default_factory=lambda: [-25.0, 0.0, 25.0])  # 방어 가스비 = 공격 가스비 x (1 + gap%)
+    trials: int = 20
+    block_time_ms: int = 1000
+    rules: dict = field(default_factory=lambda: asdict(MempoolRules()))
+
+    def to_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def cases(self):
+        return [
+            (attack, defense, mining, gap)
+            for attack in self.attacks
+            for defense in self.defenses
+            for mining in self.mining
+            # automine에서는 TX마다 블록이 따로 생기므로 가스비 차이가 순서에 영향 없음
+            for gap in (self.gas_gaps if mining == "interval" else [0.0])
+        ]
+
+def attack_amounts(snap, rules):
+    """규칙을 확실히 넘되 on-chain 한도(rate limit, underflow)에는 걸리지 않는 공격 규모 (wei)"""
+    mint = int(rules.mint_threshold * 2 * 1e18)
+    if snap.rate_limit_usage_pct is not None:
+        mint = min(mint, snap.mint_limit - snap.period_mint)
+    breach = DumpImpactModel.from_snapshot(snap).dump_to_breach(rules.depeg_pct)
+    return {
+        "exploitMint": mint,
+        "exploitDrain": int(snap.vault_usdt * min(2 * rules.drain_pct, 100) / 100),
+        "simulateDump": int(min(breach * 2, snap.reserve_usdt / 1e18) * 1e18),
+    }
+
+# --------------------------------------------------------------------------
+# 블록 생성 제어
+# --------------------------------------------------------------------------
+def set_automine(w3, enabled):
+    w3.manager.request_blocking("evm_setAutomine", [enabled])
+
+class IntervalMiner:
+    """
+    공격 TX 전송 시점부터 block_time마다 evm_mine 호출.
+    (evm_setIntervalMining은 블록 경계의 위상이 매번 달라 재현성이 떨어지므로 직접 채굴)
+    """
+
+    def __init__(self, w3, block_time):
+        self.w3 = w3
+        self.block_time = block_time
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="bench-miner", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.block_time):
+            self.w3.manager.request_blocking("evm_mine", [])
+
+# --------------------------------------------------------------------------
+# 경주 1회 (공격 전송 -> 탐지 -> 서명 -> 전송 -> 포함)
+# --------------------------------------------------------------------------
+class DefenseRace:
+    """
+    같은 기준 상태(evm_snapshot)에서 공격/방어 조합을 반복해 경주시킨다.
+    탐지는 MempoolWatcher의 selector 분류 + MempoolRules 평가를 그대로 사용한다.
+    """
+
+    def __init__(self, contracts, accs, cfg):
+        self.contracts = contracts
+        self.accs = accs
+        self.cfg = cfg
+        self.w3 = contracts["FDS"].w3
+        self.watcher = MempoolWatcher(self.w3, contracts, MempoolRules(**cfg.rules))
+        self.engine = get_defense_engine(contracts)
+        self.receipts = get_receipt_resolver(self.w3)
+        self.amounts = self.attack_amounts(fetch_snapshot(contracts))
+
+    def attack_amounts(self, snap):
+        return attack_amounts(snap, self.watcher.rules)
+
+    def send_attack(self, attack, gas_price):
+        hacker = self.accs["hacker"]
+        fn = {
+            "exploitMint": self.contracts["FDS"].functions.exploitMint,
+            "exploitDrain": self.contracts["Vault"].functions.exploitDrain,
+            "simulateDump": self.contracts["DEX"].functions.simulateDump,
+        }[attack](self.amounts[attack])
+        tx = fn.build_transaction({
+            "from": hacker.address,
+            "nonce": self.w3.eth.get_transaction_count(hacker.address, "pending"),
+            "gas": ATTACK_GAS,
+            "gasPrice": gas_price,
+        })
+        signed = hacker.sign_transaction(tx)
+        return self.w3.eth.send_raw_transaction(signed.raw_transaction)
+
+    def detect(self, tx_hash):
+        # pending TX 본문 조회 -> selector 분류 -> 현재 상태 기준 규칙 평가
+        with span("detect"):
+            tx, = rpc_batch(self.w3, [("eth_getTransactionByHash", [Web3.to_hex(tx_hash)])])
+            pending = self.watcher.classify(tx) if tx else None
+            if pending is None:
+                return None
+            return self.watcher.rules.evaluate(pending, fetch_snapshot(self.contracts))
+
+    def defend(self, defense, gas_price):
+        """방어 TX 전송 후 영수증 Future를 돌려준다."""
+        if defense == "pause":
+            self.engine.prepare(gas_price=gas_price)
+            return self.engine.fire().receipt
+        # blacklistAccount는 owner 키로 로컬 서명 (pause와 같이 sign / broadcast 구간을 나눠 측정)
+        owner = self.accs["owner"]
+        tx = self.contracts["FDS"].functions.blacklistAccount(self.accs["hacker"].address).build_transaction({
+            "from": owner.address,
+            "nonce": self.w3.eth.get_transaction_count(owner.address, "pending"),
+            "gas": BLACKLIST_GAS,
+            "gasPrice": gas_price,
+        })
+        with span("sign"):
+            raw_tx = owner.sign_transaction(tx).raw_transaction
+        with span("broadcast"):
+            tx_hash = self.w3.eth.send_raw_transaction(raw_tx)
+        return self.receipts.watch(tx_hash, RECEIPT_TIMEOUT)
+
+    def run_trial(self, attack, defense, mining, gap, baseline):
+        baseline.restore()
+        # 앱과 같은 ready-to-fire 상태: 새 블록마다 미리 서명해 둔 방어 TX가 있음
+        self.engine.refresh()
+        attack_price = int(self.w3.eth.gas_price * ATTACK_GAS_PREMIUM)
+        defense_price = max(1, int(attack_price * (1 + gap / 100)))
+        row = {"attack": attack, "defense": defense, "mining": mining, "gas_gap_pct": gap,
+               "attack_gas_price": attack_price, "defense_gas_price": defense_price}
+
+        attack_hash = self.send_attack(attack, attack_price)
+        attack_future = self.receipts.watch(attack_hash, RECEIPT_TIMEOUT)
+        started = time.perf_counter()
+        miner = IntervalMiner(self.w3, self.cfg.block_time_ms / 1000) if mining == "interval" else nullcontext()
+        with trace() as phases, miner:
+            alert = self.detect(attack_hash)
+            defense_receipt = None
+            if alert is not None:
+                future = self.defend(defense, defense_price)
+                with span("include"):
+                    defense_receipt = future.result(RECEIPT_TIMEOUT)
+                row["total_ms"] = (time.perf_counter() - started) * 1000
+            attack_receipt = attack_future.result()
+
+        row.update({f"{p}_ms": phases[p] * 1000 for p in PHASES if p in phases})
+        row.update({
+            "detected": alert is not None,
+            "attack_block": attack_receipt["blockNumber"],
+            "attack_index": attack_receipt["transactionIndex"],
+            "attack_reverted": attack_receipt["status"] == 0,
+            "attack_gas_used": attack_receipt["gasUsed"],
+        })
+        if defense_receipt is not None:
+            row.update({
+                "defense_block": defense_receipt["blockNumber"],
+                "defense_index": defense_receipt["transactionIndex"],
+                "defense_gas_used": defense_receipt["gasUsed"],
+                "block_diff": defense_receipt["blockNumber"] - attack_receipt["blockNumber"],
+                # 방어가 먼저 실행됐는가 (블록, 블록 내 순서)
+                "win": (defense_receipt["blockNumber"], defense_receipt["transactionIndex"])
+                       < (attack_receipt["blockNumber"], attack_receipt["transactionIndex"]),
+            })
+        else:
+            row["win"] = False
+        return row
+
+    def run(self, on_trial=None):
+        """on_trial(done, total, row)은 시행마다 호출"""
+        cases = self.cfg.cases()
+        total = len(cases) * self.cfg.trials
+        rows = []
+        baseline = BaselineSnapshot(self.contracts)
+        try:
+            for mining in self.cfg.mining:
+                set_automine(self.w3, mining == "auto")
+                for attack, defense, case_mining, gap in cases:
+                    if case_mining != mining:
+                        continue
+                    for trial in range(self.cfg.trials):
+                        row = {"trial": trial, **self.run_trial(attack, defense, mining, gap, baseline)}
+                        rows.append(row)
+                        if on_trial:
+                            on_trial(len(rows), total, row)
+        finally:
+            set_automine(self.w3, True)
+            baseline.restore()
+        return rows
+
+# --------------------------------------------------------------------------
+# 요약 (p50 / p99) / 저장 / 비교
+# --------------------------------------------------------------------------
+def case_key(row):
+    return f"{row['attack']}/{row['defense']}/{row['mining']}/{row['gas_gap_pct']:+g}%"
+
+def summarize(rows):
+    groups = {}
+    for row in rows:
+        groups.setdefault(case_key(row), []).append(row)
+
+    summary = {}
+    for key, group in groups.items():
+        defended = [r for r in group if "defense_block" in r]
+        stats = {
+            "trials": len(group),
+            "detect_rate": sum(r["detected"] for r in group) / len(group),
+            "win_rate": sum(r["win"] for r in group) / len(group),
+            "same_block_rate": sum(r["block_diff"] == 0 for r in defended) / len(group),
+            "attack_reverted_rate": sum(r["attack_reverted"] for r in group) / len(group),
+            "mean_block_diff": float(np.mean([r["block_diff"] for r in defended])) if defended else None,
+            "defense_gas_used": float(np.mean([r["defense_gas_used"] for r in defended])) if defended else None,
+            "attack_gas_used": float(np.mean([r["attack_gas_used"] for r in group])),
+        }
+        for col in LATENCY_COLUMNS:
+            values = [r[col] for r in group if r.get(col) is not None]
+            stats[col] = {
+                "p50": float(np.percentile(values, 50)) if values else None,
+                "p99": float(np.percentile(values, 99)) if values else None,
+            }
+        summary[key] = stats
+    return summary
+
+def environment(w3):
+    """결과 비교 시 참고할 실행 환경 (노드 버전, 코드 버전)"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=WATCHTOWER_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {"client": w3.client_version, "chain_id": w3.eth.chain_id, "commit": commit}
+
+def save_bench(rows, cfg, env, root=BENCH_DIR):
+    bench_id = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, f"{bench_id}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "bench_id": bench_id,
+            "created_at": time.time(),
+            "config": cfg.to_dict(),
+            "environment": env,
+            "summary": summarize(rows),
+            "trials": rows,
+        }, f, ensure_ascii=False, indent=2, default=str)
+    return path
+
+def latest_bench(root=BENCH_DIR, exclude=None):
+    if not os.path.isdir(root):
+        return None
+    paths = sorted(os.path.join(root, n) for n in os.listdir(root) if n.endswith(".json"))
+    paths = [p for p in paths if p != exclude]
+    return paths[-1] if paths else None
+
+def compare(previous, current, metrics=("win_rate", "detect_ms", "total_ms")):
+    """두 summary의 공통 케이스별 변화량 (지연 시간은 p50/p99)"""
+    changes = {}
+    for key in sorted(set(previous) & set(current)):
+        delta = {}
+        for metric in metrics:
+            old, new = previous[key].get(metric), current[key].get(metric)
+            if isinstance(new, dict):
+                for pct in ("p50", "p99"):
+                    if new.get(pct) is not None and (old or {}).get(pct) is not None:
+                        delta[f"{metric}.{pct}"] = new[pct] - old[pct]
+            elif new is not None and old is not None:
+                delta[metric] = new - old
+        changes[key] = delta
+    return changes
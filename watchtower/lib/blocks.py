@@ -0,0 +1,227 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from web3 import Web3
+
+# --------------------------------------------------------------------------
+# 블록 캐시 (LRU, key = (number, hash))
+# --------------------------------------------------------------------------
+class BlockCache:
+    """
+    확정된 블록은 바뀌지 않으므로 (번호, 해시) 단위로 한 번만 가져온다.
+
+    - 헤더 모드: get_block(n, full_transactions=False) -> 헤더 + TX 해시만
+    - 본문(full TX)은 transactions()를 호출할 때만 별도로 로드
+    """
+
+    def __init__(self, w3, maxsize=256):
+        self.w3 = w3
+        self.maxsize = maxsize
+        self._headers = OrderedDict()
+        self._bodies = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(block):
+        return (block["number"], Web3.to_hex(block["hash"]))
+
+    def _put(self, store, key, value):
+        store[key] = value
+        store.move_to_end(key)
+        while len(store) > self.maxsize:
+            store.popitem(last=False)
+
+    def _get(self, store, key):
+        value = store.get(key)
+        if value is not None:
+            store.move_to_end(key)
+        return value
+
+    def latest(self, count=5):
+        """
+        최신 블록부터 count개의 헤더를 돌려준다.
+        헤드만 새로 조회하고, 이전 블록은 parentHash로 캐시 항목의 유효성을 확인한다.
+        """
+        head = self.w3.eth.get_block("latest")
+        with self._lock:
+            self._put(self._headers, self.key(head), head)
+
+        blocks = [head]
+        parent_hash = Web3.to_hex(head["parentHash"])
+        number = head["number"] - 1
+        while len(blocks) < count and number >= 0:
+            with self._lock:
+                blk = self._get(self._headers, (number, parent_hash))
+            if blk is None:
+                self.misses += 1
+                blk = self.w3.eth.get_block(number)
+                with self._lock:
+                    self._put(self._headers, self.key(blk), blk)
+            else:
+                self.hits += 1
+            blocks.append(blk)
+            parent_hash = Web3.to_hex(blk["parentHash"])
+            number -= 1
+        return blocks
+
+    def transactions(self, block):
+        """블록의 전체 트랜잭션 본문 (지연 로드)"""
+        key = self.key(block)
+        with self._lock:
+            txs = self._get(self._bodies, key)
+        if txs is None:
+            txs = self.w3.eth.get_block(key[1], full_transactions=True)["transactions"]
+            with self._lock:
+                self._put(self._bodies, key, txs)
+        return txs
+
+# --------------------------------------------------------------------------
+# 블록 범위 스캐너 (사고 구간 재조사)
+# --------------------------------------------------------------------------
+SCAN_BATCH = 100  # JSON-RPC batch 하나에 담는 블록 수
+SCAN_WORKERS = 4  # 동시에 보내는 batch 수 (노드 부하 제한)
+MAX_SCAN_BLOCKS = 10_000  # 한 번에 스캔할 수 있는 최대 블록 수 (오타로 전체 체인을 스캔하지 않도록)
+DECODED_CONTRACTS = ["FDS", "USDT", "Vault", "DEX"]
+
+def fork_block(w3):
+    """Hardhat 포크 노드면 포크 블록 번호 (그 이전 블록 조회는 원격 archive RPC로 감), 아니면 None"""
+    try:
+        meta = w3.manager.request_blocking("hardhat_metadata", [])
+    except Exception:
+        return None
+    forked = meta.get("forkedNetwork")
+    return forked["forkBlockNumber"] if forked else None
+
+def build_decoder_table(contracts):
+    """알려진 컨트랙트의 모든 함수 selector 테이블 (USDT는 전체 ERC20 ABI 사용)"""
+    from lib.mempool import build_selector_table
+    from lib.utils import WATCHTOWER_DIR
+    contracts = dict(contracts)
+    usdt_path = os.path.join(WATCHTOWER_DIR, "MockUSDT.json")
+    if os.path.exists(usdt_path):
+        with open(usdt_path) as f:
+            contracts["USDT"] = contracts["USDT"].w3.eth.contract(address=contracts["ADDRS"]["USDT"], abi=json.load(f)["abi"])
+    watched = {
+        key: [fn["name"] for fn in contracts[key].abi if fn.get("type") == "function"]
+        for key in DECODED_CONTRACTS
+    }
+    return build_selector_table(contracts, watched)
+
+def _format_arg(name, value):
+    if isinstance(value, int) and not isinstance(value, bool) and ("amount" in name.lower() or "value" in name.lower()):
+        return f"{name}={value / 1e18:,.2f}"
+    return f"{name}={value}"
+
+class RangeScanner:
+    """
+    [start, end] 블록의 모든 TX를 가져와 알려진 ABI로 디코딩한다.
+
+    - 블록 본문: eth_getBlockByNumber(full)를 SCAN_BATCH개씩 batch 요청
+    - receipt: eth_getBlockReceipts (노드가 지원하지 않으면 eth_getTransactionReceipt batch)
+    - batch는 최대 SCAN_WORKERS개까지만 동시에 보냄
+    - 한 번에 max_blocks개까지만 스캔 (넘으면 ValueError)
+    """
+
+    def __init__(self, w3, contracts, batch_size=SCAN_BATCH, workers=SCAN_WORKERS, max_blocks=MAX_SCAN_BLOCKS):
+        self.w3 = w3
+        self.contracts = contracts
+        self.batch_size = batch_size
+        self.workers = workers
+        self.max_blocks = max_blocks
+        self._first_block = None
+        self.table = build_decoder_table(contracts)
+        self.aliases = {v.lower(): k for k, v in contracts["ADDRS"].items() if isinstance(v, str)}
+        self.block_receipts = None  # eth_getBlockReceipts 지원 여부 (첫 요청에서 확인)
+
+    def first_block(self):
+        """스캔할 의미가 있는 첫 블록: 배포 블록 (addresses.json), 없으면 포크 블록 다음, 아니면 0"""
+        if self._first_block is None:
+            deploy_block = self.contracts["ADDRS"].get("DeployBlock")
+            if deploy_block is None:
+                forked = fork_block(self.w3)
+                deploy_block = forked + 1 if forked is not None else 0
+            self._first_block = deploy_block
+        return self._first_block
+
+    def _receipts(self, blocks):
+        from lib.utils import rpc_batch
+        blocks = [b for b in blocks if b["transactions"]]
+        if not blocks:
+            return {}
+        if self.block_receipts is not False:
+            try:
+                results = rpc_batch(self.w3, [("eth_getBlockReceipts", [b["number"]]) for b in blocks])
+                self.block_receipts = True
+                return {r["transactionHash"]: r for receipts in results for r in receipts or []}
+            except RuntimeError:
+                if self.block_receipts:
+                    raise
+                self.block_receipts = False
+        hashes = [tx["hash"] for b in blocks for tx in b["transactions"]]
+        results = rpc_batch(self.w3, [("eth_getTransactionReceipt", [h]) for h in hashes])
+        return {r["transactionHash"]: r for r in results if r}
+
+    def decode(self, tx, receipt, block):
+        to = tx.get("to")
+        data = tx.get("input") or tx.get("data") or "0x"
+        entry = self.table.get(((to or "").lower(), data[:10].lower())) if len(data) >= 10 else None
+        args = ""
+        if entry is not None:
+            try:
+                values = self.w3.codec.decode(entry.arg_types, bytes.fromhex(data[10:]))
+                args = ", ".join(_format_arg(n, v) for n, v in zip(entry.arg_names, values))
+            except Exception:
+                args = "(decode failed)"
+        if entry is not None:
+            contract, function = entry.contract, entry.function
+        elif not to:
+            contract, function = "", "(deploy)"
+        else:
+            contract = self.aliases.get(to.lower(), "")
+            function = "(transfer)" if data == "0x" else data[:10]
+        status = "pending" if receipt is None else ("success" if int(receipt["status"], 16) == 1 else "failed")
+        gas_price = (receipt or {}).get("effectiveGasPrice") or tx.get("gasPrice") or "0x0"
+        return {
+            "Block": int(block["number"], 16),
+            "Timestamp": int(block["timestamp"], 16),
+            "Hash": tx["hash"],
+            "From": tx["from"],
+            "To": to or (receipt or {}).get("contractAddress") or "",
+            "Contract": contract,
+            "Function": function,
+            "Args": args,
+            "Status": status,
+            "Value (ETH)": int(tx["value"], 16) / 1e18,
+            "Gas Used": int(receipt["gasUsed"], 16) if receipt else None,
+            "Gas Price (Gwei)": int(gas_price, 16) / 1e9,
+        }
+
+    def _scan_chunk(self, start, end):
+        from lib.utils import rpc_batch
+        blocks = [b for b in rpc_batch(self.w3, [
+            ("eth_getBlockByNumber", [hex(n), True]) for n in range(start, end + 1)
+        ]) if b]
+        receipts = self._receipts(blocks)
+        return [self.decode(tx, receipts.get(tx["hash"]), b) for b in blocks for tx in b["transactions"]]
+
+    def scan(self, start, end, progress=None):
+        """TX 행 리스트 (블록/TX 순서). progress(완료 블록 수, 전체 블록 수)"""
+        start, end = max(0, start), min(end, self.w3.eth.block_number)
+        if end < start:
+            return []
+        if end - start + 1 > self.max_blocks:
+            raise ValueError(f"Range #{start:,} – #{end:,} is {end - start + 1:,} blocks (max {self.max_blocks:,})")
+        chunks = [(s, min(s + self.batch_size - 1, end)) for s in range(start, end + 1, self.batch_size)]
+        total, done, rows = end - start + 1, 0, []
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            # map은 입력 순서대로 결과를 돌려주므로 정렬이 필요 없음
+            for (s, e), chunk_rows in zip(chunks, pool.map(lambda c: self._scan_chunk(*c), chunks)):
+                rows.extend(chunk_rows)
+                done += e - s + 1
+                if progress:
+                    progress(done, total)
+        return rows
@@ -0,0 +1,144 @@
+import asyncio
+import itertools
+import threading
+import time
+from dataclasses import dataclass, field
+from urllib.parse import urlparse
+import aiohttp
+from web3 import Web3
+from web3.exceptions import Web3RPCError
+from lib.latency import RECORDER
+
+# --------------------------------------------------------------------------
+# 상수 및 설정
+# --------------------------------------------------------------------------
+BROADCAST_TIMEOUT = 5.0  # 모든 endpoint가 이 시간 안에 응답하지 않으면 실패
+# 다른 endpoint(또는 gossip)로 이미 TX를 받은 노드의 응답 -> 수락으로 간주
+ALREADY_KNOWN = ("already known", "known transaction", "already imported")
+
+@dataclass
+class BroadcastResult:
+    tx_hash: str
+    endpoint: str  # 가장 먼저 수락한 endpoint
+    latency: float  # send() 호출 -> 첫 수락
+    # endpoint -> (수락 여부, 응답 지연 초, 오류 메시지). 늦게 도착한 응답은 send() 반환 뒤에 채워짐
+    responses: dict = field(default_factory=dict)
+
+def endpoint_label(url):
+    parsed = urlparse(url)
+    return parsed.netloc or url
+
+# --------------------------------------------------------------------------
+# 다중 endpoint 동시 전송 (hedged broadcast)
+# --------------------------------------------------------------------------
+class Broadcaster:
+    """
+    서명된 raw TX 하나를 여러 RPC endpoint에 동시에 보내고, 첫 번째 수락 응답이 오면 바로 반환한다.
+    느리거나 멈춘 endpoint 하나가 방어 TX 전송 시간을 늘리지 않도록 하기 위함.
+
+    - 전용 스레드의 asyncio 루프 + aiohttp 세션 (연결 재사용, 동기 코드에서 send()로 호출)
+    - 나머지 endpoint 응답은 취소하지 않고 끝까지 받아 endpoint별 지연 시간으로 기록
+      (RECORDER: eth_sendRawTransaction@host -> Latency 페이지)
+    - delays: {url: 초} 테스트용 인위적 지연 (stand-in endpoint)
+    """
+
+    def __init__(self, urls, timeout=BROADCAST_TIMEOUT, delays=None):
+        if not urls:
+            raise ValueError("Broadcaster needs at least one endpoint")
+        self.urls = list(dict.fromkeys(urls))
+        self.timeout = timeout
+        self.delays = dict(delays or {})
+        self.stats = {url: {"sent": 0, "accepted": 0, "first": 0, "errors": 0} for url in self.urls}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._session = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="broadcast-loop", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        async def _close():
+            if self._session is not None:
+                await self._session.close()
+        asyncio.run_coroutine_threadsafe(_close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ----------------------------------------------------------------------
+    # 전송
+    # ----------------------------------------------------------------------
+    def send(self, raw_tx):
+        """raw_tx를 모든 endpoint에 전송하고 첫 수락 시 BroadcastResult 반환 (모두 실패하면 Web3RPCError)"""
+        future = asyncio.run_coroutine_threadsafe(self._broadcast(Web3.to_hex(raw_tx)), self._loop)
+        return future.result(self.timeout + 1)
+
+    async def _post(self, url, payload):
+        start = time.perf_counter()
+        try:
+            if url in self.delays:
+                await asyncio.sleep(self.delays[url])
+            async with self._session.post(url, json=payload) as resp:
+                body = await resp.json(content_type=None)
+            error = body.get("error")
+            if error is None:
+                return url, body["result"], None, time.perf_counter() - start
+            message = error.get("message", str(error)) if isinstance(error, dict) else str(error)
+            if any(s in message.lower() for s in ALREADY_KNOWN):
+                return url, None, None, time.perf_counter() - start
+            return url, None, message, time.perf_counter() - start
+        except Exception as e:
+            return url, None, f"{type(e).__name__}: {e}", time.perf_counter() - start
+
+    def _record(self, result, url, error, latency):
+        RECORDER.record_method(f"eth_sendRawTransaction@{endpoint_label(url)}", latency)
+        with self._lock:
+            self.stats[url]["sent"] += 1
+            self.stats[url]["accepted" if error is None else "errors"] += 1
+        result.responses[url] = (error is None, latency, error)
+
+    async def _broadcast(self, raw_hex):
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        tx_hash = Web3.to_hex(Web3.keccak(hexstr=raw_hex))
+        payload = {"jsonrpc": "2.0", "method": "eth_sendRawTransaction", "params": [raw_hex], "id": next(self._ids)}
+        start = time.perf_counter()
+        result = BroadcastResult(tx_hash=tx_hash, endpoint=None, latency=None)
+        errors = []
+
+        tasks = [asyncio.ensure_future(self._post(url, payload)) for url in self.urls]
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                url, returned, error, latency = task.result()
+                if error is None and returned is not None and returned.lower() != tx_hash.lower():
+                    error = f"unexpected tx hash {returned}"
+                self._record(result, url, error, latency)
+                if error is None and result.endpoint is None:
+                    result.endpoint, result.latency = url, time.perf_counter() - start
+                elif error is not None:
+                    errors.append(f"{endpoint_label(url)}: {error}")
+            if result.endpoint is not None:
+                with self._lock:
+                    self.stats[result.endpoint]["first"] += 1
+                # 나머지 응답은 기다리지 않음 (도착하면 기록만)
+                for task in pending:
+                    task.add_done_callback(lambda t: self._record(result, *self._late(t)))
+                return result
+        raise Web3RPCError(f"All {len(self.urls)} endpoints rejected the transaction: " + "; ".join(errors))
+
+    @staticmethod
+    def _late(task):
+        url, _, error, latency = task.result()
+        return url, error, latency
+
+    def summary(self):
+        """endpoint별 전송/수락/최초 수락/오류 횟수"""
+        with self._lock:
+            return {endpoint_label(url): dict(stats) for url, stats in self.stats.items()}
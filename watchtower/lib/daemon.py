@@ -0,0 +1,284 @@
+import os
+import threading
+import time
+from lib.utils import fetch_snapshot
+from lib.defense import DefenseEngine
+from lib.broadcast import Broadcaster
+from lib.relayers import RelayerPool
+from lib.gas import GasBidder, AttackGas, BudgetBelowBaseFee, GAS_BUDGET_GWEI
+from lib.receipts import ReceiptResolver
+from lib.mempool import MempoolWatcher, MempoolRules
+from lib.subscription import BlockFeed, WS_URL
+from lib.statestore import StateStore, DEFAULT_DB_PATH
+from lib.anomaly import AnomalyDetector, WINDOW
+
+try:
+    import fcntl
+except ImportError:  # Windows: 단일 실행 보장 없이 동작
+    fcntl = None
+
+# --------------------------------------------------------------------------
+# 상수 및 설정
+# --------------------------------------------------------------------------
+DEPEG_THRESHOLD = 5.0  # %
+MINT_WARNING_RATIO = 0.8  # Rate limit 대비
+VAULT_WARNING_USDT = 2000000 * 0.9
+HEARTBEAT_INTERVAL = 1.0
+# 방어 TX를 발사하는 규칙 (나머지는 경고만 기록)
+# AnomalyDetector의 창 통계(stats) 알림은 조용한 체인에서 임계값이 매우 낮아지므로 방어하지 않음
+DEFENSE_RULES = {"depeg"}
+
+# --------------------------------------------------------------------------
+# 블록 단위 고정 임계값 (절대 backstop, 대시보드와 daemon 공용)
+# 급격한 변화는 AnomalyDetector의 적응형 임계값이 먼저 잡는다
+# --------------------------------------------------------------------------
+def evaluate_snapshot(snap, depeg_threshold=DEPEG_THRESHOLD):
+    """StateSnapshot -> [(rule, message)]"""
+    if snap.paused:
+        return []
+    alerts = []
+    usage = snap.rate_limit_usage_pct
+    if usage is not None and usage > MINT_WARNING_RATIO * 100:
+        period_mint, limit = snap.period_mint / 1e18, snap.mint_limit / 1e18
+        alerts.append(("mint", f"🔥 High Mint Volume: {period_mint:,.0f} FDS (Limit: {limit:,.0f})"))
+    vault = snap.vault_usdt / 1e18
+    if vault < VAULT_WARNING_USDT:
+        alerts.append(("reserve", f"💧 Reserve Low: ${vault:,.0f}"))
+    if snap.spread_pct > depeg_threshold:
+        alerts.append(("depeg", f"📉 Severe Depeg: {snap.spread_pct:.2f}%"))
+    return alerts
+
+# --------------------------------------------------------------------------
+# 단일 실행 잠금 (watchtower 키의 유일한 사용자)
+# --------------------------------------------------------------------------
+class SingleInstanceLock:
+    def __init__(self, path):
+        self.path = path
+        self._f = None
+
+    def acquire(self):
+        """이미 다른 daemon이 실행 중이면 False"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._f = open(self.path, "w")
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self._f.close()
+                self._f = None
+                return False
+        self._f.write(str(os.getpid()))
+        self._f.flush()
+        return True
+
+    def release(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    def held(self):
+        """다른 프로세스가 잠금을 갖고 있는지 (잠그지 않고 확인만)"""
+        if fcntl is None or not os.path.exists(self.path):
+            return False
+        with open(self.path) as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+            fcntl.flock(f, fcntl.LOCK_UN)
+        return False
+
+def daemon_on_node(w3, db_path=DEFAULT_DB_PATH):
+    """w3 노드를 지키는 watchtowerd가 실행 중이면 그 상태(meta), 아니면 None"""
+    if not SingleInstanceLock(db_path + ".lock").held():
+        return None
+    store = StateStore(db_path, readonly=True)
+    try:
+        meta = store.meta()
+    finally:
+        store.db.close()
+    # 다른 노드(병렬 실험 노드 등)를 지키는 daemon이면 이 노드의 watchtower nonce와 무관
+    rpc = meta.get("rpc")
+    if rpc is not None and rpc != getattr(w3.provider, "endpoint_uri", None):
+        return None
+    return meta
+
+# --------------------------------------------------------------------------
+# Watchtower 서비스
+# --------------------------------------------------------------------------
+class Watchtower:
+    """
+    탐지(새 블록 상태 + mempool)와 방어 TX 발사를 한 프로세스에서 담당한다.
+    Streamlit 페이지가 열려 있지 않아도 동작하며, 결정은 모두 StateStore에 기록된다.
+
+    - 새 블록: 스냅샷 저장, 고정 규칙 + 창 통계(AnomalyDetector) 평가, DEFENSE_RULES(고정 규칙)면 방어
+    - mempool: 공격 TX 분류 -> 공격 TX보다 높은 우선순위 수수료로 방어 (GasBidder, 예산 이내)
+    - 같은 블록에서는 방어 TX를 한 번만 발사 (nonce 충돌 / 중복 방어 방지)
+    """
+
+    def __init__(self, w3, contracts, private_key, store, auto_defense=True,
+                 depeg_threshold=DEPEG_THRESHOLD, rules=None, ws_url=WS_URL, broadcast_urls=None, use_relayers=True,
+                 gas_budget_gwei=GAS_BUDGET_GWEI):
+        self.w3 = w3
+        self.contracts = contracts
+        self.store = store
+        self.auto_defense = auto_defense
+        self.depeg_threshold = depeg_threshold
+        # broadcast_urls: 방어 TX를 동시에 보낼 endpoint 목록 (없으면 w3 노드로만 전송)
+        self.broadcaster = Broadcaster(broadcast_urls) if broadcast_urls else None
+        self.feed = BlockFeed(w3, ws_url)
+        # 방어 TX receipt는 (relayer 경로 포함) 새 블록 알림마다 한 번에 확인
+        self.receipts = ReceiptResolver(w3, feed=self.feed)
+        self.relayers = RelayerPool(w3, contracts, broadcaster=self.broadcaster, receipts=self.receipts) if use_relayers else None
+        self.engine = DefenseEngine(w3, contracts, private_key, broadcaster=self.broadcaster, relayers=self.relayers,
+                                    receipts=self.receipts)
+        self.bidder = GasBidder(w3, gas_budget_gwei)
+        self.watcher = MempoolWatcher(w3, contracts, rules or MempoolRules(), ws_url)
+        self.detector = AnomalyDetector()
+        self.snapshot = None
+        self.started_at = time.time()
+        self.stats = {"blocks": 0, "alerts": 0, "fired": 0}
+
+        self._active_rules = set()
+        self._fired_block = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def prime(self, blocks=WINDOW, head=None):
+        """head 이전 블록들의 상태로 통계 창을 미리 채움 (재시작 직후에도 적응형 임계값 사용)"""
+        if head is None:
+            head = self.w3.eth.block_number
+        for number in range(max(0, head - blocks), head):
+            try:
+                self.detector.update(fetch_snapshot(self.contracts, number))
+            except Exception:
+                continue  # 컨트랙트 배포 이전 블록
+
+    def start(self):
+        self.prime()
+        self.engine.refresh()
+        self.feed.subscribe(self.watcher.on_block)
+        self.feed.subscribe(self.on_block)
+        self.watcher.subscribe(self.on_mempool_alert)
+        self.on_block()
+        self.feed.start()
+        self.watcher.start()
+        self.heartbeat()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.feed.stop()
+        self.watcher.stop()
+        if self.broadcaster is not None:
+            self.broadcaster.close()
+        self.store.set_meta(heartbeat=None, stopped_at=time.time())
+
+    # ----------------------------------------------------------------------
+    # 이벤트 처리
+    # ----------------------------------------------------------------------
+    def on_block(self, head=None):
+        self.engine.refresh()
+        snap = fetch_snapshot(self.contracts)
+        self.snapshot = snap
+        self.store.put_snapshot(snap)
+        self.stats["blocks"] += 1
+
+        # 같은 조건이 블록마다 반복 기록되지 않도록 새로 발생한 규칙만 알림
+        alerts = [("block", rule, message, None) for rule, message in evaluate_snapshot(snap, self.depeg_threshold)]
+        prev = self.detector.prev
+        if prev is not None and snap.block_number < prev.block_number:
+            # 노드 재시작 / evm_revert: 새 체인의 최근 블록으로 통계 창을 다시 채움 (warmup 동안 침묵하지 않도록)
+            self.detector.reset()
+            self.prime(head=snap.block_number)
+        alerts += [("stats", a.metric, a.message, a) for a in self.detector.update(snap)]
+        active = {rule for _, rule, _, _ in alerts}
+        for source, rule, message, anomaly in alerts:
+            if rule in self._active_rules:
+                continue
+            details = {"value": anomaly.value, "threshold": anomaly.threshold, "z": anomaly.z, "roc": anomaly.roc} if anomaly else None
+            alert_id = self.store.add_alert(source, rule, message, block_number=snap.block_number, details=details)
+            self.stats["alerts"] += 1
+            if rule in DEFENSE_RULES:
+                self.defend(message, alert_id)
+        self._active_rules = active
+
+    def on_mempool_alert(self, alert):
+        alert_id = self.store.add_alert(
+            "mempool", alert.rule, alert.message, tx_hash=alert.tx.tx_hash,
+            details={"function": f"{alert.tx.contract}.{alert.tx.function}", "from": alert.tx.sender,
+                     "gas_price": alert.tx.gas_price, "value": alert.value, "threshold": alert.threshold},
+        )
+        self.stats["alerts"] += 1
+        self.defend(alert.message, alert_id, attack=AttackGas.from_pending(alert.tx))
+
+    def defend(self, reason, alert_id=None, attack=None):
+        """
+        방어 TX 발사 (auto defense가 꺼져 있거나 이미 이번 블록에서 발사했으면 무시).
+        attack: 공격 TX의 가스 파라미터 (있으면 그보다 높게 입찰, 없으면 미리 서명된 TX 그대로 발사)
+        """
+        with self._lock:
+            snap = self.snapshot
+            if not self.auto_defense or snap is None or snap.paused or self._fired_block == snap.block_number:
+                return None
+            if self.engine.prepared is None:
+                self.engine.prepare()
+            try:
+                firing = self.bidder.fire(self.engine, attack, source="watchtowerd")
+            except BudgetBelowBaseFee as e:
+                # 예산을 넘겨 입찰하지 않음 -> 발사하지 못한 사실을 알림으로 남김
+                self.store.add_alert("defense", "gas_budget", f"⛽ Defense not sent: {e}", block_number=snap.block_number)
+                return None
+            self._fired_block = snap.block_number
+            self.stats["fired"] += 1
+            defense_id = self.store.add_defense(reason, firing.tx_hash, firing.prepared.gas_price, alert_id)
+
+        def finished(future):
+            try:
+                receipt = future.result()
+            except Exception as e:
+                self.store.finish_defense(defense_id, f"error: {e}")
+                return
+            # daemon은 공격 TX 포함 여부를 따로 확인하지 않음 -> 방어 TX 성공을 승리로 기록
+            self.bidder.record(receipt, won=receipt["status"] == 1, reason=reason)
+            self.store.finish_defense(
+                defense_id, "success" if receipt["status"] == 1 else "reverted",
+                receipt["blockNumber"], receipt["gasUsed"], time.time() - firing.sent_at + firing.broadcast_latency,
+            )
+        firing.receipt.add_done_callback(finished)
+        return firing
+
+    # ----------------------------------------------------------------------
+    # 메인 루프 (heartbeat / 페이지 요청 처리)
+    # ----------------------------------------------------------------------
+    def apply_commands(self):
+        for name, value in self.store.take_commands():
+            if name == "auto_defense":
+                self.auto_defense = bool(value)
+                print(f"[watchtowerd] auto defense -> {self.auto_defense}")
+
+    def heartbeat(self):
+        self.store.set_meta(
+            heartbeat=time.time(),
+            pid=os.getpid(),
+            rpc=getattr(self.w3.provider, "endpoint_uri", None),
+            started_at=self.started_at,
+            auto_defense=self.auto_defense,
+            depeg_threshold=self.depeg_threshold,
+            watchtower=self.engine.account.address,
+            feed=self.feed.mode,
+            feed_stats={**self.feed.stats, "last_error": self.feed.last_error},
+            mempool_feed=self.watcher.mode,
+            block_number=self.snapshot.block_number if self.snapshot else None,
+            stats=self.stats,
+            mempool_stats={**self.watcher.stats, "last_error": self.watcher.last_error},
+            anomaly=self.detector.summary(),
+            broadcast=self.broadcaster.summary() if self.broadcaster else None,
+            relayers=self.relayers.summary() if self.relayers else None,
+            receipts=self.receipts.summary(),
+        )
+
+    def run_forever(self, interval=HEARTBEAT_INTERVAL):
+        while not self._stop.wait(interval):
+            self.apply_commands()
+            self.heartbeat()
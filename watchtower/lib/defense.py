@@ -0,0 +1,234 @@
+import threading
+import time
+from dataclasses import dataclass, replace as replace_fields
+from eth_account import Account
+from eth_account.messages import encode_defunct
+from web3 import Web3
+from web3.exceptions import Web3RPCError
+from lib.utils import rpc_batch
+from lib.receipts import ReceiptResolver
+from lib.latency import span
+
+# --------------------------------------------------------------------------
+# 상수 및 설정
+# --------------------------------------------------------------------------
+DEFENSE_GAS = 300000
+BLACKLIST_GAS = 100000  # owner의 blacklistAccount (estimateGas 생략)
+GAS_MULTIPLIER = 1.5  # 가스비 증액 (Front-running 시도)
+
+@dataclass(frozen=True)
+class PreparedDefense:
+    """서명까지 끝난 pauseByWatchtower 트랜잭션"""
+    raw_tx: bytes
+    tx_hash: str
+    signature: bytes
+    sig_nonce: int
+    account_nonce: int
+    gas_price: int  # 최대 가스 단가 (legacy gasPrice 또는 maxFeePerGas)
+    block_number: int
+    fees: dict = None  # TX 수수료 필드 ({"gasPrice"} 또는 {"maxFeePerGas", "maxPriorityFeePerGas"})
+
+@dataclass
+class DefenseFiring:
+    tx_hash: str
+    sent_at: float
+    broadcast_latency: float  # fire() 호출 -> eth_sendRawTransaction 응답
+    receipt: object  # concurrent.futures.Future
+    prepared: PreparedDefense = None  # 교체(replace) 시 같은 서명/nonce를 다시 쓰기 위해 보관
+    relayed: object = None  # lib.relayers.RelayFiring (relayer 경로)
+    tx_hashes: list = None  # 직접 전송 경로: 원래 TX + 교체 TX (receipt는 이 중 포함된 쪽)
+
+# --------------------------------------------------------------------------
+# Ready-to-fire 방어 엔진
+# --------------------------------------------------------------------------
+class DefenseEngine:
+    """
+    방어 트랜잭션을 미리 서명해 두고, 탐지 시 eth_sendRawTransaction 한 번으로 전송한다.
+
+    - chain id / 컨트랙트 주소는 최초 1회만 조회
+    - nonces[watchtower]와 계정 nonce는 로컬에서 추적, 새 블록마다 refresh()로 동기화
+    - 영수증 대기는 ReceiptResolver가 블록 단위로 일괄 처리 (fire()는 바로 반환)
+    - broadcaster가 있으면 여러 endpoint에 동시에 전송하고 첫 수락 시 반환
+    - relayers가 있으면 서명만 watchtower가 만들고 제출은 relayer 계정들이 동시에 (watchtower nonce 미사용)
+    """
+
+    def __init__(self, w3, contracts, private_key, gas=DEFENSE_GAS, gas_multiplier=GAS_MULTIPLIER, broadcaster=None,
+                 relayers=None, receipts=None):
+        self.w3 = w3
+        self.broadcaster = broadcaster  # lib.broadcast.Broadcaster (없으면 w3 단일 endpoint로 전송)
+        self.relayers = relayers  # lib.relayers.RelayerPool (없거나 자금이 없으면 watchtower 계정으로 직접 전송)
+        self.receipts = receipts or ReceiptResolver(w3)
+        self.fds = contracts["FDS"]
+        self.fds_address = Web3.to_checksum_address(contracts["ADDRS"]["FDS"])
+        self.account = Account.from_key(private_key)
+        self.gas = gas
+        self.gas_multiplier = gas_multiplier
+        self.chain_id = w3.eth.chain_id
+
+        self.sig_nonce = None
+        self.account_nonce = None
+        self.gas_price = None
+        self.block_number = None
+        self.prepared = None
+
+        self._lock = threading.RLock()
+
+    # ----------------------------------------------------------------------
+    # 상태 동기화 (nonce / gas price / block)
+    # ----------------------------------------------------------------------
+    def sync(self):
+        nonces_call = self.fds.functions.nonces(self.account.address)._encode_transaction_data()
+        sig_nonce, account_nonce, gas_price, block_number = rpc_batch(self.w3, [
+            ("eth_call", [{"to": self.fds_address, "data": nonces_call}, "latest"]),
+            ("eth_getTransactionCount", [self.account.address, "pending"]),
+            ("eth_gasPrice", []),
+            ("eth_blockNumber", []),
+        ])
+        with self._lock:
+            self.sig_nonce = int(sig_nonce, 16)
+            self.account_nonce = int(account_nonce, 16)
+            self.gas_price = int(gas_price, 16)
+            self.block_number = int(block_number, 16)
+
+    def sign_pause(self, sig_nonce):
+        # 메시지 서명 (RPC 없이 로컬 계산)
+        message_hash = Web3.solidity_keccak(
+            ['string', 'uint256', 'address', 'uint256'],
+            ["EMERGENCY_PAUSE", self.chain_id, self.fds_address, sig_nonce]
+        )
+        return self.account.sign_message(encode_defunct(primitive=message_hash)).signature
+
+    def _sign_tx(self, signature, account_nonce, fees):
+        tx = {
+            'to': self.fds_address,
+            'data': self.fds.encode_abi("pauseByWatchtower", args=[signature]),
+            'value': 0,
+            'gas': self.gas,
+            'nonce': account_nonce,
+            'chainId': self.chain_id,
+            **fees,
+        }
+        return self.account.sign_transaction(tx)
+
+    def prepare(self, gas_price=None, bid=None):
+        """bid(lib.gas.Bid)가 있으면 그 수수료 필드(EIP-1559 또는 legacy)를 그대로 사용"""
+        with self._lock:
+            if self.sig_nonce is None:
+                self.sync()
+            with span("sign"):
+                signature = self.sign_pause(self.sig_nonce)
+                if bid is not None:
+                    fees, price = bid.tx_fields(), bid.price
+                else:
+                    price = gas_price or int(self.gas_price * self.gas_multiplier)
+                    fees = {'gasPrice': price}
+                signed = self._sign_tx(signature, self.account_nonce, fees)
+            self.prepared = PreparedDefense(
+                raw_tx=bytes(signed.raw_transaction),
+                tx_hash=Web3.to_hex(signed.hash),
+                signature=bytes(signature),
+                sig_nonce=self.sig_nonce,
+                account_nonce=self.account_nonce,
+                gas_price=price,
+                block_number=self.block_number,
+                fees=fees,
+            )
+            return self.prepared
+
+    def refresh(self, head=None):
+        """새 블록마다 호출: nonce/가스비를 다시 읽고 다음 방어 TX를 미리 서명"""
+        with self._lock:
+            self.sync()
+            if self.relayers is not None:
+                self.relayers.sync()
+            return self.prepare()
+
+    def invalidate(self):
+        # 체인 상태가 되돌려진 경우 (evm_revert 등) 다음 fire 전에 다시 동기화
+        with self._lock:
+            self.sig_nonce = None
+            self.prepared = None
+
+    # ----------------------------------------------------------------------
+    # 발사
+    # ----------------------------------------------------------------------
+    def _send(self, raw_tx):
+        with span("broadcast"):
+            if self.broadcaster is not None:
+                return Web3.to_bytes(hexstr=self.broadcaster.send(raw_tx).tx_hash)
+            return self.w3.eth.send_raw_transaction(raw_tx)
+
+    def _relay(self, prepared, start):
+        # relayer 경로: watchtower 계정 nonce를 쓰지 않으므로 서명(sig nonce)만 소비
+        with span("broadcast"):
+            relayed = self.relayers.relay(prepared.signature, prepared.gas_price, prepared.fees)
+        self.prepared = None
+        return DefenseFiring(
+            tx_hash=relayed.tx_hashes[0],
+            sent_at=relayed.sent_at,
+            broadcast_latency=relayed.sent_at - start,
+            receipt=relayed.receipt,
+            prepared=prepared,
+            relayed=relayed,
+        )
+
+    def fire(self):
+        start = time.time()
+        with self._lock:
+            prepared = self.prepared or self.prepare()
+            if self.relayers is not None and self.relayers.available(prepared.gas_price):
+                try:
+                    return self._relay(prepared, start)
+                except Web3RPCError:
+                    pass  # relayer를 쓸 수 없으면 기존 경로로 직접 전송
+            try:
+                tx_hash = self._send(prepared.raw_tx)
+            except Web3RPCError:
+                # 로컬 nonce가 어긋난 경우: 한 번만 재동기화 후 재시도
+                self.sync()
+                prepared = self.prepare()
+                tx_hash = self._send(prepared.raw_tx)
+            sent_at = time.time()
+
+            # 같은 서명/nonce는 다시 쓸 수 없음 -> 다음 블록에서 새로 준비
+            self.account_nonce = prepared.account_nonce + 1
+            self.prepared = None
+
+        tx_hashes = [Web3.to_hex(tx_hash)]
+        receipt = self.receipts.watch(tx_hashes)
+        return DefenseFiring(
+            tx_hash=tx_hashes[0],
+            sent_at=sent_at,
+            broadcast_latency=sent_at - start,
+            receipt=receipt,
+            prepared=prepared,
+            tx_hashes=tx_hashes,
+        )
+
+    # ----------------------------------------------------------------------
+    # 교체 (포함되지 않은 방어 TX의 수수료 인상)
+    # ----------------------------------------------------------------------
+    def replace(self, firing, bid):
+        """
+        같은 서명 / 같은 nonce로 수수료만 올린 TX를 다시 보낸다. 반환: 새 DefenseFiring (이미 포함됐으면 None)
+        receipt Future는 원래 firing과 공유 (감시 대상 tx_hashes에 교체 TX만 추가).
+        relayer 경로면 아직 대기 중인 relayer TX를 모두 교체한다.
+        """
+        if firing.relayed is not None:
+            if not self.relayers.replace(firing.relayed, bid.tx_fields()):
+                return None
+            return firing
+
+        prepared = firing.prepared
+        signed = self._sign_tx(prepared.signature, prepared.account_nonce, bid.tx_fields())
+        try:
+            tx_hash = self._send(bytes(signed.raw_transaction))
+        except Web3RPCError:
+            return None  # 그 사이 원래 TX가 포함됨 (nonce too low)
+        firing.tx_hashes.append(Web3.to_hex(tx_hash))
+        return replace_fields(
+            firing,
+            tx_hash=Web3.to_hex(tx_hash),
+            prepared=replace_fields(prepared, raw_tx=bytes(signed.raw_transaction), tx_hash=Web3.to_hex(tx_hash),
+                                    gas_price=bid.price, fees=bid.tx_fields()),
+        )
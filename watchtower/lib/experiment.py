@@ -0,0 +1,455 @@
+import json
+import os
+import random
+import time
+import uuid
+from dataclasses import dataclass, asdict
+from lib.utils import send_defense_tx, rpc_batch, get_defense_engine, get_gas_bidder, get_receipt_resolver, check_watchtower_key
+from lib.gas import AttackGas, GAS_BUDGET_GWEI
+from lib.amm import DumpImpactModel
+from lib.latency import PHASES, span, record_span, trace
+from lib.defense import BLACKLIST_GAS
+
+# --------------------------------------------------------------------------
+# 실험 설정
+# --------------------------------------------------------------------------
+EXP_TYPES = ["Infinite Mint", "Vault Drain", "Flash Loan Depeg"]
+DEFENSE_ACTIONS = [
+    "🚫 FDS 코인 전체 일시정지 (System Pause)",
+    "🧊 해커 지갑 동결 (Wallet Freeze)",
+    "🏦 준비금 컨트랙트 보호 (Vault Safe Mode)",
+]
+
+@dataclass
+class ExperimentConfig:
+    exp_type: str = "Infinite Mint"
+    fds_threshold: float = 50000
+    attack_range: tuple = (40000, 150000)
+    gas_volatility: float = 20
+    delay_range: tuple = (100, 500)  # ms
+    defense_action: str = DEFENSE_ACTIONS[0]
+    gas_budget_gwei: float = GAS_BUDGET_GWEI  # 방어 TX 최대 가스비 (공격 TX보다 높게 입찰하되 이 이내)
+    seed: int = None
+
+    def to_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        for key in ("attack_range", "delay_range"):
+            if key in data:
+                data[key] = tuple(data[key])
+        return cls(**data)
+
+    def rng(self, idx):
+        # seed가 있으면 반복(iteration)마다 재현 가능한 난수열
+        return random.Random(None if self.seed is None else self.seed * 1_000_003 + idx)
+
+# --------------------------------------------------------------------------
+# 반복 간 상태 격리 (evm_snapshot / evm_revert)
+# --------------------------------------------------------------------------
+class BaselineSnapshot:
+    """
+    실험 시작 시점의 체인 상태를 evm_snapshot으로 저장해 두고,
+    매 반복 전에 되돌려서 모든 반복이 같은 초기 상태에서 시작하도록 한다.
+    """
+
+    def __init__(self, contracts):
+        self.contracts = contracts
+        self.w3 = contracts["FDS"].w3
+        self.snapshot_id = self.w3.manager.request_blocking("evm_snapshot", [])
+
+    def restore(self):
+        # Hardhat은 revert 시 스냅샷을 소모하므로 같은 batch 안에서 바로 다시 저장
+        _, self.snapshot_id = rpc_batch(self.w3, [
+            ("evm_revert", [self.snapshot_id]),
+            ("evm_snapshot", []),
+        ])
+        # 미리 서명해 둔 방어 TX의 nonce가 더 이상 유효하지 않음
+        get_defense_engine(self.contracts).invalidate()
+
+# --------------------------------------------------------------------------
+# 1회 실험 (공격 -> 탐지 -> 방어 -> 판정)
+# --------------------------------------------------------------------------
+def run_iteration(contracts, accs, cfg, idx, log=None, baseline=None):
+    """
+    공격 1회를 실행하고 결과 행(dict)을 돌려준다. 예상하지 못한 오류면 None.
+    log(lines)는 로그가 갱신될 때마다 호출된다 (Streamlit placeholder, print 등).
+    baseline(BaselineSnapshot)을 주면 시작 전에 기준 상태로 되돌린다.
+    결과 행에는 detect/sign/broadcast/include 단계별 소요 시간(ms)이 포함된다.
+    """
+    with trace() as phases:
+        row = _run_iteration(contracts, accs, cfg, idx, log, baseline)
+    if row is not None:
+        for phase in PHASES:
+            row[f"{phase.capitalize()}_ms"] = phases[phase] * 1000 if phase in phases else None
+    return row
+
+def _run_iteration(contracts, accs, cfg, idx, log, baseline):
+    w3 = contracts["FDS"].w3
+    rng = cfg.rng(idx)
+    logs = []
+
+    def emit():
+        if log is not None:
+            log(logs)
+
+    exp_type = cfg.exp_type
+    fds_threshold = cfg.fds_threshold
+    defense_action = cfg.defense_action
+
+    try:
+        # Step 0: Initial State
+        if baseline is not None:
+            baseline.restore()
+        start_block = w3.eth.block_number
+        base_fee = w3.eth.gas_price
+
+        # Randomize Environment
+        random_gas_mult = 1 + (rng.uniform(-cfg.gas_volatility, cfg.gas_volatility) / 100)
+        sim_gas_price = int(base_fee * random_gas_mult)
+        sim_delay = rng.uniform(cfg.delay_range[0], cfg.delay_range[1]) / 1000.0
+
+        logs.append(f"⏱️ [Iter {idx}] 환경: Gas {sim_gas_price/1e9:.2f} Gwei | Latency {sim_delay*1000:.0f}ms")
+
+        # Scenario Details Logging
+        if exp_type == "Infinite Mint":
+            logs.append(f"🎯 타겟 코인: FDS ({contracts['ADDRS']['FDS']})")
+            logs.append(f"👾 해커 주소: {accs['hacker'].address}") # Infinite Mint also implies hacker action
+        elif exp_type == "Vault Drain":
+            logs.append(f"🏦 준비금 컨트랙트: Vault ({contracts['ADDRS']['Vault']})")
+            logs.append(f"👾 해커 주소: {accs['hacker'].address}")
+        elif exp_type == "Flash Loan Depeg":
+            logs.append(f"📉 DEX 컨트랙트: {contracts['ADDRS']['DEX']}")
+            logs.append(f"👾 해커 주소: {accs['hacker'].address}")
+
+        # Generate Attack Amount
+        attack_amount_float = rng.uniform(cfg.attack_range[0], cfg.attack_range[1])
+        attack_amount_wei = w3.to_wei(attack_amount_float, 'ether')
+        logs.append(f"⚔️ 공격 시도: {attack_amount_float:,.0f} (Rule: {fds_threshold:,.1f})")
+
+        emit()
+
+        # Check Logic: Does this trigger FDS?
+        detect_started = time.perf_counter()
+        triggered = False
+        if exp_type == "Infinite Mint":
+            if attack_amount_float >= fds_threshold: triggered = True
+        elif exp_type == "Vault Drain":
+            # Need to know current vault balance to calculate %?
+            # For sim simplicity, assume Vault has 1,000,000 USDT (initial state)
+            # Or fetch real state? Real state is better.
+            vault_bal = contracts["USDT"].functions.balanceOf(contracts["ADDRS"]["Vault"]).call()
+            vault_bal_float = float(w3.from_wei(vault_bal, 'ether'))
+            if vault_bal_float > 0:
+                drain_pct = (attack_amount_float / vault_bal_float) * 100
+                if drain_pct >= fds_threshold: triggered = True
+                logs.append(f"   - 예상 인출: {drain_pct:.2f}% (Limit: {fds_threshold}%)")
+
+        elif exp_type == "Flash Loan Depeg":
+            # 현재 준비금으로 simulateDump 이후의 가격을 정확히 계산 (추가 RPC 없음)
+            amm = DumpImpactModel.read(contracts)
+            impact_pct = float(amm.spread_after(attack_amount_float))
+            if impact_pct >= fds_threshold: triggered = True
+            logs.append(f"   - 예상 괴리: {impact_pct:.2f}% (Limit: {fds_threshold}%, 현재 {amm.spread_pct:.2f}%)")
+        record_span("detect", time.perf_counter() - detect_started)
+
+        # Step 1: Execute Attack (Simulated latency)
+        time.sleep(sim_delay)
+
+        attack_tx_hash = None
+
+        # Send Attack TX
+        if exp_type == "Infinite Mint":
+            tx = contracts["FDS"].functions.exploitMint(attack_amount_wei).build_transaction({
+                'from': accs['hacker'].address, 'nonce': w3.eth.get_transaction_count(accs['hacker'].address), 'gasPrice': sim_gas_price
+            })
+            signed_tx = w3.eth.account.sign_transaction(tx, accs['hacker'].key)
+            attack_tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+
+        elif exp_type == "Vault Drain":
+             tx = contracts["Vault"].functions.exploitDrain(attack_amount_wei).build_transaction({
+                'from': accs['hacker'].address, 'nonce': w3.eth.get_transaction_count(accs['hacker'].address), 'gasPrice': sim_gas_price
+            })
+             signed_tx = w3.eth.account.sign_transaction(tx, accs['hacker'].key)
+             attack_tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+
+        elif exp_type == "Flash Loan Depeg":
+             # Fix: Flash Loan should NOT mint new tokens (keeps supply constant).
+             # Instead, we "Borrow" from a liquidity provider (Deployer/Account0) and "Repay".
+             deployer_acc = w3.eth.accounts[0]
+
+             # 1. Borrow (Transfer from Deployer -> Hacker)
+             # Note: logic assumes Deployer has enough funds (starts with 500k+).
+             funding_tx = contracts["FDS"].functions.transfer(accs['hacker'].address, attack_amount_wei).build_transaction({
+                 'from': deployer_acc,
+                 'nonce': w3.eth.get_transaction_count(deployer_acc),
+                 'gasPrice': sim_gas_price
+             })
+             w3.eth.send_transaction(funding_tx) # Account 0 is unlocked
+
+             # Prepare Nonce
+             hacker_nonce = w3.eth.get_transaction_count(accs['hacker'].address)
+
+             # 2. Dump (Attack)
+             tx = contracts["DEX"].functions.simulateDump(attack_amount_wei).build_transaction({
+                'from': accs['hacker'].address,
+                'nonce': hacker_nonce,
+                'gasPrice': sim_gas_price
+             })
+             signed_tx = w3.eth.account.sign_transaction(tx, accs['hacker'].key)
+             attack_tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+
+             # 3. Repay (Return funds to Deployer to simulate Flash Loan atomicity)
+             repay_tx = contracts["FDS"].functions.transfer(deployer_acc, attack_amount_wei).build_transaction({
+                 'from': accs['hacker'].address,
+                 'nonce': hacker_nonce + 1,
+                 'gasPrice': sim_gas_price
+             })
+             signed_repay = w3.eth.account.sign_transaction(repay_tx, accs['hacker'].key)
+             w3.eth.send_raw_transaction(signed_repay.raw_transaction)
+
+        # 공격 TX receipt는 방어와 동시에 기다림 (블록 단위 일괄 확인)
+        receipts = get_receipt_resolver(w3)
+        attack_receipt_future = receipts.watch(attack_tx_hash)
+
+        # 공격 TX의 가스 파라미터 (방어 TX 입찰 기준)
+        attack_gas = AttackGas.from_tx(tx)
+        bidder = get_gas_bidder(w3)
+
+        # Step 2: Defense Logic
+        receipt = None
+        defense_latency = 0
+        defense_block = 999999999 # Default high
+        defense_gas = 0
+
+        if triggered:
+
+            logs.append(f"🚨 탐지 성공! 대응 조치 실행: **{defense_action.split('(')[0].strip()}**")
+
+            # Logic Branch based on Action
+            # Note: In this prototype, FDSStablecoin only supports 'System Pause'.
+            # Other actions will simulate the effect or fall back to System Pause with a log note.
+
+            if "Wallet Freeze" in defense_action:
+                logs.append("   👉 해커 지갑(Blacklist) 동결 트랜잭션 실행 중...")
+
+                # Execute Blacklist Transaction (as Owner)
+                try:
+                    owner = accs['owner']
+                    # We use Owner only for this specific action in simulation
+                    # (In production, Watchtower might need a specific delegated function like pauseByWatchtower)
+                    defense_func = contracts["FDS"].functions.blacklistAccount(accs['hacker'].address)
+                    bid = bidder.bid(attack_gas, cfg.gas_budget_gwei)
+                    # gas를 지정해 측정 구간 안에서 estimateGas가 호출되지 않도록 함
+                    tx = defense_func.build_transaction({
+                        'from': owner.address,
+                        'nonce': w3.eth.get_transaction_count(owner.address),
+                        'gas': BLACKLIST_GAS,
+                        **bid.tx_fields()
+                    })
+                    # owner 키로 로컬 서명 (pause와 같이 sign / broadcast 구간을 나눠 기록)
+                    defense_started = time.time()
+                    with span("sign"):
+                        raw_tx = owner.sign_transaction(tx).raw_transaction
+                    with span("broadcast"):
+                        tx_hash = w3.eth.send_raw_transaction(raw_tx)
+                    bidder.track(tx_hash, source="experiment", attack=attack_gas, bid=bid)
+                    with span("include"):
+                        receipt = receipts.wait(tx_hash)
+                    defense_latency = time.time() - defense_started
+                    defense_block = receipt['blockNumber']
+                    defense_gas = receipt['gasUsed']
+
+                    logs.append("   ✅ 해커 지갑 동결 완료 (Blacklisted)")
+
+                except Exception as e:
+                    logs.append(f"   ❌ 동결 실패: {e}")
+                    # Fallback to Pause if blacklist fails?
+                    receipt, defense_latency = send_defense_tx(contracts, f"Auto-Defense (Fallback): {defense_action}", attack_gas, cfg.gas_budget_gwei)
+                    defense_block = receipt['blockNumber']
+                    defense_gas = receipt['gasUsed']
+
+            elif "Vault Safe Mode" in defense_action:
+                logs.append("   👉 (Simulated) Vault 인출 제한 모드 전환 중...")
+                logs.append("   ⚠️ 현재 Vault는 Pausable 미지원 -> FDS System Pause로 대체 실행")
+                # Still fallback to Pause for Vault
+                receipt, defense_latency = send_defense_tx(contracts, f"Auto-Defense: {defense_action}", attack_gas, cfg.gas_budget_gwei)
+                defense_block = receipt['blockNumber']
+                defense_gas = receipt['gasUsed']
+            else:
+                # System Pause (Default)
+                receipt, defense_latency = send_defense_tx(contracts, f"Auto-Defense: {defense_action}", attack_gas, cfg.gas_budget_gwei)
+                defense_block = receipt['blockNumber']
+                defense_gas = receipt['gasUsed']
+        else:
+             logs.append("⚠️ 탐지 실패 (임계값 미달) - 방어 건너뜀")
+
+        # Wait for Attack Confirmation
+        attack_receipt = attack_receipt_future.result()
+        attack_block = attack_receipt['blockNumber']
+
+        # Step 3: Result Analysis
+        success = False
+        status_msg = ""
+
+        if not triggered:
+            status_msg = "❌ 미탐지 (Threshold Underrun)"
+            if attack_receipt['status'] == 1:
+                status_msg += " - 공격 성공함"
+            else:
+                 # Check if reverted by Rate Limit
+                 status_msg += " - 공격 실패 (Revert됨: On-chain Backstop)"
+                 # This counts as a form of success for the SYSTEM, but maybe not the Watchtower FRONT-RUNNING.
+                 # Let's mark it as partial success or distinct category.
+                 success = True # System protected
+        else:
+            if defense_block < attack_block:
+                status_msg = "✅ 방어 성공 (Front-run)"
+                success = True
+            elif defense_block == attack_block:
+                if receipt['transactionIndex'] < attack_receipt['transactionIndex']:
+                    status_msg = "✅ 방어 성공 (우선순위 승리)"
+                    success = True
+                else:
+                    status_msg = "❌ 방어 실패 (우선순위 패배)"
+            else:
+                 # Even if Watchtower was late, did the On-chain Backstop catch it?
+                 if attack_receipt['status'] == 0:
+                     status_msg = "✅ 방어 성공 (Watchtower 지연됐으나 On-chain Backstop이 차단)"
+                     success = True
+                 else:
+                    status_msg = "❌ 방어 실패 (지연됨)"
+
+        if receipt is not None:
+            # 입찰 결과 기록: 공격 TX보다 먼저 포함됐는지 (Research Metrics의 비용 vs 승률)
+            won = defense_block < attack_block or (
+                defense_block == attack_block and receipt['transactionIndex'] < attack_receipt['transactionIndex'])
+            bidder.record(receipt, won, exp_type=exp_type, defense_action=defense_action, iteration=idx)
+
+        logs.append(f"⚔️ 공격 블록: {attack_block} | 🛡️ 방어 블록: {defense_block if triggered else 'N/A'}")
+        logs.append(f"결과: {status_msg}")
+        emit()
+
+        # Resume System (스냅샷 격리를 쓰지 않을 때만 필요)
+        if baseline is None:
+            owner = w3.eth.accounts[0]
+            try:
+                contracts["FDS"].functions.resumeService().transact({'from': owner})
+            except:
+                pass
+
+        return {
+            "Iteration": idx,
+            "Type": exp_type,
+            "AttackAmt": attack_amount_float,
+            "Threshold": fds_threshold,
+            "Triggered": triggered,
+            "Success": success,
+            "BlockDiff": (defense_block - attack_block) if triggered else None,
+            "DefenseCost_Gas": defense_gas,
+            "GasPrice_Gwei": sim_gas_price / 1e9,
+            "DefenseGasPrice_Gwei": receipt["effectiveGasPrice"] / 1e9 if receipt is not None else None,
+            "Latency_Sec": sim_delay,
+            "DefenseLatency_Sec": defense_latency if triggered else None,
+            "Status": status_msg
+        }
+
+    except Exception as e:
+        error_str = str(e)
+        if "Rate limit exceeded" in error_str or "System Paused" in error_str:
+            # This is an On-chain Backstop trigger!
+            logs.append("🛡️ On-chain Backstop 발동! (Rate Limit Exceeded)")
+            logs.append("결과: ✅ 방어 성공 (스마트 컨트랙트 자동 차단)")
+            emit()
+
+            # Resume needed? Yes, system is paused. (스냅샷 격리 시 다음 반복에서 되돌림)
+            if baseline is None:
+                owner = w3.eth.accounts[0]
+                try:
+                    contracts["FDS"].functions.resumeService().transact({'from': owner})
+                except:
+                    pass
+
+            return {
+                "Iteration": idx,
+                "Type": exp_type,
+                "AttackAmt": -1, # Unknown or from context
+                "Threshold": fds_threshold,
+                "Triggered": True, # Backstop triggered
+                "Success": True,
+                "BlockDiff": 0,
+                "DefenseCost_Gas": 0, # No watchtower gas used
+                "Status": "✅ 방어 성공 (On-chain Backstop)"
+            }
+        else:
+            logs.append(f"Error: {e}")
+            emit()
+            return None
+
+# --------------------------------------------------------------------------
+# Headless 실험 엔진
+# --------------------------------------------------------------------------
+class ExperimentEngine:
+    """
+    Streamlit 없이 시나리오를 반복 실행한다. (CLI / Streamlit 페이지 공용)
+
+    engine = ExperimentEngine(contracts, accs, cfg)
+    for row in engine.run(100):
+        ...
+    """
+
+    def __init__(self, contracts, accs, cfg, isolate=True):
+        self.contracts = contracts
+        self.accs = accs
+        self.cfg = cfg
+        self.isolate = isolate
+
+    def run(self, iterations, start=1, log=None, on_iteration=None):
+        """
+        반복을 순서대로 실행하며 결과 행을 하나씩 yield 한다.
+        log(idx, lines): 반복별 로그 갱신, on_iteration(idx): 반복 시작 직전 호출
+        """
+        # 반복 안에서는 오류가 결과 누락(None)으로만 남으므로 시작 전에 확인
+        check_watchtower_key(self.contracts["FDS"].w3)
+        baseline = BaselineSnapshot(self.contracts) if self.isolate else None
+        try:
+            for idx in range(start, start + iterations):
+                if on_iteration is not None:
+                    on_iteration(idx)
+                row_log = (lambda lines, idx=idx: log(idx, lines)) if log else None
+                row = run_iteration(self.contracts, self.accs, self.cfg, idx, log=row_log, baseline=baseline)
+                if row:
+                    yield row
+        finally:
+            if baseline is not None:
+                baseline.restore()
+
+# --------------------------------------------------------------------------
+# 결과 스트리밍 저장 (JSON Lines)
+# --------------------------------------------------------------------------
+class JsonlResultSink:
+    """결과 행을 한 줄씩 바로 파일에 추가 (중간에 중단돼도 이미 끝난 반복은 보존)"""
+
+    def __init__(self, path, cfg, run_id=None):
+        self.path = path
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._f = open(path, "a", encoding="utf-8")
+        self._f.write(json.dumps({"run_id": self.run_id, "config": cfg.to_dict(), "started_at": time.time()}, ensure_ascii=False) + "\n")
+        self._f.flush()
+
+    def write(self, row):
+        self._f.write(json.dumps({"run_id": self.run_id, **row}, ensure_ascii=False, default=str) + "\n")
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
@@ -0,0 +1,319 @@
+import time
+from dataclasses import dataclass
+import numpy as np
+from lib.utils import aggregate_calls, fetch_snapshot
+from lib.gas import OUTBID_MULTIPLIER, DEFAULT_MULTIPLIER
+from lib.amm import DumpImpactModel
+
+# --------------------------------------------------------------------------
+# 상수 및 설정
+# --------------------------------------------------------------------------
+# 방어 TX 가스 사용량 (Hardhat에서 측정, calibrate()로 확인)
+DEFENSE_GAS_USED = {"pause": 60062, "blacklist": 47332}
+
+# run_iteration()이 남기는 Status 문자열 (결과를 그대로 비교할 수 있도록 동일하게 유지)
+STATUS_UNDETECTED = "❌ 미탐지 (Threshold Underrun) - 공격 성공함"
+STATUS_FRONT_RUN = "✅ 방어 성공 (Front-run)"
+STATUS_PRIORITY_WIN = "✅ 방어 성공 (우선순위 승리)"
+STATUS_PRIORITY_LOSS = "❌ 방어 실패 (우선순위 패배)"
+STATUS_LATE = "❌ 방어 실패 (지연됨)"
+STATUS_LATE_BACKSTOP = "✅ 방어 성공 (Watchtower 지연됐으나 On-chain Backstop이 차단)"
+STATUS_BACKSTOP = "✅ 방어 성공 (On-chain Backstop)"
+STATUSES = [
+    STATUS_UNDETECTED, STATUS_FRONT_RUN, STATUS_PRIORITY_WIN, STATUS_PRIORITY_LOSS,
+    STATUS_LATE, STATUS_LATE_BACKSTOP, STATUS_BACKSTOP,
+]
+
+class CalibrationError(AssertionError):
+    pass
+
+# --------------------------------------------------------------------------
+# 초기 체인 상태
+# --------------------------------------------------------------------------
+@dataclass(frozen=True)
+class ChainState:
+    """모델이 사용하는 기준 상태 (단위: wei)"""
+    paused: bool
+    vault_usdt: int
+    oracle_price: int
+    period_mint: int
+    period_end: int
+    mint_limit: int
+    reserve_fds: int
+    reserve_usdt: int
+    deployer_fds: int
+    hacker_blacklisted: bool
+    timestamp: int
+    gas_price: int
+    base_fee: int = None  # baseFeePerGas (None이면 legacy 체인: GasBidder와 같이 eth_gasPrice 기준)
+
+    @classmethod
+    def read(cls, contracts, accs):
+        """현재 노드 상태를 한 블록 기준으로 읽는다 (BaselineSnapshot 직후에 호출)"""
+        w3 = contracts["FDS"].w3
+        fds = contracts["FDS"]
+        snap = fetch_snapshot(contracts)
+        if snap.period_mint is None or snap.mint_limit is None:
+            raise RuntimeError("Fast Mode needs the rate limit views (currentPeriodMintAmount / mintLimitPerPeriod)")
+        block_number, (period_end, deployer_fds, blacklisted) = aggregate_calls(w3, [
+            fds.functions.currentPeriodEnd(),
+            fds.functions.balanceOf(w3.eth.accounts[0]),
+            fds.functions.isBlacklisted(accs['hacker'].address),
+        ], snap.block_number)
+        block = w3.eth.get_block(block_number)
+        return cls(
+            paused=snap.paused,
+            vault_usdt=snap.vault_usdt,
+            oracle_price=snap.oracle_price,
+            period_mint=snap.period_mint,
+            period_end=period_end,
+            mint_limit=snap.mint_limit,
+            reserve_fds=snap.reserve_fds,
+            reserve_usdt=snap.reserve_usdt,
+            deployer_fds=deployer_fds,
+            hacker_blacklisted=blacklisted,
+            timestamp=block["timestamp"],
+            gas_price=w3.eth.gas_price,
+            base_fee=block.get("baseFeePerGas"),
+        )
+
+# --------------------------------------------------------------------------
+# 표본 생성
+# --------------------------------------------------------------------------
+def sample_trials(cfg, n, start=1):
+    """n개 시행의 (gas 배수, 지연, 공격량)을 한 번에 생성"""
+    rng = np.random.default_rng(cfg.seed)
+    vol = cfg.gas_volatility
+    return {
+        "Iteration": np.arange(start, start + n),
+        "gas_mult": 1 + rng.uniform(-vol, vol, n) / 100,
+        "delay": rng.uniform(cfg.delay_range[0], cfg.delay_range[1], n) / 1000.0,
+        "amount": rng.uniform(cfg.attack_range[0], cfg.attack_range[1], n),
+    }
+
+def runner_trials(cfg, indices):
+    """run_iteration()과 같은 난수열 (cfg.rng(idx), 같은 호출 순서) -> 검증용"""
+    gas, delay, amount = [], [], []
+    for idx in indices:
+        rng = cfg.rng(idx)
+        gas.append(1 + rng.uniform(-cfg.gas_volatility, cfg.gas_volatility) / 100)
+        delay.append(rng.uniform(cfg.delay_range[0], cfg.delay_range[1]) / 1000.0)
+        amount.append(rng.uniform(cfg.attack_range[0], cfg.attack_range[1]))
+    return {
+        "Iteration": np.asarray(indices),
+        "gas_mult": np.asarray(gas),
+        "delay": np.asarray(delay),
+        "amount": np.asarray(amount),
+    }
+
+# --------------------------------------------------------------------------
+# 방어 TX 입찰 (GasBidder.bid의 벡터화)
+# --------------------------------------------------------------------------
+def defense_bids(state, attack_price, budget_gwei, multiplier=OUTBID_MULTIPLIER):
+    """
+    legacy 공격 TX gasPrice 배열 -> (공격 tip, 방어 tip, 방어 최대 단가, base fee 미달 여부)
+    GasBidder.bid(AttackGas(gas_price=...), budget_gwei)와 같은 계산
+    """
+    attack_price = np.asarray(attack_price, dtype=float)
+    budget = int(budget_gwei * 1e9)
+    if state.base_fee is not None:
+        base = state.base_fee
+        attack_tip = np.maximum(attack_price - base, 0)
+        priority = np.floor(attack_tip * multiplier) + 1
+        max_fee = 2 * base + priority
+        over = max_fee > budget
+        max_fee = np.where(over, budget, max_fee)
+        priority = np.where(over, np.maximum(np.minimum(priority, max_fee - base), 0), priority)
+        tip = np.maximum(np.minimum(priority, max_fee - base), 0)
+        price = max_fee
+    else:
+        base = state.gas_price
+        attack_tip = np.maximum(attack_price - base, 0)
+        price = np.maximum(int(state.gas_price * DEFAULT_MULTIPLIER), np.floor(attack_price * multiplier) + 1)
+        price = np.minimum(price, budget)
+        tip = np.maximum(price - base, 0)
+    return attack_tip, tip, price, price < base
+
+# --------------------------------------------------------------------------
+# 벡터화 모델
+# --------------------------------------------------------------------------
+class FastSimulator:
+    """
+    FDSStablecoin / MockVault / MockDEX와 run_iteration()의 판정 로직을 NumPy 배열로 재현한다.
+
+    mining="auto"     : Hardhat automine (TX마다 블록 1개) - run_iteration()과 동일
+    mining="interval" : 공격/방어 TX가 같은 블록에 들어가고 우선순위 수수료(tip) 순으로 정렬 (front-run 경쟁)
+    방어 TX 수수료는 GasBidder와 같이 공격 TX tip x 1.125 + 1, cfg.gas_budget_gwei 이내
+    """
+
+    def __init__(self, state, defense_gas=None, mining="auto"):
+        self.state = state
+        self.defense_gas = dict(DEFENSE_GAS_USED, **(defense_gas or {}))
+        self.mining = mining
+
+    def detect(self, cfg, amount):
+        """FDS 탐지 규칙 (run_iteration의 triggered 계산과 동일)"""
+        if cfg.exp_type == "Infinite Mint":
+            return amount >= cfg.fds_threshold
+        if cfg.exp_type == "Vault Drain":
+            vault = self.state.vault_usdt / 1e18
+            if vault <= 0:
+                return np.zeros(amount.shape, dtype=bool)
+            return amount / vault * 100 >= cfg.fds_threshold
+        amm = DumpImpactModel(self.state.reserve_fds, self.state.reserve_usdt, self.state.oracle_price)
+        return amm.spread_after(amount) >= cfg.fds_threshold
+
+    def run(self, cfg, trials):
+        """trials(sample_trials/runner_trials 결과) -> 결과 컬럼 dict (run_iteration 행과 같은 컬럼)"""
+        s = self.state
+        n = len(trials["amount"])
+        amount = trials["amount"]
+        amount_wei = amount * 1e18
+        triggered = self.detect(cfg, amount)
+        attack_price = np.floor(s.gas_price * trials["gas_mult"])
+        attack_tip, defense_tip, _, below_base = defense_bids(s, attack_price, cfg.gas_budget_gwei)
+
+        # 1) 공격 TX가 gas 추정 단계에서 revert 되는지 (run_iteration에서는 예외 -> 행 없음 / Backstop 행)
+        valid = np.ones(n, dtype=bool)
+        backstop = np.zeros(n, dtype=bool)
+        if cfg.exp_type == "Infinite Mint":
+            if s.paused or s.hacker_blacklisted:
+                valid[:] = False
+            else:
+                # _checkMintLimit: 기간이 지났으면 리셋 후 누적, 한도 초과 시 revert
+                period_mint = 0 if s.timestamp + 1 > s.period_end else s.period_mint
+                backstop = period_mint + amount_wei > s.mint_limit
+        elif cfg.exp_type == "Vault Drain":
+            valid = amount_wei <= s.vault_usdt
+        else:
+            # 차입(transfer) -> simulateDump (reserveUSDT -= x/2 underflow 불가)
+            if s.paused or s.hacker_blacklisted:
+                valid[:] = False
+            else:
+                valid = (amount_wei <= s.deployer_fds) & (amount_wei / 2 <= s.reserve_usdt)
+
+        # 2) 블록 배치: 방어 TX가 공격 TX보다 앞서는지
+        # automine: 공격(+상환) TX가 먼저 채굴되고 방어는 그 다음 블록
+        # interval: 같은 블록, tip이 높은 쪽이 먼저 (같으면 먼저 도착한 공격 TX)
+        after_attack = 2 if cfg.exp_type == "Flash Loan Depeg" else 1
+        if self.mining == "interval":
+            defense_first = defense_tip > attack_tip
+            block_diff = np.zeros(n)
+        else:
+            defense_first = np.zeros(n, dtype=bool)
+            block_diff = np.full(n, float(after_attack))
+
+        # 3) 공격 TX 성공 여부 (방어가 먼저 반영된 경우)
+        # pause: FDS 전송/발행 불가, blacklist: 해커 주소 FDS 전송/발행 불가 -> Vault/DEX 호출은 영향 없음
+        attack_reverted = defense_first & triggered & (cfg.exp_type == "Infinite Mint")
+
+        # 4) 판정 (run_iteration의 Step 3과 같은 분기)
+        status = np.full(n, STATUSES.index(STATUS_UNDETECTED), dtype=np.int8)
+        success = np.zeros(n, dtype=bool)
+        same_block = block_diff == 0
+        win = triggered & same_block & defense_first
+        loss = triggered & same_block & ~defense_first
+        late = triggered & (block_diff > 0)
+        status[win] = STATUSES.index(STATUS_PRIORITY_WIN)
+        status[loss] = STATUSES.index(STATUS_PRIORITY_LOSS)
+        status[late & ~attack_reverted] = STATUSES.index(STATUS_LATE)
+        status[late & attack_reverted] = STATUSES.index(STATUS_LATE_BACKSTOP)
+        success |= win | (late & attack_reverted)
+
+        if "Wallet Freeze" in cfg.defense_action:
+            gas_used = self.defense_gas["blacklist"]
+        else:
+            gas_used = self.defense_gas["pause"]
+        defense_gas = np.where(triggered, gas_used, 0)
+        # 실제로 내는 단가 (base fee + tip)
+        base = s.base_fee if s.base_fee is not None else s.gas_price
+        defense_price = np.where(triggered, (base + defense_tip) / 1e9, np.nan)
+
+        # Backstop 행은 run_iteration의 예외 분기와 같은 값으로 덮어씀
+        status[backstop] = STATUSES.index(STATUS_BACKSTOP)
+        triggered = triggered | backstop
+        success = success | backstop
+        block_diff = np.where(triggered, block_diff, np.nan)
+        block_diff[backstop] = 0
+        defense_gas[backstop] = 0
+        defense_price[backstop] = np.nan
+
+        # 예산이 base fee보다 낮으면 방어 TX를 보내지 않음 (run_iteration은 BudgetBelowBaseFee -> 행 없음)
+        keep = valid & ~(triggered & below_base & ~backstop)
+        return {
+            "Iteration": trials["Iteration"][keep],
+            "Type": np.full(keep.sum(), cfg.exp_type, dtype=object),
+            "AttackAmt": np.where(backstop, -1.0, amount)[keep],
+            "Threshold": np.full(keep.sum(), float(cfg.fds_threshold)),
+            "Triggered": triggered[keep],
+            "Success": success[keep],
+            "BlockDiff": block_diff[keep],
+            "DefenseCost_Gas": defense_gas[keep],
+            "GasPrice_Gwei": (attack_price / 1e9)[keep],
+            "DefenseGasPrice_Gwei": defense_price[keep],
+            "Latency_Sec": trials["delay"][keep],
+            "Status": np.asarray(STATUSES, dtype=object)[status[keep]],
+        }
+
+    def simulate(self, cfg, n, start=1):
+        return self.run(cfg, sample_trials(cfg, n, start))
+
+# --------------------------------------------------------------------------
+# 검증 (Hardhat 노드에서 일부 시행을 재실행해 결과 비교)
+# --------------------------------------------------------------------------
+COMPARED_COLUMNS = ("Triggered", "Success", "BlockDiff", "Status")
+
+def calibrate(contracts, accs, cfg, samples=20, iterations=None, strict=True, log=None):
+    """
+    같은 cfg/seed로 run_iteration()을 samples번 실행하고 모델 결과와 비교한다.
+    strict=True면 판정(COMPARED_COLUMNS)이 하나라도 다르면 CalibrationError.
+    """
+    from lib.experiment import BaselineSnapshot, run_iteration
+
+    iterations = iterations or samples
+    rng = np.random.default_rng(cfg.seed)
+    indices = sorted(rng.choice(np.arange(1, iterations + 1), size=min(samples, iterations), replace=False).tolist())
+
+    baseline = BaselineSnapshot(contracts)
+    try:
+        sim = FastSimulator(ChainState.read(contracts, accs))
+        model = sim.run(cfg, runner_trials(cfg, indices))
+        model_rows = {int(i): {col: model[col][k] for col in model} for k, i in enumerate(model["Iteration"])}
+
+        report = {"samples": len(indices), "matched": 0, "mismatches": [], "gas": []}
+        started = time.time()
+        for idx in indices:
+            actual = run_iteration(contracts, accs, cfg, idx, baseline=baseline)
+            expected = model_rows.get(idx)
+            diffs = _diff_rows(expected, actual)
+            if diffs:
+                report["mismatches"].append({"Iteration": idx, "diffs": diffs})
+            else:
+                report["matched"] += 1
+            if actual and expected and actual["Triggered"]:
+                report["gas"].append((int(expected["DefenseCost_Gas"]), actual["DefenseCost_Gas"]))
+            if log:
+                log(idx, diffs)
+        report["elapsed"] = time.time() - started
+    finally:
+        baseline.restore()
+
+    if strict and report["mismatches"]:
+        raise CalibrationError(f"{len(report['mismatches'])}/{report['samples']} trials differ: {report['mismatches'][:3]}")
+    return report
+
+def _diff_rows(expected, actual):
+    if expected is None or actual is None:
+        if expected is None and actual is None:
+            return {}
+        return {"row": (expected is not None, actual is not None)}
+    diffs = {}
+    for col in COMPARED_COLUMNS:
+        e, a = expected[col], actual[col]
+        if col == "BlockDiff":
+            e = None if np.isnan(e) else int(e)
+        elif col in ("Triggered", "Success"):
+            e = bool(e)
+        if e != a:
+            diffs[col] = (e, a)
+    return diffs
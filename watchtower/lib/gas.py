@@ -0,0 +1,292 @@
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from web3 import Web3
+
+# --------------------------------------------------------------------------
+# 상수 및 설정
+# --------------------------------------------------------------------------
+GAS_BUDGET_GWEI = 500.0  # 방어 TX 한 건에 허용하는 최대 가스비 (maxFeePerGas / gasPrice 상한)
+OUTBID_MULTIPLIER = 1.125  # 공격 TX 우선순위 수수료 대비 방어 TX 수수료
+DEFAULT_MULTIPLIER = 1.5  # 공격 TX 정보가 없을 때 (기존 eth_gasPrice x 1.5 와 동일)
+BUMP_FACTOR = 1.125  # 교체 TX는 기존 수수료보다 10% 이상 높아야 노드가 받아줌
+BUMP_AFTER_BLOCKS = 1  # 이 블록 수 안에 포함되지 않으면 수수료를 올려 교체
+MAX_BUMPS = 3
+BUMP_POLL_INTERVAL = 0.2
+PENDING_TTL = 600.0  # record()되지 않은 입찰 정보를 보관하는 시간 (record를 부르지 않는 경로용)
+MAX_PENDING = 1024
+BIDS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "bids.jsonl")
+
+class BudgetBelowBaseFee(ValueError):
+    pass
+
+def _int(value):
+    if value is None:
+        return None
+    return int(value, 16) if isinstance(value, str) else int(value)
+
+# --------------------------------------------------------------------------
+# 공격 TX 가스 파라미터 / 입찰
+# --------------------------------------------------------------------------
+@dataclass(frozen=True)
+class AttackGas:
+    """탐지된 공격 TX의 가스 파라미터 (legacy면 gas_price만, EIP-1559면 max_fee/max_priority)"""
+    gas_price: int = None
+    max_fee: int = None
+    max_priority: int = None
+
+    @classmethod
+    def from_pending(cls, tx):
+        """lib.mempool.PendingTx -> AttackGas"""
+        if tx.max_priority_fee is not None:
+            return cls(max_fee=tx.gas_price, max_priority=tx.max_priority_fee)
+        return cls(gas_price=tx.gas_price)
+
+    @classmethod
+    def from_tx(cls, tx):
+        """RPC 응답(hex) 또는 web3 AttributeDict(int) 모두 지원"""
+        if tx.get("maxFeePerGas") is not None:
+            return cls(max_fee=_int(tx["maxFeePerGas"]), max_priority=_int(tx.get("maxPriorityFeePerGas")) or 0)
+        return cls(gas_price=_int(tx.get("gasPrice")) or 0)
+
+    def tip(self, base_fee):
+        """블록에 포함될 때 실제로 내는 우선순위 수수료 (블록 내 정렬 기준)"""
+        if self.max_fee is not None:
+            return max(min(self.max_priority, self.max_fee - base_fee), 0)
+        return max(self.gas_price - base_fee, 0)
+
+    def max_price(self):
+        return self.max_fee if self.max_fee is not None else self.gas_price
+
+@dataclass(frozen=True)
+class Bid:
+    base_fee: int
+    gas_price: int = None  # legacy
+    max_fee: int = None  # EIP-1559
+    max_priority: int = None
+    attack_tip: int = None
+    capped: bool = False  # 예산 때문에 공격 TX보다 높게 부르지 못함
+
+    @property
+    def below_base(self):
+        """예산이 base fee보다 낮아 현재 블록에는 포함될 수 없는 입찰"""
+        return self.price < self.base_fee
+
+    @property
+    def eip1559(self):
+        return self.max_fee is not None
+
+    @property
+    def price(self):
+        """TX가 낼 수 있는 최대 가스 단가"""
+        return self.max_fee if self.eip1559 else self.gas_price
+
+    @property
+    def tip(self):
+        if self.eip1559:
+            return max(min(self.max_priority, self.max_fee - self.base_fee), 0)
+        return max(self.gas_price - self.base_fee, 0)
+
+    @classmethod
+    def from_fees(cls, base_fee, fees):
+        """이미 서명된 TX의 수수료 필드 -> Bid (bump 기준)"""
+        return cls(base_fee, gas_price=fees.get("gasPrice"), max_fee=fees.get("maxFeePerGas"),
+                   max_priority=fees.get("maxPriorityFeePerGas"))
+
+    def tx_fields(self):
+        if self.eip1559:
+            return {"maxFeePerGas": self.max_fee, "maxPriorityFeePerGas": self.max_priority}
+        return {"gasPrice": self.gas_price}
+
+# --------------------------------------------------------------------------
+# 입찰 엔진
+# --------------------------------------------------------------------------
+class GasBidder:
+    """
+    공격 TX의 가스 파라미터를 읽고, 예산 안에서 그보다 높은 우선순위 수수료로 방어 TX 수수료를 정한다.
+
+    - EIP-1559 체인: maxPriorityFeePerGas = 공격 tip x multiplier + 1, maxFeePerGas = 2 x base fee + tip
+    - legacy: gasPrice = max(eth_gasPrice x 1.5, 공격 gasPrice x multiplier + 1)
+    - fire(): 발사 후 bump_after_blocks 블록 안에 포함되지 않으면 수수료를 올려 같은 nonce로 교체
+    - 입찰/결과는 data/bids.jsonl 에 기록 (Research Metrics: 비용 vs 승률)
+    """
+
+    def __init__(self, w3, budget_gwei=GAS_BUDGET_GWEI, multiplier=OUTBID_MULTIPLIER, bump_factor=BUMP_FACTOR,
+                 bump_after_blocks=BUMP_AFTER_BLOCKS, max_bumps=MAX_BUMPS, log_path=BIDS_PATH):
+        self.w3 = w3
+        self.budget_gwei = budget_gwei
+        self.multiplier = multiplier
+        self.bump_factor = bump_factor
+        self.bump_after_blocks = bump_after_blocks
+        self.max_bumps = max_bumps
+        self.log_path = log_path
+        self.pending = {}  # 최종 tx hash -> 기록할 입찰 정보 (record()에서 결과와 함께 저장)
+
+        self._lock = threading.Lock()
+        self._watchers = ThreadPoolExecutor(max_workers=4, thread_name_prefix="gas-bump")
+
+    def base_fee(self):
+        """(base fee, EIP-1559 여부). base fee가 없는 체인은 eth_gasPrice를 기준으로"""
+        block = self.w3.eth.get_block("latest")
+        if block.get("baseFeePerGas") is not None:
+            return block["baseFeePerGas"], True
+        return self.w3.eth.gas_price, False
+
+    def bid(self, attack=None, budget_gwei=None):
+        base, eip1559 = self.base_fee()
+        budget = int((budget_gwei or self.budget_gwei) * 1e9)
+        attack_tip = attack.tip(base) if attack else None
+
+        if eip1559:
+            if attack is not None:
+                priority = int(attack_tip * self.multiplier) + 1
+            else:
+                priority = max(int(base * (DEFAULT_MULTIPLIER - 1)), 1)
+            max_fee = 2 * base + priority
+            capped = False
+            if max_fee > budget:
+                # 예산은 넘지 않음 (base fee보다 낮으면 below_base -> fire()에서 발사하지 않음)
+                max_fee = budget
+                priority = max(min(priority, max_fee - base), 0)
+                capped = budget < base or (attack is not None and priority <= attack_tip)
+            return Bid(base, max_fee=max_fee, max_priority=priority, attack_tip=attack_tip, capped=capped)
+
+        price = int(self.w3.eth.gas_price * DEFAULT_MULTIPLIER)
+        if attack is not None:
+            price = max(price, int(attack.max_price() * self.multiplier) + 1)
+        capped = price > budget
+        if capped:
+            price = budget
+        capped = capped and (price < base or (attack is not None and price <= attack.max_price()))
+        return Bid(base, gas_price=price, attack_tip=attack_tip, capped=capped)
+
+    def bump(self, bid, budget_gwei=None):
+        """교체용 입찰 (수수료 bump_factor배). 이미 예산 상한이면 None"""
+        budget = int((budget_gwei or self.budget_gwei) * 1e9)
+        if bid.price >= budget:
+            return None
+        if bid.eip1559:
+            max_fee = min(math.ceil(bid.max_fee * self.bump_factor) + 1, budget)
+            priority = min(math.ceil(bid.max_priority * self.bump_factor) + 1, max_fee)
+            return Bid(bid.base_fee, max_fee=max_fee, max_priority=priority, attack_tip=bid.attack_tip, capped=bid.capped)
+        return Bid(bid.base_fee, gas_price=min(math.ceil(bid.gas_price * self.bump_factor) + 1, budget),
+                   attack_tip=bid.attack_tip, capped=bid.capped)
+
+    # ----------------------------------------------------------------------
+    # 발사 + 미포함 시 bump-and-replace
+    # ----------------------------------------------------------------------
+    def fire(self, engine, attack=None, budget_gwei=None, source="engine"):
+        """
+        engine(DefenseEngine)으로 입찰가를 적용해 발사. 반환값의 receipt는 (교체 TX 포함) 최종 receipt Future.
+        공격 TX 정보가 없으면 미리 서명된 TX를 그대로 발사 (입찰 계산이 발사를 늦추지 않도록).
+        예산이 base fee보다 낮으면 발사하지 않고 BudgetBelowBaseFee.
+        """
+        if attack is None and engine.prepared is not None:
+            firing = engine.fire()
+            bid = Bid.from_fees(self.base_fee()[0], firing.prepared.fees)
+        else:
+            bid = self.bid(attack, budget_gwei)
+            if bid.below_base:
+                raise BudgetBelowBaseFee(
+                    f"Gas budget {bid.price / 1e9:.2f} Gwei is below the base fee {bid.base_fee / 1e9:.2f} Gwei"
+                )
+            engine.prepare(bid=bid)
+            firing = engine.fire()
+        start_block = self.w3.eth.block_number
+        final = Future()
+        info = self._info(source, attack, bid, firing.sent_at)
+
+        def watch(current, receipt_future):
+            try:
+                while True:
+                    try:
+                        receipt = receipt_future.result(BUMP_POLL_INTERVAL)
+                        break
+                    except TimeoutError:
+                        pass
+                    if info["bumps"] >= self.max_bumps:
+                        continue
+                    if self.w3.eth.block_number - start_block < self.bump_after_blocks * (info["bumps"] + 1):
+                        continue
+                    new_bid = self.bump(info["bid"], budget_gwei)
+                    if new_bid is None:
+                        continue
+                    replaced = engine.replace(current, new_bid)
+                    if replaced is not None:
+                        # receipt Future는 교체 전후 공유 (원래 TX / 교체 TX 중 포함된 쪽)
+                        current = replaced
+                        info["bid"] = new_bid
+                        info["bumps"] += 1
+                self.track(receipt["transactionHash"], info)
+                final.set_result(receipt)
+            except Exception as e:
+                final.set_exception(e)
+
+        self._watchers.submit(watch, firing, firing.receipt)
+        firing.receipt = final
+        return firing
+
+    # ----------------------------------------------------------------------
+    # 기록 (입찰가 / 비용 / 결과)
+    # ----------------------------------------------------------------------
+    @staticmethod
+    def _info(source, attack, bid, sent_at=None):
+        return {"source": source, "attack": attack, "bid": bid, "first_bid": bid, "bumps": 0,
+                "sent_at": sent_at or time.time()}
+
+    def track(self, tx_hash, info=None, source="engine", attack=None, bid=None):
+        """fire()를 거치지 않고 보낸 방어 TX(예: owner blacklist)도 record()로 기록할 수 있도록 등록"""
+        with self._lock:
+            self.pending[Web3.to_hex(tx_hash)] = info or self._info(source, attack, bid)
+            # record()를 부르지 않는 경로(mempool / 앱)에서 쌓이지 않도록 오래된 항목부터 정리
+            expired = time.time() - PENDING_TTL
+            for key in [k for k, v in self.pending.items() if v["sent_at"] < expired]:
+                del self.pending[key]
+            while len(self.pending) > MAX_PENDING:
+                del self.pending[next(iter(self.pending))]
+
+    def record(self, receipt, won, **extra):
+        """fire()로 보낸 방어 TX의 결과 기록. won: 공격보다 먼저 포함됐는지 (판정은 호출자가)"""
+        with self._lock:
+            info = self.pending.pop(Web3.to_hex(receipt["transactionHash"]), None)
+        if info is None:
+            return None
+        bid, attack = info["bid"], info["attack"]
+        paid = receipt.get("effectiveGasPrice") or bid.price
+        entry = {
+            "ts": time.time(),
+            "source": info["source"],
+            "eip1559": bid.eip1559,
+            "base_fee_gwei": bid.base_fee / 1e9,
+            "attack_price_gwei": attack.max_price() / 1e9 if attack else None,
+            "attack_tip_gwei": bid.attack_tip / 1e9 if bid.attack_tip is not None else None,
+            "bid_price_gwei": bid.price / 1e9,
+            "bid_tip_gwei": bid.tip / 1e9,
+            "first_bid_price_gwei": info["first_bid"].price / 1e9,
+            "bumps": info["bumps"],
+            "capped": bid.capped,
+            "gas_used": receipt["gasUsed"],
+            "cost_eth": receipt["gasUsed"] * paid / 1e18,
+            "status": receipt["status"],
+            "won": bool(won),
+            "latency_sec": time.time() - info["sent_at"],
+            **extra,
+        }
+        self.log(entry)
+        return entry
+
+    def log(self, entry):
+        os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+        with self._lock, open(self.log_path, "a") as f:
+            f.write(json.dumps(entry, default=str) + "\n")
+
+def load_bids(path=BIDS_PATH):
+    """data/bids.jsonl -> 기록 리스트 (없으면 빈 리스트)"""
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
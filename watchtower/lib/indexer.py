@@ -0,0 +1,259 @@
+import os
+import sqlite3
+import threading
+from web3 import Web3
+from web3.exceptions import BlockNotFound
+from lib.utils import rpc_batch
+from lib.blocks import fork_block
+
+# --------------------------------------------------------------------------
+# 상수 및 설정
+# --------------------------------------------------------------------------
+TRANSFER_TOPIC = Web3.to_hex(Web3.keccak(text="Transfer(address,address,uint256)"))
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "index.sqlite")
+
+# uint256 최대값은 78자리 -> 0으로 채운 문자열이면 TEXT 정렬 = 숫자 정렬
+BALANCE_WIDTH = 78
+KEEP_CHECKPOINTS = 256  # reorg 확인용으로 남겨둘 최근 블록 해시 개수
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS checkpoints (number INTEGER PRIMARY KEY, hash TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS transfers (
+    block_number INTEGER NOT NULL,
+    log_index INTEGER NOT NULL,
+    token TEXT NOT NULL,
+    src TEXT NOT NULL,
+    dst TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (block_number, log_index)
+);
+CREATE TABLE IF NOT EXISTS balances (
+    token TEXT NOT NULL,
+    address TEXT NOT NULL,
+    balance TEXT NOT NULL,
+    PRIMARY KEY (token, address)
+);
+CREATE INDEX IF NOT EXISTS idx_balances_rank ON balances (token, balance);
+"""
+
+def _encode_balance(value):
+    return str(value).zfill(BALANCE_WIDTH)
+
+def _topic_to_address(topic):
+    return Web3.to_checksum_address(bytes(topic)[-20:])
+
+# --------------------------------------------------------------------------
+# Transfer 이벤트 인덱서
+# --------------------------------------------------------------------------
+class TransferIndexer:
+    """
+    FDS/USDT Transfer 로그를 블록 구간 단위로 읽어 SQLite 잔고 테이블에 누적한다.
+
+    - 마지막으로 처리한 블록부터 이어서 인덱싱 (재시작해도 처음부터 다시 읽지 않음)
+    - 저장해 둔 블록 해시와 체인을 비교해 reorg / 노드 재시작을 감지하고 되감는다
+    """
+
+    def __init__(self, w3, addrs, db_path=DEFAULT_DB_PATH, chunk_size=2000, start_block=None):
+        self.w3 = w3
+        self.tokens = {"FDS": addrs["FDS"], "USDT": addrs["USDT"]}
+        self.deploy_block = addrs.get("DeployBlock")  # 배포 스크립트가 기록 (없으면 get_code로 탐색)
+        self.token_by_address = {v.lower(): k for k, v in self.tokens.items()}
+        self.chunk_size = chunk_size
+        self.start_block = start_block
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+
+        # 컨트랙트를 재배포했다면 이전 인덱스는 의미가 없음
+        fingerprint = ",".join(sorted(a.lower() for a in self.tokens.values()))
+        if self._get_meta("tokens") != fingerprint:
+            self._reset()
+            self._set_meta("tokens", fingerprint)
+            self.db.commit()
+
+    # ----------------------------------------------------------------------
+    # meta 헬퍼
+    # ----------------------------------------------------------------------
+    def _get_meta(self, key):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    @property
+    def last_block(self):
+        value = self._get_meta("last_block")
+        return int(value) if value is not None else None
+
+    def _reset(self):
+        for table in ("meta", "checkpoints", "transfers", "balances"):
+            self.db.execute(f"DELETE FROM {table}")
+
+    # ----------------------------------------------------------------------
+    # 시작 블록 탐색 (컨트랙트 배포 블록)
+    # ----------------------------------------------------------------------
+    def _deploy_block(self, address, head, lo=0):
+        hi = head
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if len(self.w3.eth.get_code(address, block_identifier=mid)) > 0:
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+    def _initial_block(self, head):
+        if self.start_block is not None:
+            return self.start_block
+        if self.deploy_block is not None:
+            return self.deploy_block
+        # 포크 이전 블록 조회는 원격 archive RPC로 가므로 탐색하지 않음
+        forked = fork_block(self.w3)
+        lo = forked + 1 if forked is not None else 0
+        return min(self._deploy_block(a, head, lo) for a in self.tokens.values())
+
+    # ----------------------------------------------------------------------
+    # Reorg / 재시작 처리
+    # ----------------------------------------------------------------------
+    def _block_hash(self, number):
+        try:
+            return Web3.to_hex(self.w3.eth.get_block(number)["hash"])
+        except BlockNotFound:
+            return None
+
+    def _find_common_ancestor(self):
+        rows = self.db.execute("SELECT number, hash FROM checkpoints ORDER BY number DESC").fetchall()
+        # 저장된 체크포인트 해시를 한 번의 batch 요청으로 비교
+        blocks = rpc_batch(self.w3, [("eth_getBlockByNumber", [hex(number), False]) for number, _ in rows])
+        for (number, stored_hash), block in zip(rows, blocks):
+            if block and block["hash"] == stored_hash:
+                return number
+        return None
+
+    def _rollback_to(self, number):
+        deltas = {}
+        rows = self.db.execute(
+            "SELECT token, src, dst, value FROM transfers WHERE block_number > ?", (number,)
+        ).fetchall()
+        for token, src, dst, value in rows:
+            value = int(value)
+            deltas[(token, src)] = deltas.get((token, src), 0) + value
+            deltas[(token, dst)] = deltas.get((token, dst), 0) - value
+        self._apply_deltas(deltas)
+        self.db.execute("DELETE FROM transfers WHERE block_number > ?", (number,))
+        self.db.execute("DELETE FROM checkpoints WHERE number > ?", (number,))
+        self._set_meta("last_block", number)
+
+    def _check_reorg(self):
+        last = self.last_block
+        if last is None:
+            return
+        stored = self.db.execute("SELECT hash FROM checkpoints WHERE number = ?", (last,)).fetchone()
+        if stored and self._block_hash(last) == stored[0]:
+            return
+
+        ancestor = self._find_common_ancestor()
+        if ancestor is None:
+            # 공통 조상이 없음 -> 노드가 재시작된 것으로 보고 처음부터 다시 인덱싱
+            fingerprint = self._get_meta("tokens")
+            self._reset()
+            self._set_meta("tokens", fingerprint)
+        else:
+            self._rollback_to(ancestor)
+        self.db.commit()
+
+    # ----------------------------------------------------------------------
+    # 잔고 반영
+    # ----------------------------------------------------------------------
+    def _apply_deltas(self, deltas):
+        for (token, address), delta in deltas.items():
+            if address == ZERO_ADDRESS or delta == 0:
+                continue
+            row = self.db.execute(
+                "SELECT balance FROM balances WHERE token = ? AND address = ?", (token, address)
+            ).fetchone()
+            balance = (int(row[0]) if row else 0) + delta
+            self.db.execute(
+                "INSERT OR REPLACE INTO balances (token, address, balance) VALUES (?, ?, ?)",
+                (token, address, _encode_balance(max(balance, 0))),
+            )
+
+    def _ingest(self, start, end):
+        logs = self.w3.eth.get_logs({
+            "fromBlock": start,
+            "toBlock": end,
+            "address": list(self.tokens.values()),
+            "topics": [TRANSFER_TOPIC],
+        })
+
+        deltas = {}
+        for log in logs:
+            token = self.token_by_address[log["address"].lower()]
+            src = _topic_to_address(log["topics"][1])
+            dst = _topic_to_address(log["topics"][2])
+            value = int.from_bytes(bytes(log["data"]), "big")
+            self.db.execute(
+                "INSERT OR IGNORE INTO transfers (block_number, log_index, token, src, dst, value) VALUES (?, ?, ?, ?, ?, ?)",
+                (log["blockNumber"], log["logIndex"], token, src, dst, str(value)),
+            )
+            self.db.execute(
+                "INSERT OR REPLACE INTO checkpoints (number, hash) VALUES (?, ?)",
+                (log["blockNumber"], Web3.to_hex(log["blockHash"])),
+            )
+            deltas[(token, src)] = deltas.get((token, src), 0) - value
+            deltas[(token, dst)] = deltas.get((token, dst), 0) + value
+        self._apply_deltas(deltas)
+
+        end_hash = self._block_hash(end)
+        if end_hash is None:
+            raise BlockNotFound(f"Block {end} disappeared during indexing")
+        self.db.execute("INSERT OR REPLACE INTO checkpoints (number, hash) VALUES (?, ?)", (end, end_hash))
+        self.db.execute(
+            "DELETE FROM checkpoints WHERE number NOT IN (SELECT number FROM checkpoints ORDER BY number DESC LIMIT ?)",
+            (KEEP_CHECKPOINTS,),
+        )
+        self._set_meta("last_block", end)
+        return len(logs)
+
+    # ----------------------------------------------------------------------
+    # Public API
+    # ----------------------------------------------------------------------
+    def sync(self):
+        """체인 헤드까지 인덱싱하고 새로 읽은 Transfer 로그 개수를 돌려준다."""
+        with self._lock:
+            self._check_reorg()
+            head = self.w3.eth.block_number
+            last = self.last_block
+            start = self._initial_block(head) if last is None else last + 1
+
+            ingested = 0
+            while start <= head:
+                end = min(start + self.chunk_size - 1, head)
+                try:
+                    ingested += self._ingest(start, end)
+                    self.db.commit()
+                except Exception:
+                    self.db.rollback()
+                    raise
+                start = end + 1
+            return ingested
+
+    def top_holders(self, token="FDS", limit=10):
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT address, balance FROM balances WHERE token = ? AND balance > ? ORDER BY balance DESC LIMIT ?",
+                (token, _encode_balance(0), limit),
+            ).fetchall()
+        return [(address, int(balance)) for address, balance in rows]
+
+    def holder_count(self, token="FDS"):
+        with self._lock:
+            row = self.db.execute(
+                "SELECT COUNT(*) FROM balances WHERE token = ? AND balance > ?", (token, _encode_balance(0))
+            ).fetchone()
+        return row[0]
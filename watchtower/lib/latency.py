@@ -0,0 +1,196 @@
+import threading
+import time
+from contextlib import contextmanager
+from web3 import Web3
+from web3.middleware import Web3Middleware
+
+# --------------------------------------------------------------------------
+# 상수 및 설정
+# --------------------------------------------------------------------------
+SUB_BUCKETS = 64  # 2의 거듭제곱 구간마다 64칸 -> 상대 오차 약 1.6%
+MAX_EXPONENT = 40  # 2^40 us (약 12일) 이상은 마지막 칸에 기록
+PHASES = ["detect", "sign", "broadcast", "include"]
+
+# --------------------------------------------------------------------------
+# HDR 스타일 히스토그램 (log-linear 버킷, 기록 O(1))
+# --------------------------------------------------------------------------
+class LatencyHistogram:
+    """마이크로초 단위로 기록. 값 자체는 저장하지 않으므로 메모리는 고정."""
+
+    def __init__(self):
+        self.counts = [0] * (SUB_BUCKETS * (MAX_EXPONENT + 1))
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _index(us):
+        if us < SUB_BUCKETS:
+            return us
+        shift = us.bit_length() - 7  # 상위 7비트(64~127)로 구간 내 위치 결정
+        return min(SUB_BUCKETS * (shift + 1) + (us >> shift) - SUB_BUCKETS, SUB_BUCKETS * (MAX_EXPONENT + 1) - 1)
+
+    @staticmethod
+    def _value(idx):
+        # 버킷 상한 (us)
+        if idx < SUB_BUCKETS:
+            return idx
+        shift = idx // SUB_BUCKETS - 1
+        return ((idx % SUB_BUCKETS + SUB_BUCKETS + 1) << shift) - 1
+
+    def record(self, seconds):
+        us = max(int(seconds * 1e6), 0)
+        idx = self._index(us)
+        with self._lock:
+            self.counts[idx] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, pct):
+        """pct(0~100) 백분위 값 (초)"""
+        if self.count == 0:
+            return 0.0
+        target = max(1, int(self.count * pct / 100 + 0.5))
+        seen = 0
+        for idx, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return min(self._value(idx) / 1e6, self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.mean * 1000,
+            "p50_ms": self.percentile(50) * 1000,
+            "p95_ms": self.percentile(95) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+class LatencyRecorder:
+    """RPC 메서드별 / 단계(phase)별 히스토그램 모음 (프로세스 전역 RECORDER 사용)"""
+
+    def __init__(self):
+        self.methods = {}
+        self.phases = {}
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    def _get(self, table, name):
+        hist = table.get(name)
+        if hist is None:
+            with self._lock:
+                hist = table.setdefault(name, LatencyHistogram())
+        return hist
+
+    def record_method(self, name, seconds):
+        self._get(self.methods, name).record(seconds)
+
+    def record_phase(self, name, seconds):
+        self._get(self.phases, name).record(seconds)
+
+    def reset(self):
+        with self._lock:
+            self.methods = {}
+            self.phases = {}
+            self.started_at = time.time()
+
+    def report(self):
+        """{"methods": {이름: summary}, "phases": {이름: summary}}"""
+        return {
+            "methods": {k: h.summary() for k, h in sorted(self.methods.items())},
+            "phases": {k: h.summary() for k, h in sorted(self.phases.items())},
+        }
+
+RECORDER = LatencyRecorder()
+
+# --------------------------------------------------------------------------
+# eth_call 이름 붙이기 (4-byte selector -> 함수 이름)
+# --------------------------------------------------------------------------
+_selector_names = {}
+
+def register_abi(abi):
+    for item in abi:
+        if item.get("type") == "function":
+            types = ",".join(i["type"] for i in item["inputs"])
+            selector = Web3.keccak(text=f"{item['name']}({types})")[:4].hex()
+            _selector_names[selector.removeprefix("0x")] = item["name"]
+
+def method_label(method, params):
+    if method in ("eth_call", "eth_estimateGas") and params and isinstance(params[0], dict):
+        data = params[0].get("data") or params[0].get("input") or ""
+        if not isinstance(data, str):
+            data = Web3.to_hex(data)
+        selector = data.removeprefix("0x")[:8]
+        return f"{method}:{_selector_names.get(selector, '0x' + selector)}"
+    return method
+
+# --------------------------------------------------------------------------
+# web3 middleware
+# --------------------------------------------------------------------------
+class LatencyMiddleware(Web3Middleware):
+    def wrap_make_request(self, make_request):
+        def middleware(method, params):
+            start = time.perf_counter()
+            try:
+                return make_request(method, params)
+            finally:
+                RECORDER.record_method(method_label(method, params), time.perf_counter() - start)
+        return middleware
+
+    def wrap_make_batch_request(self, make_batch_request):
+        def middleware(requests_info):
+            start = time.perf_counter()
+            try:
+                return make_batch_request(requests_info)
+            finally:
+                RECORDER.record_method(batch_label(requests_info), time.perf_counter() - start)
+        return middleware
+
+def batch_label(requests_info):
+    return "batch:" + ",".join(sorted({method_label(m, p) for m, p in requests_info}))
+
+def instrument(w3):
+    """w3에 지연 시간 middleware를 한 번만 설치"""
+    if "latency" not in w3.middleware_onion:
+        w3.middleware_onion.add(LatencyMiddleware, "latency")
+    return w3
+
+# --------------------------------------------------------------------------
+# 단계(phase) 측정: detect / sign / broadcast / include
+# --------------------------------------------------------------------------
+_local = threading.local()
+
+def record_span(phase, seconds):
+    """측정된 구간 시간을 phase 히스토그램과 (있으면) 현재 trace에 기록"""
+    RECORDER.record_phase(phase, seconds)
+    current = getattr(_local, "trace", None)
+    if current is not None:
+        current[phase] = current.get(phase, 0.0) + seconds
+
+@contextmanager
+def span(phase):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(phase, time.perf_counter() - start)
+
+@contextmanager
+def trace():
+    """with trace() as phases: ... -> 같은 스레드에서 측정된 phase별 합계(초)"""
+    previous = getattr(_local, "trace", None)
+    phases = {}
+    _local.trace = phases
+    try:
+        yield phases
+    finally:
+        _local.trace = previous
@@ -0,0 +1,356 @@
+import json
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, asdict, field
+from queue import Queue, Empty
+import numpy as np
+from eth_account import Account
+from web3 import Web3
+from lib.utils import WATCHTOWER_DIR, OWNER_PK, rpc_batch, fetch_snapshot, get_defense_engine, get_receipt_resolver, get_gas_bidder
+from lib.experiment import BaselineSnapshot
+from lib.mempool import MempoolWatcher, MempoolRules
+from lib.gas import AttackGas
+from lib.bench import ATTACKS, DEFENSES, ATTACK_GAS, ATTACK_GAS_PREMIUM, BLACKLIST_GAS, RECEIPT_TIMEOUT, \
+    IntervalMiner, set_automine, attack_amounts
+
+# --------------------------------------------------------------------------
+# 상수 및 설정
+# --------------------------------------------------------------------------
+LOAD_DIR = os.path.join(WATCHTOWER_DIR, "data", "load")
+
+HARDHAT_MNEMONIC = "test test test test test test test test test test test junk"
+HARDHAT_ACCOUNTS = 20
+RESERVED_ACCOUNTS = 6  # #0 deployer/owner, #1 watchtower, #2 ~ #5 relayer
+KEY_SOURCES = ["hardhat", "fresh"]
+FUND_MIN_ETH = 1  # 이보다 잔고가 적은 공격 계정은 계정 #0에서 충전
+FUND_ETH = 10
+QUEUE_POLL = 0.05
+
+@dataclass
+class LoadConfig:
+    concurrency: list = field(default_factory=lambda: [1, 2, 4, 8])  # 동시에 공격하는 계정 수 (수준별로 실행)
+    mix: dict = field(default_factory=lambda: {a: 1.0 for a in ATTACKS})  # 공격 함수별 가중치
+    rate: float = 4.0  # 전체 공격 전송 속도 (초당)
+    attacks: int = 24  # 수준별 공격 수
+    defenses: list = field(default_factory=lambda: list(DEFENSES))
+    mining: str = "interval"
+    block_time_ms: int = 1000
+    keys: str = "hardhat"  # hardhat: 계정 #6 ~ #19 (부족하면 새 키), fresh: 항상 새 키
+    seed: int = 0
+    rules: dict = field(default_factory=lambda: asdict(MempoolRules()))
+
+    def to_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def cases(self):
+        return [(defense, c) for defense in self.defenses for c in self.concurrency]
+
+# --------------------------------------------------------------------------
+# 공격 계정
+# --------------------------------------------------------------------------
+def attacker_keys(n, source="hardhat"):
+    """공격 계정 n개. hardhat이면 역할이 없는 로컬 계정부터, 나머지는 결정적으로 만든 새 키"""
+    keys = []
+    if source == "hardhat":
+        Account.enable_unaudited_hdwallet_features()
+        for i in range(RESERVED_ACCOUNTS, min(HARDHAT_ACCOUNTS, RESERVED_ACCOUNTS + n)):
+            keys.append(Account.from_mnemonic(HARDHAT_MNEMONIC, account_path=f"m/44'/60'/0'/0/{i}"))
+    i = 0
+    while len(keys) < n:
+        keys.append(Account.from_key(Web3.keccak(text=f"fds-load-attacker-{i}")))
+        i += 1
+    return keys
+
+def fund_accounts(w3, accounts, receipts):
+    """가스비가 부족한 계정만 계정 #0(unlocked)에서 충전. 충전한 계정 수를 돌려준다"""
+    balances = rpc_batch(w3, [("eth_getBalance", [a.address, "latest"]) for a in accounts])
+    funder = w3.eth.accounts[0]
+    futures = [
+        receipts.watch(w3.eth.send_transaction({"from": funder, "to": a.address, "value": Web3.to_wei(FUND_ETH, "ether")}))
+        for a, balance in zip(accounts, balances) if int(balance, 16) < Web3.to_wei(FUND_MIN_ETH, "ether")
+    ]
+    for future in futures:
+        future.result(RECEIPT_TIMEOUT)
+    return len(futures)
+
+# --------------------------------------------------------------------------
+# 다중 공격자 부하 시나리오
+# --------------------------------------------------------------------------
+class LoadScenario:
+    """
+    여러 공격 계정이 mint / drain / depeg 공격을 같은 순간에 보내는 부하 시나리오.
+
+    - 동시성 수준 c마다 c개 계정이 한 wave씩 동시에 전송, wave 간격은 c / rate초 (전체 전송 속도 = rate)
+    - watchtower 쪽은 스레드 하나: 큐에 쌓인 pending hash를 한 번에 꺼내 조회 -> MempoolWatcher.process -> 방어
+      (pause: 수준당 한 번 발사 후 나머지 알림은 같은 방어로 처리, blacklist: 공격 계정마다 한 번)
+    - 수준마다 evm_snapshot 기준 상태로 되돌린 뒤 실행
+    """
+
+    def __init__(self, contracts, cfg):
+        self.contracts = contracts
+        self.cfg = cfg
+        self.w3 = contracts["FDS"].w3
+        self.watcher = MempoolWatcher(self.w3, contracts, MempoolRules(**cfg.rules))
+        self.engine = get_defense_engine(contracts)
+        self.receipts = get_receipt_resolver(self.w3)
+        self.bidder = get_gas_bidder(self.w3)
+        self.attackers = attacker_keys(max(cfg.concurrency), cfg.keys)
+        self.owner = Account.from_key(OWNER_PK)
+        names = [a for a in ATTACKS if cfg.mix.get(a, 0) > 0]
+        if not names:
+            raise ValueError("mix needs at least one attack with a positive weight")
+        self.mix = (names, [cfg.mix[a] for a in names])
+
+    def prepare(self):
+        return fund_accounts(self.w3, self.attackers, self.receipts)
+
+    def send_attack(self, attacker, attack, amount, nonce, gas_price):
+        fn = {
+            "exploitMint": self.contracts["FDS"].functions.exploitMint,
+            "exploitDrain": self.contracts["Vault"].functions.exploitDrain,
+            "simulateDump": self.contracts["DEX"].functions.simulateDump,
+        }[attack](amount)
+        tx = fn.build_transaction({"from": attacker.address, "nonce": nonce, "gas": ATTACK_GAS, "gasPrice": gas_price})
+        raw = attacker.sign_transaction(tx).raw_transaction
+        return Web3.to_hex(self.w3.eth.send_raw_transaction(raw)).lower(), time.perf_counter()
+
+    # ----------------------------------------------------------------------
+    # watchtower (단일 스레드)
+    # ----------------------------------------------------------------------
+    def defend(self, alert, defense, state):
+        """알림 하나에 대한 방어. 반환: (방어 tx hash, receipt Future, 전송 시각)"""
+        if defense == "pause":
+            if "pause" not in state:
+                firing = self.bidder.fire(self.engine, AttackGas.from_pending(alert.tx), source="load")
+                state["pause"] = (firing.tx_hash, firing.receipt, time.perf_counter())
+            return state["pause"]
+        sender = alert.tx.sender.lower()
+        if sender not in state:
+            bid = self.bidder.bid(AttackGas.from_pending(alert.tx))
+            tx = self.contracts["FDS"].functions.blacklistAccount(Web3.to_checksum_address(sender)).build_transaction({
+                "from": self.owner.address, "nonce": state["owner_nonce"], "gas": BLACKLIST_GAS, **bid.tx_fields(),
+            })
+            state["owner_nonce"] += 1
+            raw_tx = self.owner.sign_transaction(tx).raw_transaction
+            tx_hash = Web3.to_hex(self.w3.eth.send_raw_transaction(raw_tx))
+            state[sender] = (tx_hash, self.receipts.watch(tx_hash, RECEIPT_TIMEOUT), time.perf_counter())
+        return state[sender]
+
+    def watchtower(self, queue, records, defense, state, stop):
+        while not (stop.is_set() and queue.empty()):
+            try:
+                batch = [queue.get(timeout=QUEUE_POLL)]
+            except Empty:
+                continue
+            while True:
+                try:
+                    batch.append(queue.get_nowait())
+                except Empty:
+                    break
+            dequeued = time.perf_counter()
+            try:
+                txs = rpc_batch(self.w3, [("eth_getTransactionByHash", [h]) for h in batch])
+                self.watcher.on_block()  # 배치마다 최신 상태로 규칙 평가
+                alerts = self.watcher.process(txs)
+                detected = time.perf_counter()
+                for tx_hash in batch:
+                    records[tx_hash]["queue_ms"] = (dequeued - records[tx_hash]["_sent"]) * 1000
+                for alert in alerts:
+                    row = records[alert.tx.tx_hash.lower()]
+                    row["detected"] = True
+                    row["detect_ms"] = (detected - row["_sent"]) * 1000
+                    row["defense_hash"], row["_defense"], fired = self.defend(alert, defense, state)
+                    # 음수: 이 공격이 도착하기 전에 이미 방어가 나가 있었음
+                    row["defense_sent_ms"] = (fired - row["_sent"]) * 1000
+            except Exception as e:
+                # 배치 전체가 처리되지 않음 -> 미탐지와 구분되도록 기록
+                state["errors"] += 1
+                state["error_txs"] += len(batch)
+                state["last_error"] = f"{type(e).__name__}: {e}"
+                for tx_hash in batch:
+                    records[tx_hash]["watchtower_error"] = True
+            finally:
+                state["busy_sec"] += time.perf_counter() - dequeued
+                for _ in batch:
+                    queue.task_done()
+
+    # ----------------------------------------------------------------------
+    # 동시성 수준 1회
+    # ----------------------------------------------------------------------
+    def run_level(self, defense, concurrency, baseline):
+        baseline.restore()
+        self.engine.refresh()
+        amounts = attack_amounts(fetch_snapshot(self.contracts), self.watcher.rules)
+        attackers = self.attackers[:concurrency]
+        nonces = [int(n, 16) for n in rpc_batch(self.w3, [
+            ("eth_getTransactionCount", [address, "pending"]) for address in [a.address for a in attackers] + [self.owner.address]
+        ])]
+        state = {"owner_nonce": nonces.pop(), "busy_sec": 0.0, "errors": 0, "error_txs": 0, "last_error": None}
+        bookkeeping = set(state)
+        gas_price = int(self.w3.eth.gas_price * ATTACK_GAS_PREMIUM)
+        rng = random.Random(self.cfg.seed)
+        waves = math.ceil(self.cfg.attacks / concurrency)
+        interval = concurrency / self.cfg.rate
+
+        queue, records, stop = Queue(), {}, threading.Event()
+        tower = threading.Thread(target=self.watchtower, args=(queue, records, defense, state, stop), name="load-watchtower")
+        miner = IntervalMiner(self.w3, self.cfg.block_time_ms / 1000) if self.cfg.mining == "interval" else nullcontext()
+        send_errors = 0
+        with miner, ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="load-attacker") as pool:
+            tower.start()
+            started = time.perf_counter()
+            for wave in range(waves):
+                delay = started + wave * interval - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                plan = [(i, rng.choices(*self.mix)[0]) for i in range(min(concurrency, self.cfg.attacks - wave * concurrency))]
+                sends = [pool.submit(self.send_attack, attackers[i], attack, amounts[attack], nonces[i], gas_price)
+                         for i, attack in plan]
+                for (i, attack), future in zip(plan, sends):
+                    try:
+                        tx_hash, sent = future.result()
+                    except Exception:
+                        send_errors += 1
+                        nonces[i] = self.w3.eth.get_transaction_count(attackers[i].address, "pending")
+                        continue
+                    nonces[i] += 1
+                    records[tx_hash] = {
+                        "defense": defense, "concurrency": concurrency, "wave": wave, "attacker": attackers[i].address,
+                        "attack": attack, "attack_hash": tx_hash, "detected": False, "watchtower_error": False,
+                        "_sent": sent, "_attack": self.receipts.watch(tx_hash, RECEIPT_TIMEOUT),
+                    }
+                    queue.put(tx_hash)
+            sending_sec = time.perf_counter() - started
+            queue.join()
+            stop.set()
+            tower.join()
+            elapsed = time.perf_counter() - started
+            rows = [self.finish(row) for row in records.values()]
+
+        if defense == "pause" and "pause" in state:
+            receipt = next((r["_receipt"] for r in rows if r.get("_receipt") is not None), None)
+            if receipt is not None:
+                self.bidder.record(receipt, won=any(r["win"] for r in rows), scenario="load", concurrency=concurrency)
+        for row in rows:
+            for key in [k for k in row if k.startswith("_")]:
+                del row[key]
+        level = {
+            "defense": defense, "concurrency": concurrency, "sent": len(rows), "send_errors": send_errors,
+            "sending_sec": sending_sec, "elapsed_sec": elapsed, "busy_sec": state["busy_sec"],
+            "watchtower_errors": state["errors"], "watchtower_error_txs": state["error_txs"],
+            "watchtower_last_error": state["last_error"],
+            "defense_txs": len([k for k in state if k not in bookkeeping]),
+        }
+        return rows, level
+
+    def finish(self, row):
+        """공격 / 방어 receipt를 기다려 결과 판정 (시간 초과면 미포함으로 기록)"""
+        try:
+            attack = row["_attack"].result(RECEIPT_TIMEOUT)
+        except Exception:
+            attack = None
+        row["attack_block"] = attack["blockNumber"] if attack else None
+        row["attack_reverted"] = bool(attack) and attack["status"] == 0
+        defense = None
+        if row.get("_defense") is not None:
+            try:
+                defense = row["_defense"].result(RECEIPT_TIMEOUT)
+            except Exception:
+                defense = None
+        row["_receipt"] = defense
+        row["defense_block"] = defense["blockNumber"] if defense else None
+        # 방어가 먼저 실행됐는가 (블록, 블록 내 순서). 공격이 revert됐으면 on-chain 한도로 막힌 것
+        row["win"] = bool(attack and defense and defense["status"] == 1) and \
+            (defense["blockNumber"], defense["transactionIndex"]) < (attack["blockNumber"], attack["transactionIndex"])
+        row["defended"] = row["win"] or row["attack_reverted"]
+        return row
+
+    def run(self, on_level=None):
+        """on_level(done, total, level)은 수준마다 호출. 반환: (rows, levels)"""
+        cases = self.cfg.cases()
+        self.prepare()
+        baseline = BaselineSnapshot(self.contracts)
+        rows, levels = [], []
+        try:
+            set_automine(self.w3, self.cfg.mining == "auto")
+            for defense, concurrency in cases:
+                level_rows, level = self.run_level(defense, concurrency, baseline)
+                rows += level_rows
+                levels.append(level)
+                if on_level:
+                    on_level(len(levels), len(cases), level)
+        finally:
+            set_automine(self.w3, True)
+            baseline.restore()
+        return rows, levels
+
+# --------------------------------------------------------------------------
+# 요약 / 저장
+# --------------------------------------------------------------------------
+def level_key(defense, concurrency):
+    return f"{defense}/c{concurrency}"
+
+def _pcts(values):
+    return {
+        "p50": float(np.percentile(values, 50)) if values else None,
+        "p99": float(np.percentile(values, 99)) if values else None,
+    }
+
+def summarize(rows, levels):
+    """동시성 수준별 탐지/방어 처리량, 큐 대기, 성공률"""
+    summary = {}
+    for level in levels:
+        group = [r for r in rows if r["defense"] == level["defense"] and r["concurrency"] == level["concurrency"]]
+        n = max(len(group), 1)
+        detected = [r for r in group if r["detected"]]
+        summary[level_key(level["defense"], level["concurrency"])] = {
+            "attacks": len(group),
+            "send_errors": level["send_errors"],
+            # watchtower 배치 처리 실패 (해당 TX는 탐지되지 않은 것으로 집계됨)
+            "watchtower_errors": level["watchtower_errors"],
+            "watchtower_error_txs": level["watchtower_error_txs"],
+            "watchtower_last_error": level["watchtower_last_error"],
+            "attack_rate": len(group) / max(level["sending_sec"], 1e-9),
+            "detect_rate": len(detected) / n,
+            "detect_throughput": len(detected) / max(level["elapsed_sec"], 1e-9),
+            # watchtower 스레드가 쉬지 않았다면 처리할 수 있는 초당 TX 수
+            "detect_capacity": len(group) / level["busy_sec"] if level["busy_sec"] else None,
+            "utilization": level["busy_sec"] / max(level["elapsed_sec"], 1e-9),
+            "defense_txs": level["defense_txs"],
+            "defense_throughput": level["defense_txs"] / max(level["elapsed_sec"], 1e-9),
+            "queue_ms": _pcts([r["queue_ms"] for r in group if r.get("queue_ms") is not None]),
+            "detect_ms": _pcts([r["detect_ms"] for r in detected]),
+            "success_rate": sum(r["win"] for r in group) / n,
+            "defended_rate": sum(r["defended"] for r in group) / n,
+            "by_attack": {
+                attack: sum(r["win"] for r in group if r["attack"] == attack) / count
+                for attack, count in ((a, sum(r["attack"] == a for r in group)) for a in ATTACKS) if count
+            },
+        }
+    return summary
+
+def save_load(rows, levels, cfg, env, root=LOAD_DIR):
+    load_id = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, f"{load_id}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "load_id": load_id,
+            "created_at": time.time(),
+            "config": cfg.to_dict(),
+            "environment": env,
+            "levels": levels,
+            "summary": summarize(rows, levels),
+            "attacks": rows,
+        }, f, ensure_ascii=False, indent=2, default=str)
+    return path
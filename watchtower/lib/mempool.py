@@ -0,0 +1,310 @@
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from web3 import Web3
+from lib.utils import rpc_batch, fetch_snapshot
+from lib.amm import DumpImpactModel
+from lib.gas import GasBidder, AttackGas, BudgetBelowBaseFee
+from lib.latency import span
+from lib.subscription import WS_URL, WS_RETRY_INTERVAL, ws_connect
+
+# --------------------------------------------------------------------------
+# 상수 및 설정
+# --------------------------------------------------------------------------
+POLL_INTERVAL = 0.2
+FETCH_BATCH = 200  # eth_getTransactionByHash를 한 번에 묶어 보내는 개수
+SEEN_CAPACITY = 100_000  # 중복 제거용으로 기억할 최근 TX 해시 수
+ALERT_HISTORY = 200
+
+# 감시 대상 함수 (컨트랙트 키 -> 함수 이름)
+WATCHED_FUNCTIONS = {
+    "FDS": ["exploitMint", "transfer", "transferFrom", "approve"],
+    "Vault": ["exploitDrain"],
+    "DEX": ["simulateDump", "addLiquidity"],
+}
+
+@dataclass(frozen=True)
+class SelectorEntry:
+    contract: str
+    function: str
+    arg_names: tuple
+    arg_types: tuple
+
+@dataclass
+class PendingTx:
+    tx_hash: str
+    sender: str
+    to: str
+    contract: str
+    function: str
+    args: dict
+    gas_price: int  # legacy gasPrice 또는 maxFeePerGas
+    nonce: int
+    seen_at: float
+    max_priority_fee: int = None  # EIP-1559 TX만
+
+@dataclass
+class MempoolAlert:
+    rule: str  # "mint" | "drain" | "depeg"
+    tx: PendingTx
+    value: float
+    threshold: float
+    message: str
+    created_at: float = field(default_factory=time.time)
+
+# --------------------------------------------------------------------------
+# 4-byte selector 테이블
+# --------------------------------------------------------------------------
+def build_selector_table(contracts, watched=WATCHED_FUNCTIONS):
+    """
+    {(to 주소 소문자, "0x" + selector): SelectorEntry}
+    분류는 dict 조회 한 번으로 끝나고, 인자 디코딩은 일치한 TX에만 수행한다.
+    """
+    table = {}
+    for key, names in watched.items():
+        contract = contracts[key]
+        address = contracts["ADDRS"][key].lower()
+        for fn_abi in contract.abi:
+            if fn_abi.get("type") != "function" or fn_abi["name"] not in names:
+                continue
+            types = tuple(i["type"] for i in fn_abi["inputs"])
+            signature = f"{fn_abi['name']}({','.join(types)})"
+            selector = Web3.keccak(text=signature)[:4].hex()
+            if not selector.startswith("0x"):
+                selector = "0x" + selector
+            table[(address, selector)] = SelectorEntry(
+                contract=key,
+                function=fn_abi["name"],
+                arg_names=tuple(i["name"] for i in fn_abi["inputs"]),
+                arg_types=types,
+            )
+    return table
+
+# --------------------------------------------------------------------------
+# 탐지 규칙 (대기 중인 TX 기준)
+# --------------------------------------------------------------------------
+@dataclass
+class MempoolRules:
+    mint_threshold: float = 50000  # FDS (한 번에 발행)
+    drain_pct: float = 10.0  # Vault 잔고 대비 %
+    depeg_pct: float = 5.0  # 오라클 대비 DEX 가격 괴리 %
+
+    def evaluate(self, tx, snap):
+        """TX가 그대로 실행됐을 때의 영향을 현재 상태(snap)에 적용해 판정. 해당 없으면 None"""
+        if tx.function == "exploitMint":
+            amount = tx.args["amount"]
+            minted = amount / 1e18
+            if minted >= self.mint_threshold:
+                return MempoolAlert("mint", tx, minted, self.mint_threshold, f"🔥 Pending mint {minted:,.0f} FDS")
+            if snap.rate_limit_usage_pct is not None and snap.period_mint + amount > snap.mint_limit:
+                return MempoolAlert("mint", tx, minted, self.mint_threshold, f"🔥 Pending mint {minted:,.0f} FDS exceeds rate limit")
+        elif tx.function == "exploitDrain" and snap.vault_usdt > 0:
+            pct = tx.args["amount"] / snap.vault_usdt * 100
+            if pct >= self.drain_pct:
+                return MempoolAlert("drain", tx, pct, self.drain_pct, f"💧 Pending drain {pct:.2f}% of Vault")
+        elif tx.function == "simulateDump":
+            pct = float(DumpImpactModel.from_snapshot(snap).spread_after(tx.args["dumpAmount"] / 1e18))
+            if pct >= self.depeg_pct:
+                return MempoolAlert("depeg", tx, pct, self.depeg_pct, f"📉 Pending dump -> spread {pct:.2f}%")
+        return None
+
+# --------------------------------------------------------------------------
+# Mempool 감시기
+# --------------------------------------------------------------------------
+class MempoolWatcher:
+    """
+    노드의 pending TX를 받아 selector 테이블로 분류하고, 규칙에 걸리면 알림을 낸다.
+
+    - newPendingTransactions 구독 (WebSocket) 또는 pending filter polling
+    - TX 본문은 eth_getTransactionByHash batch로 조회
+    - defender(DefenseEngine)를 지정하면 알림 즉시 방어 TX 발사 (GasBidder: 공격 TX보다 높게, 예산 이내)
+    - 구독자 오류는 stats["errors"] / last_error에 기록
+
+    Hardhat automine 모드에서는 TX가 보내지는 즉시 채굴되므로 pending 상태가 거의 없다.
+    front-run을 재현하려면 interval mining(evm_setAutomine false)에서 사용한다.
+    """
+
+    def __init__(self, w3, contracts, rules=None, ws_url=WS_URL, poll_interval=POLL_INTERVAL):
+        self.w3 = w3
+        self.contracts = contracts
+        self.rules = rules or MempoolRules()
+        self.ws_url = ws_url
+        self.poll_interval = poll_interval
+        self.table = build_selector_table(contracts)
+        self.codec = w3.codec
+        self.defender = None
+        self.bidder = None  # lib.gas.GasBidder (없으면 defender 첫 발사 때 기본 예산으로 생성)
+
+        self.mode = "starting"
+        self.snapshot = None
+        self.alerts = deque(maxlen=ALERT_HISTORY)
+        self.stats = {"seen": 0, "fetched": 0, "matched": 0, "alerts": 0, "fired": 0, "not_fired": 0, "errors": 0,
+                      "classify_sec": 0.0}
+        self.last_error = None
+
+        self._seen = set()
+        self._seen_order = deque()
+        self._callbacks = []
+        self._fired_block = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="mempool-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def subscribe(self, callback):
+        """알림마다 callback(MempoolAlert) 호출"""
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def on_block(self, head=None):
+        # 새 블록이면 규칙 평가에 쓰는 상태를 다시 읽도록 표시
+        self.snapshot = None
+
+    # ----------------------------------------------------------------------
+    # 분류
+    # ----------------------------------------------------------------------
+    def classify(self, tx):
+        """RPC 응답(dict) 하나를 분류. 감시 대상이 아니면 None (인자 디코딩 없음)"""
+        to = tx.get("to")
+        data = tx.get("input") or tx.get("data") or ""
+        if not to or len(data) < 10:
+            return None
+        entry = self.table.get((to.lower(), data[:10].lower()))
+        if entry is None:
+            return None
+        values = self.codec.decode(entry.arg_types, bytes.fromhex(data[10:]))
+        gas_price = tx.get("gasPrice") or tx.get("maxFeePerGas") or "0x0"
+        return PendingTx(
+            tx_hash=tx["hash"],
+            sender=tx["from"],
+            to=to,
+            contract=entry.contract,
+            function=entry.function,
+            args=dict(zip(entry.arg_names, values)),
+            gas_price=int(gas_price, 16),
+            nonce=int(tx["nonce"], 16),
+            seen_at=time.time(),
+            max_priority_fee=int(tx["maxPriorityFeePerGas"], 16) if tx.get("maxPriorityFeePerGas") else None,
+        )
+
+    def process(self, txs):
+        """TX 본문 목록을 분류하고 규칙을 적용. 발생한 알림 리스트를 돌려준다."""
+        start = time.perf_counter()
+        matched = [p for p in (self.classify(tx) for tx in txs if tx) if p is not None]
+        self.stats["classify_sec"] += time.perf_counter() - start
+        self.stats["matched"] += len(matched)
+        if not matched:
+            return []
+
+        with span("detect"):
+            if self.snapshot is None:
+                self.snapshot = fetch_snapshot(self.contracts)
+            alerts = [a for a in (self.rules.evaluate(p, self.snapshot) for p in matched) if a is not None]
+        for alert in alerts:
+            self._emit(alert)
+        return alerts
+
+    def _emit(self, alert):
+        self.stats["alerts"] += 1
+        self.alerts.appendleft(alert)
+        if self.defender is not None and not self.snapshot.paused and self._fired_block != self.snapshot.block_number:
+            self._defend(alert)
+        with self._lock:
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try:
+                callback(alert)
+            except Exception as e:
+                self.stats["errors"] += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+
+    def _defend(self, alert):
+        # 공격 TX의 수수료(EIP-1559 / legacy)보다 높게 입찰, 포함되지 않으면 bump-and-replace
+        if self.bidder is None:
+            self.bidder = GasBidder(self.w3)
+        try:
+            self.bidder.fire(self.defender, AttackGas.from_pending(alert.tx), source="mempool")
+        except BudgetBelowBaseFee:
+            self.stats["not_fired"] += 1
+            return
+        self._fired_block = self.snapshot.block_number
+        self.stats["fired"] += 1
+
+    # ----------------------------------------------------------------------
+    # 수신 루프
+    # ----------------------------------------------------------------------
+    def _handle_hashes(self, hashes):
+        fresh = []
+        for h in hashes:
+            if h in self._seen:
+                continue
+            self._seen.add(h)
+            self._seen_order.append(h)
+            fresh.append(h)
+        while len(self._seen_order) > SEEN_CAPACITY:
+            self._seen.discard(self._seen_order.popleft())
+        self.stats["seen"] += len(fresh)
+
+        for i in range(0, len(fresh), FETCH_BATCH):
+            chunk = fresh[i:i + FETCH_BATCH]
+            txs = rpc_batch(self.w3, [("eth_getTransactionByHash", [h]) for h in chunk])
+            self.stats["fetched"] += sum(1 for tx in txs if tx)
+            self.process(txs)
+
+    def _run(self):
+        while not self._stop.is_set():
+            if ws_connect is not None:
+                try:
+                    self._run_websocket()
+                except Exception:
+                    pass
+            # WebSocket을 쓸 수 없으면 일정 시간 polling 후 다시 시도
+            try:
+                self._run_polling(until=time.time() + WS_RETRY_INTERVAL)
+            except Exception:
+                self._stop.wait(1.0)
+
+    def _run_websocket(self):
+        with ws_connect(self.ws_url, open_timeout=2) as ws:
+            ws.send(json.dumps({"jsonrpc": "2.0", "id": 1, "method": "eth_subscribe", "params": ["newPendingTransactions"]}))
+            reply = json.loads(ws.recv(timeout=5))
+            if "error" in reply:
+                raise RuntimeError(reply["error"])
+            self.mode = "websocket"
+            while not self._stop.is_set():
+                # 도착한 해시를 모아서 한 번에 조회
+                hashes = []
+                try:
+                    msg = json.loads(ws.recv(timeout=1))
+                    while True:
+                        if msg.get("method") == "eth_subscription":
+                            hashes.append(msg["params"]["result"])
+                        if len(hashes) >= FETCH_BATCH:
+                            break
+                        msg = json.loads(ws.recv(timeout=0))
+                except TimeoutError:
+                    pass
+                if hashes:
+                    self._handle_hashes(hashes)
+
+    def _run_polling(self, until):
+        self.mode = "polling"
+        filter_id = self.w3.manager.request_blocking("eth_newPendingTransactionFilter", [])
+        try:
+            while not self._stop.is_set() and time.time() < until:
+                hashes = self.w3.manager.request_blocking("eth_getFilterChanges", [filter_id])
+                if hashes:
+                    self._handle_hashes([h if isinstance(h, str) else Web3.to_hex(h) for h in hashes])
+                self._stop.wait(self.poll_interval)
+        finally:
+            self.w3.manager.request_blocking("eth_uninstallFilter", [filter_id])
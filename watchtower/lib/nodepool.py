@@ -0,0 +1,224 @@
+import json
+import multiprocessing
+import os
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from queue import Empty
+from web3 import Web3
+from lib.utils import WATCHTOWER_DIR, read_abis, build_contracts, get_accounts
+
+# --------------------------------------------------------------------------
+# 상수 및 설정
+# --------------------------------------------------------------------------
+PROJECT_DIR = os.path.dirname(WATCHTOWER_DIR)
+BASE_PORT = 8600  # 8545(메인 노드)와 겹치지 않도록 별도 포트 대역 사용
+NODE_STARTUP_TIMEOUT = 120
+
+# --------------------------------------------------------------------------
+# Hardhat 노드 프로세스
+# --------------------------------------------------------------------------
+class HardhatNode:
+    def __init__(self, port, fork_block=None):
+        self.port = port
+        self.fork_block = fork_block
+        self.url = f"http://127.0.0.1:{port}"
+        self.proc = None
+
+    def start(self):
+        cmd = ["npx", "hardhat", "node", "--port", str(self.port)]
+        if self.fork_block is not None:
+            # 모든 노드가 같은 블록에서 포크해야 같은 초기 상태/주소를 가짐
+            cmd += ["--fork-block-number", str(self.fork_block)]
+        self.proc = subprocess.Popen(
+            cmd, cwd=PROJECT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        return self
+
+    def wait_ready(self, timeout=NODE_STARTUP_TIMEOUT):
+        w3 = Web3(Web3.HTTPProvider(self.url))
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"Hardhat node on port {self.port} exited ({self.proc.returncode})")
+            try:
+                w3.eth.block_number
+                return w3
+            except Exception:
+                time.sleep(0.5)
+        raise TimeoutError(f"Hardhat node on port {self.port} did not start")
+
+    def stop(self):
+        if self.proc and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+# --------------------------------------------------------------------------
+# 컨트랙트 세트 배포 (scripts/deploy_all.ts와 동일한 절차)
+# --------------------------------------------------------------------------
+def _deploy(w3, artifact, *args):
+    with open(os.path.join(WATCHTOWER_DIR, f"{artifact}.json")) as f:
+        data = json.load(f)
+    factory = w3.eth.contract(abi=data["abi"], bytecode=data["bytecode"])
+    tx_hash = factory.constructor(*args).transact({'from': w3.eth.accounts[0]})
+    return w3.eth.wait_for_transaction_receipt(tx_hash)['contractAddress']
+
+def deploy_contract_set(w3):
+    deployer, watchtower = w3.eth.accounts[0], w3.eth.accounts[1]
+    tx = {'from': deployer}
+
+    addrs = {}
+    deploy_block = w3.eth.block_number + 1
+    addrs["FDS"] = _deploy(w3, "FDSStablecoin")
+    addrs["USDT"] = _deploy(w3, "MockUSDT")
+    addrs["Vault"] = _deploy(w3, "MockVault", addrs["USDT"])
+    addrs["Oracle"] = _deploy(w3, "MockOracle")
+    addrs["DEX"] = _deploy(w3, "MockDEX", addrs["FDS"], addrs["USDT"])
+
+    abis = read_abis()
+    with open(os.path.join(WATCHTOWER_DIR, "MockUSDT.json")) as f:
+        usdt = w3.eth.contract(address=addrs["USDT"], abi=json.load(f)["abi"])
+    fds = w3.eth.contract(address=addrs["FDS"], abi=abis["FDS"])
+    dex = w3.eth.contract(address=addrs["DEX"], abi=abis["DEX"])
+
+    # Watchtower 등록, Vault에 100만 달러, DEX에 50만/50만 유동성
+    fds.functions.setWatchtower(watchtower).transact(tx)
+    usdt.functions.transfer(addrs["Vault"], Web3.to_wei(1000000, 'ether')).transact(tx)
+    fds.functions.approve(addrs["DEX"], Web3.to_wei(1000000, 'ether')).transact(tx)
+    usdt.functions.approve(addrs["DEX"], Web3.to_wei(1000000, 'ether')).transact(tx)
+    last = dex.functions.addLiquidity(Web3.to_wei(500000, 'ether'), Web3.to_wei(500000, 'ether')).transact(tx)
+    w3.eth.wait_for_transaction_receipt(last)
+    addrs["DeployBlock"] = deploy_block  # addresses.json과 같은 형식 (인덱서 시작 블록)
+    return addrs
+
+# --------------------------------------------------------------------------
+# 노드 풀
+# --------------------------------------------------------------------------
+class NodePool:
+    """
+    N개의 로컬 Hardhat 노드를 띄우고 각 노드에 같은 컨트랙트 세트를 배포한다.
+
+    with NodePool(4) as pool:
+        rows = pool.run(cfg, iterations=1000)
+    """
+
+    def __init__(self, size, base_port=BASE_PORT, fork_block=None, urls=None):
+        # urls를 주면 이미 떠 있는 노드를 사용 (프로세스 관리 안 함)
+        self.nodes = [] if urls else [HardhatNode(base_port + i, fork_block) for i in range(size)]
+        self.urls = list(urls) if urls else [n.url for n in self.nodes]
+        self.addresses = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        for node in self.nodes:
+            node.start()
+        if self.nodes:
+            w3s = [node.wait_ready() for node in self.nodes]
+        else:
+            w3s = [Web3(Web3.HTTPProvider(url)) for url in self.urls]
+        self.addresses = [deploy_contract_set(w3) for w3 in w3s]
+        return self
+
+    def stop(self):
+        for node in self.nodes:
+            node.stop()
+
+    def run(self, cfg, iterations, progress=None, on_result=None):
+        """
+        반복(iteration)을 노드 수만큼 나눠 병렬 실행하고 하나의 결과 리스트로 합친다.
+        progress(done, total)는 반복 1회가 끝날 때마다, on_result(row)는 결과가 나올 때마다 호출된다.
+        """
+        shards = [list(range(i + 1, iterations + 1, len(self.urls))) for i in range(len(self.urls))]
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Manager() as manager, ProcessPoolExecutor(max_workers=len(self.urls), mp_context=ctx) as ex:
+            queue = manager.Queue()
+            futures = [
+                ex.submit(_run_shard, url, addrs, cfg.to_dict(), shard, queue)
+                for url, addrs, shard in zip(self.urls, self.addresses, shards)
+            ]
+            # 모든 샤드가 끝났어도 큐에 남은 행은 끝까지 받아서 전달 (워커가 예외로 죽은 경우만 중단)
+            done = 0
+            while done < iterations:
+                try:
+                    _, row = queue.get(timeout=0.5)
+                except Empty:
+                    if any(f.done() and f.exception() for f in futures):
+                        break
+                    continue
+                done += 1
+                if row and on_result:
+                    on_result(row)
+                if progress:
+                    progress(done, iterations)
+
+            rows = []
+            for f in futures:
+                rows.extend(f.result())
+        return sorted(rows, key=lambda r: r["Iteration"])
+
+    def map_cells(self, cells, iterations, on_result=None):
+        """
+        설정 여러 개(셀)를 노드에 하나씩 배정해 병렬 실행한다 (sweep용).
+        노드가 비는 대로 다음 셀을 받음. on_result(셀 번호, RunningSummary)
+        """
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Manager() as manager, ProcessPoolExecutor(max_workers=len(self.urls), mp_context=ctx) as ex:
+            free = manager.Queue()
+            for node in zip(self.urls, self.addresses):
+                free.put(node)
+            futures = {
+                ex.submit(_run_cell, free, cfg.to_dict(), iterations): i
+                for i, cfg in enumerate(cells)
+            }
+            summaries = [None] * len(cells)
+            for future in as_completed(futures):
+                i = futures[future]
+                summaries[i] = future.result()
+                if on_result:
+                    on_result(i, summaries[i])
+        return summaries
+
+def _run_cell(free, cfg_dict, iterations):
+    # 워커 프로세스: 빈 노드를 하나 빌려 셀 전체를 실행하고 반납
+    from lib.experiment import ExperimentConfig, ExperimentEngine
+    from lib.results import RunningSummary
+
+    url, addrs = free.get()
+    try:
+        contracts = build_contracts(Web3(Web3.HTTPProvider(url)), addrs, read_abis())
+        summary = RunningSummary()
+        engine = ExperimentEngine(contracts, get_accounts(), ExperimentConfig.from_dict(cfg_dict))
+        for row in engine.run(iterations):
+            summary.update(row)
+        return summary
+    finally:
+        free.put((url, addrs))
+
+def _run_shard(url, addrs, cfg_dict, indices, queue=None):
+    # 워커 프로세스: 자기 노드에만 연결해서 할당된 반복을 순서대로 실행
+    from lib.experiment import ExperimentConfig, BaselineSnapshot, run_iteration
+
+    w3 = Web3(Web3.HTTPProvider(url))
+    contracts = build_contracts(w3, addrs, read_abis())
+    accs = get_accounts()
+    cfg = ExperimentConfig.from_dict(cfg_dict)
+    baseline = BaselineSnapshot(contracts)
+
+    rows = []
+    for idx in indices:
+        row = run_iteration(contracts, accs, cfg, idx, baseline=baseline)
+        if row:
+            row["Node"] = url
+            rows.append(row)
+        if queue is not None:
+            queue.put((idx, row))
+    baseline.restore()
+    return rows
@@ -0,0 +1,83 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+from web3 import Web3
+from lib.utils import MULTICALL3_ADDRESS, MULTICALL3_ABI, aggregate_calls, has_multicall, rpc_batch
+
+# --------------------------------------------------------------------------
+# 상수 및 설정
+# --------------------------------------------------------------------------
+PORTFOLIO_CHUNK = 250  # 요청 하나에 담는 주소 수 (주소당 호출 4개 -> eth_call 가스 한도 내)
+PORTFOLIO_WORKERS = 4
+COLUMNS = ["FDS", "USDT", "ETH", "Blacklisted"]
+
+ADDRESS_RE = re.compile(r"0x[0-9a-fA-F]{40}")
+
+def parse_addresses(text):
+    """업로드/붙여넣기 텍스트(CSV, 줄 단위 등)에서 주소만 추출. 순서 유지, 중복 제거"""
+    seen = {}
+    for match in ADDRESS_RE.findall(text):
+        seen.setdefault(Web3.to_checksum_address(match), None)
+    return list(seen)
+
+# --------------------------------------------------------------------------
+# 주소 목록 잔고/블랙리스트 일괄 조회
+# --------------------------------------------------------------------------
+def _scan_chunk_multicall(w3, contracts, addresses, block_number):
+    mc = w3.eth.contract(address=MULTICALL3_ADDRESS, abi=MULTICALL3_ABI)
+    fds, usdt = contracts["FDS"].functions, contracts["USDT"].functions
+    calls = []
+    for addr in addresses:
+        calls += [fds.balanceOf(addr), usdt.balanceOf(addr), mc.functions.getEthBalance(addr), fds.isBlacklisted(addr)]
+    _, values = aggregate_calls(w3, calls, block_number)
+    return [values[i:i + 4] for i in range(0, len(values), 4)]
+
+def _scan_chunk_batch(w3, contracts, addresses, block_number):
+    fds, usdt = contracts["FDS"].functions, contracts["USDT"].functions
+    block = hex(block_number)
+    requests, decoders = [], []
+    for addr in addresses:
+        for fn, kind in ((fds.balanceOf(addr), "uint256"), (usdt.balanceOf(addr), "uint256"), (None, None), (fds.isBlacklisted(addr), "bool")):
+            if fn is None:
+                requests.append(("eth_getBalance", [addr, block]))
+            else:
+                requests.append(("eth_call", [{"to": fn.address, "data": fn._encode_transaction_data()}, block]))
+            decoders.append(kind)
+    values = []
+    for kind, raw in zip(decoders, rpc_batch(w3, requests)):
+        if kind is None:
+            values.append(int(raw, 16))
+        elif not raw or raw == "0x":
+            values.append(None)
+        else:
+            values.append(w3.codec.decode([kind], bytes.fromhex(raw[2:]))[0])
+    return [values[i:i + 4] for i in range(0, len(values), 4)]
+
+def scan_portfolio(w3, contracts, addresses, block_identifier=None, chunk_size=PORTFOLIO_CHUNK,
+                   workers=PORTFOLIO_WORKERS, progress=None):
+    """
+    주소마다 FDS/USDT/ETH 잔고와 FDS 블랙리스트 여부를 같은 블록 기준으로 조회한다.
+
+    Multicall3가 있으면 chunk당 eth_call 1회, 없으면 chunk당 JSON-RPC batch 1회.
+    반환: (block_number, [{"Address", "FDS", "USDT", "ETH", "Blacklisted"}, ...]), 잔고 단위는 토큰/ETH
+    """
+    # 모든 chunk가 같은 블록을 보도록 시작 시점에 블록 번호를 고정
+    block_number = block_identifier if isinstance(block_identifier, int) else w3.eth.block_number
+    scan_chunk = _scan_chunk_multicall if has_multicall(w3) else _scan_chunk_batch
+    chunks = [addresses[i:i + chunk_size] for i in range(0, len(addresses), chunk_size)]
+
+    rows, done = [], 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(lambda chunk: scan_chunk(w3, contracts, chunk, block_number), chunks)
+        for chunk, values in zip(chunks, results):
+            for addr, (fds, usdt, eth, blacklisted) in zip(chunk, values):
+                rows.append({
+                    "Address": addr,
+                    "FDS": fds / 1e18 if fds is not None else None,
+                    "USDT": usdt / 1e18 if usdt is not None else None,
+                    "ETH": eth / 1e18 if eth is not None else None,
+                    "Blacklisted": blacklisted,
+                })
+            done += len(chunk)
+            if progress:
+                progress(done, len(addresses))
+    return block_number, rows
@@ -0,0 +1,168 @@
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from web3 import Web3
+from web3.datastructures import AttributeDict
+from web3.exceptions import TimeExhausted
+from web3._utils.method_formatters import receipt_formatter
+from lib.utils import rpc_batch
+
+# --------------------------------------------------------------------------
+# 상수 및 설정
+# --------------------------------------------------------------------------
+RECEIPT_TIMEOUT = 120.0  # wait_for_transaction_receipt 기본값과 동일
+POLL_INTERVAL = 0.05  # BlockFeed 없이 동작할 때 eth_blockNumber 확인 주기 (대기 중인 TX가 있을 때만)
+FEED_FALLBACK_INTERVAL = 1.0  # BlockFeed 구독 시에도 이 주기로는 직접 확인 (알림 누락 대비)
+MAX_CATCHUP_BLOCKS = 32  # 이보다 많은 블록이 지나갔으면 블록 대신 대기 중 hash로 직접 조회
+
+def _hex(tx_hash):
+    return tx_hash.lower() if isinstance(tx_hash, str) else Web3.to_hex(tx_hash)
+
+def format_receipt(raw):
+    """RPC 원본 receipt(hex) -> w3.eth.get_transaction_receipt()와 같은 AttributeDict"""
+    return AttributeDict.recursive(receipt_formatter(raw))
+
+@dataclass(eq=False)
+class _Watch:
+    hashes: list  # 감시할 tx hash (호출자가 교체 TX를 추가할 수 있음 -> 그중 먼저 포함된 쪽으로 완료)
+    future: Future
+    timeout: float
+    deadline: float
+    checked: set = field(default_factory=set)  # 등록 후 직접 조회를 마친 hash
+
+# --------------------------------------------------------------------------
+# 블록 단위 일괄 receipt 조회
+# --------------------------------------------------------------------------
+class ReceiptResolver:
+    """
+    대기 중인 모든 TX의 receipt를 블록마다 한 번의 요청으로 확인하고 Future를 완료한다.
+    TX마다 wait_for_transaction_receipt로 polling하지 않으므로 RPC 부하가 대기 TX 수와 무관.
+
+    - watch(tx_hash 또는 list) -> Future (receipt, 시간 초과면 TimeExhausted)
+    - 새 블록: eth_getBlockReceipts (미지원 노드는 대기 중 hash 전체를 eth_getTransactionReceipt batch로)
+    - 새로 등록된 hash는 다음 확인 때 eth_blockNumber와 같은 batch로 한 번 직접 조회 (등록 전에 이미 채굴된 경우)
+    - feed(lib.subscription.BlockFeed)가 있으면 새 블록 알림으로 깨어나고, 없으면 대기 TX가 있을 때만 polling
+    """
+
+    def __init__(self, w3, feed=None, poll_interval=POLL_INTERVAL, timeout=RECEIPT_TIMEOUT):
+        self.w3 = w3
+        self.timeout = timeout
+        self.poll_interval = FEED_FALLBACK_INTERVAL if feed is not None else poll_interval
+        self.block_receipts = None  # eth_getBlockReceipts 지원 여부 (첫 요청에서 확인)
+        self.stats = {"watched": 0, "resolved": 0, "timeouts": 0, "requests": 0, "errors": 0}
+        self.last_error = None  # 마지막 확인 오류 (summary()로 daemon heartbeat / 페이지에 표시)
+
+        self._watches = []
+        self._last_block = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        if feed is not None:
+            feed.subscribe(lambda head: self._wake.set())
+
+    def watch(self, tx_hashes, timeout=None):
+        """tx hash 하나 또는 (교체 TX가 추가될 수 있는) hash 리스트 -> receipt Future"""
+        if not isinstance(tx_hashes, list):
+            tx_hashes = [tx_hashes]
+        timeout = timeout or self.timeout
+        entry = _Watch(tx_hashes, Future(), timeout, time.time() + timeout)
+        with self._lock:
+            self._watches.append(entry)
+            self.stats["watched"] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="receipt-resolver", daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return entry.future
+
+    def wait(self, tx_hash, timeout=None):
+        """wait_for_transaction_receipt 대체"""
+        return self.watch(tx_hash, timeout).result()
+
+    # ----------------------------------------------------------------------
+    # 확인 루프
+    # ----------------------------------------------------------------------
+    def _run(self):
+        while True:
+            with self._lock:
+                idle = not self._watches
+                if idle:
+                    self._last_block = None  # 쉬는 동안 지나간 블록은 새 hash 직접 조회로 확인
+            # 대기 TX가 없으면 요청 없이 watch()를 기다림
+            self._wake.wait(None if idle else self.poll_interval)
+            self._wake.clear()
+            try:
+                self._tick()
+            except Exception as e:
+                self.stats["errors"] += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                # 노드 오류가 계속돼도 시간 초과된 Future는 완료
+                with self._lock:
+                    watches = list(self._watches)
+                self._resolve(watches, {})
+
+    def _tick(self):
+        with self._lock:
+            watches = list(self._watches)
+        if not watches:
+            return
+        unchecked = list(dict.fromkeys(_hex(h) for w in watches for h in list(w.hashes) if h not in w.checked))
+        results = rpc_batch(self.w3, [("eth_blockNumber", [])] + [("eth_getTransactionReceipt", [h]) for h in unchecked])
+        self.stats["requests"] += 1
+        head, found = int(results[0], 16), {r["transactionHash"]: r for r in results[1:] if r}
+        for w in watches:
+            w.checked.update(list(w.hashes))
+
+        last = self._last_block
+        if last is not None and head - last > MAX_CATCHUP_BLOCKS:
+            # 오래 멈췄다 재개한 경우: 건너뛴 블록을 다 읽는 대신 대기 중 hash 전체를 직접 조회
+            found.update(self._lookup(watches))
+        elif last is not None and last < head:
+            found.update(self._block_receipts(range(last + 1, head + 1), watches))
+        # 처음 확인하는 경우 / evm_revert 등으로 블록 번호가 되돌아간 경우 -> 현재 head부터
+        self._last_block = head
+        self._resolve(watches, found)
+
+    def _block_receipts(self, numbers, watches):
+        if self.block_receipts is not False:
+            try:
+                results = rpc_batch(self.w3, [("eth_getBlockReceipts", [hex(n)]) for n in numbers])
+                self.block_receipts = True
+                self.stats["requests"] += 1
+                return {r["transactionHash"]: r for receipts in results for r in receipts or []}
+            except RuntimeError:
+                if self.block_receipts:
+                    raise
+                self.block_receipts = False
+        return self._lookup(watches)
+
+    def _lookup(self, watches):
+        hashes = list(dict.fromkeys(_hex(h) for w in watches for h in list(w.hashes)))
+        results = rpc_batch(self.w3, [("eth_getTransactionReceipt", [h]) for h in hashes])
+        self.stats["requests"] += 1
+        return {r["transactionHash"]: r for r in results if r}
+
+    def _resolve(self, watches, found):
+        found = {h.lower(): r for h, r in found.items()}
+        now = time.time()
+        done = []
+        for w in watches:
+            raw = next((found[h] for h in map(_hex, list(w.hashes)) if h in found), None)
+            if raw is not None:
+                w.future.set_result(format_receipt(raw))
+                self.stats["resolved"] += 1
+            elif now > w.deadline:
+                w.future.set_exception(TimeExhausted(
+                    f"Transaction {_hex(w.hashes[-1])} is not in the chain after {w.timeout:g} seconds"))
+                self.stats["timeouts"] += 1
+            else:
+                continue
+            done.append(w)
+        if done:
+            with self._lock:
+                self._watches = [w for w in self._watches if not any(w is d for d in done)]
+
+    def summary(self):
+        with self._lock:
+            return {"pending": len(self._watches), **self.stats, "last_error": self.last_error}
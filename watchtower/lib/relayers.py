@@ -0,0 +1,282 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from eth_account import Account
+from web3 import Web3
+from web3.exceptions import Web3RPCError
+from lib.utils import rpc_batch
+from lib.receipts import ReceiptResolver
+
+# --------------------------------------------------------------------------
+# 상수 및 설정
+# --------------------------------------------------------------------------
+# Hardhat 기본 계정 #2 ~ #5 (로컬 노드에서 자금이 있는 제출 전용 계정)
+RELAYER_PKS = [
+    "0x5de4111afa1a4b94908f83103eb1f1706367c2e68ca870fc3fb9a804cdab365a",  # Account #2
+    "0x7c852118294e51e653712a81e05800f419141751be58f605c371e15141b007a6",  # Account #3
+    "0x47e179ec197488593b187f80a00eb0da91f1b9d0b13f8733639f19c30a34926a",  # Account #4
+    "0x8b3a350cf5c34c9194ca85829a2df0ec3153be0318b5e2d3348e872092edffba",  # Account #5
+]
+RELAY_FANOUT = 2  # 서명 하나를 동시에 제출하는 relayer 수 (automine에서는 1)
+RELAY_GAS = 300000
+CANCEL_BUMP = 1.125  # 교체 TX는 기존 가스비보다 10% 이상 높아야 노드가 받아줌
+RELAY_TIMEOUT = 120.0
+FEE_FIELDS = ("gasPrice", "maxFeePerGas", "maxPriorityFeePerGas")
+
+@dataclass
+class Relayer:
+    account: object
+    nonce: int = None
+    balance: int = 0
+    in_flight: dict = field(default_factory=dict)  # nonce -> 최신 tx hash (취소 TX로 교체되면 갱신)
+    last_used: float = 0.0
+
+    @property
+    def address(self):
+        return self.account.address
+
+@dataclass
+class RelayFiring:
+    tx_hashes: list  # 제출된 pauseByWatchtower TX (relayer별)
+    relayers: list
+    sent_at: float
+    receipt: Future  # 가장 먼저 성공한 receipt (모두 실패하면 마지막 receipt)
+    tx: dict = None  # 서명 전 TX 템플릿 (nonce 제외, 교체 시 재사용)
+    slots: list = field(default_factory=list)  # [(relayer, nonce)]
+    cancelled: list = field(default_factory=list)
+    watched: list = field(default_factory=list)  # slot별 receipt 감시 hash (원래 -> 교체 -> 취소 TX 순으로 추가)
+
+# --------------------------------------------------------------------------
+# Relayer pool
+# --------------------------------------------------------------------------
+class RelayerPool:
+    """
+    pauseByWatchtower는 msg.sender와 무관하게 watchtower 서명만 검증하므로,
+    서명 하나를 여러 제출 계정(relayer)에서 동시에 보낸다. watchtower 계정 nonce에 줄을 서지 않음.
+
+    - relayer별 nonce는 로컬에서 추적 (sync()로 동기화, 전송 오류 시 해당 relayer만 재동기화)
+    - 진행 중 TX가 가장 적은 relayer부터 배정 (동시에 여러 방어가 나가도 서로 막지 않음)
+    - receipt는 ReceiptResolver로 블록마다 한 번에 확인 (relayer별 polling 없음)
+    - 한 TX가 성공하면 아직 대기 중인 나머지 TX는 같은 nonce의 0 ETH 자기 전송으로 교체(취소)
+    - Hardhat automine이면 relayer 하나로만 제출 (사본이 모두 채굴되고 나머지는 "Already paused"로 revert)
+    """
+
+    def __init__(self, w3, contracts, keys=RELAYER_PKS, fanout=RELAY_FANOUT, gas=RELAY_GAS, broadcaster=None,
+                 receipts=None):
+        self.w3 = w3
+        self.receipts = receipts or ReceiptResolver(w3)  # 방어 TX receipt는 블록 단위 일괄 확인
+        self.fds = contracts["FDS"]
+        self.fds_address = Web3.to_checksum_address(contracts["ADDRS"]["FDS"])
+        self.relayers = [Relayer(Account.from_key(k)) for k in keys]
+        self.fanout = fanout
+        self.gas = gas
+        self.broadcaster = broadcaster
+        self.chain_id = w3.eth.chain_id
+        self.automine = False  # sync()마다 hardhat_getAutomine으로 확인 (미지원 노드는 False)
+        self._automine_rpc = True
+        self.stats = {"relayed": 0, "sent": 0, "won": 0, "cancelled": 0, "send_errors": 0}
+
+        self._lock = threading.Lock()
+        self._senders = ThreadPoolExecutor(max_workers=max(len(self.relayers), 1), thread_name_prefix="relay-send")
+        self._workers = ThreadPoolExecutor(max_workers=4, thread_name_prefix="relay-cancel")
+
+    # ----------------------------------------------------------------------
+    # 상태 동기화
+    # ----------------------------------------------------------------------
+    def sync(self, relayers=None):
+        relayers = relayers or self.relayers
+        requests = [
+            req for r in relayers
+            for req in (("eth_getTransactionCount", [r.address, "pending"]), ("eth_getBalance", [r.address, "latest"]))
+        ]
+        if self._automine_rpc:
+            try:
+                *results, automine = rpc_batch(self.w3, requests + [("hardhat_getAutomine", [])])
+                self.automine = bool(automine)
+            except RuntimeError:
+                self._automine_rpc = False
+        if not self._automine_rpc:
+            results = rpc_batch(self.w3, requests)
+        with self._lock:
+            for i, r in enumerate(relayers):
+                r.nonce, r.balance = int(results[2 * i], 16), int(results[2 * i + 1], 16)
+
+    def available(self, gas_price=0):
+        """가스비를 낼 수 있는 relayer 목록 (자금이 없는 네트워크에서는 빈 리스트 -> 직접 전송)"""
+        if any(r.nonce is None for r in self.relayers):
+            self.sync()
+        return [r for r in self.relayers if r.balance >= self.gas * gas_price]
+
+    def _acquire(self, gas_price):
+        with self._lock:
+            funded = [r for r in self.relayers if r.nonce is not None and r.balance >= self.gas * gas_price]
+            fanout = 1 if self.automine else self.fanout
+            chosen = sorted(funded, key=lambda r: (len(r.in_flight), r.last_used))[:fanout]
+            now = time.time()
+            for r in chosen:
+                r.last_used = now
+            return chosen
+
+    # ----------------------------------------------------------------------
+    # 전송
+    # ----------------------------------------------------------------------
+    def _send_raw(self, raw_tx):
+        if self.broadcaster is not None:
+            return self.broadcaster.send(raw_tx).tx_hash
+        return Web3.to_hex(self.w3.eth.send_raw_transaction(raw_tx))
+
+    def _sign(self, relayer, tx):
+        with self._lock:
+            nonce = relayer.nonce
+            relayer.nonce += 1
+        signed = relayer.account.sign_transaction(dict(tx, nonce=nonce, chainId=self.chain_id))
+        return nonce, bytes(signed.raw_transaction)
+
+    def _submit(self, relayer, tx):
+        """relayer 하나로 전송 (nonce 오류면 그 relayer만 재동기화 후 1회 재시도). 실패 시 None"""
+        for attempt in range(2):
+            nonce, raw = self._sign(relayer, tx)
+            try:
+                tx_hash = self._send_raw(raw)
+            except (Web3RPCError, ValueError):
+                with self._lock:
+                    self.stats["send_errors"] += 1
+                if attempt == 0:
+                    self.sync([relayer])
+                continue
+            with self._lock:
+                relayer.in_flight[nonce] = tx_hash
+                self.stats["sent"] += 1
+            return nonce, tx_hash
+        return None
+
+    def relay(self, signature, gas_price, fees=None):
+        """
+        watchtower 서명을 가장 한가한 relayer들로 동시에 제출. 하나도 못 보내면 Web3RPCError
+        fees: TX 수수료 필드 (없으면 legacy gasPrice=gas_price)
+        """
+        relayers = self._acquire(gas_price)
+        if not relayers:
+            raise Web3RPCError("No funded relayer available")
+        tx = {
+            "to": self.fds_address,
+            "data": self.fds.encode_abi("pauseByWatchtower", args=[signature]),
+            "value": 0,
+            "gas": self.gas,
+            **(fees or {"gasPrice": gas_price}),
+        }
+        sent = [(r, result) for r, result in zip(relayers, self._senders.map(lambda r: self._submit(r, tx), relayers)) if result]
+        if not sent:
+            raise Web3RPCError("All relayers failed to submit the defense transaction")
+        with self._lock:
+            self.stats["relayed"] += 1
+
+        firing = RelayFiring(
+            tx_hashes=[tx_hash for _, (_, tx_hash) in sent],
+            relayers=[r.address for r, _ in sent],
+            sent_at=time.time(),
+            receipt=Future(),
+            tx=tx,
+            slots=[(r, nonce) for r, (nonce, _) in sent],
+            watched=[[tx_hash] for _, (_, tx_hash) in sent],
+        )
+        self._watch(firing)
+        return firing
+
+    def replace(self, firing, fees):
+        """아직 대기 중인 방어 TX를 같은 nonce, 새 수수료로 교체. 교체한 TX 수를 돌려준다"""
+        firing.tx = dict({k: v for k, v in firing.tx.items() if k not in FEE_FIELDS}, **fees)
+        replaced = 0
+        for (relayer, nonce), hashes in zip(firing.slots, firing.watched):
+            with self._lock:
+                current = relayer.in_flight.get(nonce)
+            if current is None or current not in firing.tx_hashes:
+                continue  # 이미 포함됐거나 취소됨
+            signed = relayer.account.sign_transaction(dict(firing.tx, nonce=nonce, chainId=self.chain_id))
+            try:
+                tx_hash = self._send_raw(bytes(signed.raw_transaction))
+            except (Web3RPCError, ValueError):
+                continue
+            with self._lock:
+                if nonce in relayer.in_flight:
+                    relayer.in_flight[nonce] = tx_hash
+            firing.tx_hashes.append(tx_hash)
+            hashes.append(tx_hash)
+            replaced += 1
+        return replaced
+
+    # ----------------------------------------------------------------------
+    # receipt 감시 / 나머지 TX 취소
+    # ----------------------------------------------------------------------
+    def _cancel(self, relayer, nonce, fees):
+        """같은 nonce로 0 ETH 자기 전송 (수수료 인상) -> 대기 중인 방어 TX를 대체"""
+        signed = relayer.account.sign_transaction({
+            "to": relayer.address, "value": 0, "gas": 21000, "nonce": nonce, "chainId": self.chain_id,
+            **{k: int(v * CANCEL_BUMP) + 1 for k, v in fees.items()},
+        })
+        try:
+            tx_hash = self._send_raw(bytes(signed.raw_transaction))
+        except (Web3RPCError, ValueError):
+            return None  # 그 사이에 원래 TX가 채굴됨
+        with self._lock:
+            if nonce in relayer.in_flight:
+                relayer.in_flight[nonce] = tx_hash
+            self.stats["cancelled"] += 1
+        return tx_hash
+
+    def _watch(self, firing):
+        """slot(relayer, nonce)마다 원래 / 교체 / 취소 TX 중 먼저 채굴된 receipt를 ReceiptResolver로 기다림"""
+        state = {"left": len(firing.slots), "last": None, "won": False}
+        for slot, hashes in zip(firing.slots, firing.watched):
+            future = self.receipts.watch(hashes, RELAY_TIMEOUT)
+            future.add_done_callback(lambda f, slot=slot: self._settle(firing, slot, f, state))
+
+    def _settle(self, firing, slot, future, state):
+        # ReceiptResolver 스레드에서 호출 -> RPC가 필요한 취소/재동기화는 별도 스레드로
+        relayer, nonce = slot
+        try:
+            receipt = future.result()
+        except Exception:
+            receipt = None  # 시간 초과: 남은 nonce는 노드 기준으로 다시 맞춤
+            self._workers.submit(self.sync, [relayer])
+        defense = receipt is not None and Web3.to_hex(receipt["transactionHash"]).lower() in \
+            {h.lower() for h in firing.tx_hashes}  # 아니면 취소 TX가 채굴된 것
+        with self._lock:
+            relayer.in_flight.pop(nonce, None)
+            state["left"] -= 1
+            if defense:
+                state["last"] = receipt
+            won = defense and receipt["status"] == 1 and not state["won"]
+            if won:
+                state["won"] = True
+                self.stats["won"] += 1
+            done = state["left"] == 0 and not state["won"]
+        if won:
+            firing.receipt.set_result(receipt)
+            # 이미 방어 성공 -> 아직 대기 중인 나머지 방어 TX 취소
+            self._workers.submit(self._cancel_rest, firing)
+        elif done:
+            if state["last"] is not None:
+                firing.receipt.set_result(state["last"])  # 모두 revert (예: 다른 경로로 이미 pause)
+            else:
+                firing.receipt.set_exception(TimeoutError(f"Relayed defense not mined in {RELAY_TIMEOUT:.0f}s"))
+
+    def _cancel_rest(self, firing):
+        fees = {k: v for k, v in firing.tx.items() if k in FEE_FIELDS}
+        for (relayer, nonce), hashes in zip(firing.slots, firing.watched):
+            with self._lock:
+                current = relayer.in_flight.get(nonce)
+            if current is not None and current in firing.tx_hashes:
+                cancel_hash = self._cancel(relayer, nonce, fees)
+                if cancel_hash:
+                    hashes.append(cancel_hash)  # 이 slot의 receipt 감시에 추가
+                    firing.cancelled.append(cancel_hash)
+
+    def summary(self):
+        with self._lock:
+            return {
+                "relayers": {r.address: {"nonce": r.nonce, "in_flight": len(r.in_flight), "balance_eth": r.balance / 1e18}
+                             for r in self.relayers},
+                **self.stats,
+            }
@@ -0,0 +1,273 @@
+import json
+import os
+import threading
+import time
+import uuid
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow 미설치 시 ResultStore만 사용 불가
+    pa = ds = pq = None
+
+from lib.utils import WATCHTOWER_DIR
+
+# --------------------------------------------------------------------------
+# 상수 및 설정
+# --------------------------------------------------------------------------
+RESULTS_DIR = os.path.join(WATCHTOWER_DIR, "data", "results")
+ROW_GROUP_SIZE = 1000  # 버퍼가 이만큼 차면 Parquet 파트 파일 하나로 기록
+
+def _column_types():
+    return {
+        "Iteration": pa.int64(),
+        "Type": pa.string(),
+        "AttackAmt": pa.float64(),
+        "Threshold": pa.float64(),
+        "Triggered": pa.bool_(),
+        "Success": pa.bool_(),
+        "BlockDiff": pa.float64(),  # 미탐지 시 null
+        "DefenseCost_Gas": pa.int64(),
+        "GasPrice_Gwei": pa.float64(),
+        "DefenseGasPrice_Gwei": pa.float64(),  # 방어 TX 실제 단가 (base fee + tip)
+        "Latency_Sec": pa.float64(),
+        "DefenseLatency_Sec": pa.float64(),
+        "Detect_ms": pa.float64(),
+        "Sign_ms": pa.float64(),
+        "Broadcast_ms": pa.float64(),
+        "Include_ms": pa.float64(),
+        "Status": pa.string(),
+        "Node": pa.string(),
+    }
+
+# --------------------------------------------------------------------------
+# 증분 집계
+# --------------------------------------------------------------------------
+class RunningSummary:
+    """행을 하나씩 반영하는 요약 통계 (전체 데이터를 다시 읽지 않음)"""
+
+    def __init__(self, count=0, triggered=0, success=0, gas_sum=0, gas_count=0, block_diff=None):
+        self.count = count
+        self.triggered = triggered
+        self.success = success
+        self.gas_sum = gas_sum
+        self.gas_count = gas_count
+        self.block_diff = dict(block_diff or {})  # BlockDiff 값 -> 건수
+
+    def update(self, row):
+        self.count += 1
+        if row.get("Triggered"):
+            self.triggered += 1
+            self.gas_sum += row.get("DefenseCost_Gas") or 0
+            self.gas_count += 1
+        if row.get("Success"):
+            self.success += 1
+        diff = row.get("BlockDiff")
+        if diff is not None:
+            key = str(int(diff))
+            self.block_diff[key] = self.block_diff.get(key, 0) + 1
+
+    def update_columns(self, columns):
+        """컬럼 배열(dict of numpy arrays) 단위로 반영 (Fast Mode 대량 결과용)"""
+        import numpy as np
+        triggered = np.asarray(columns["Triggered"], dtype=bool)
+        self.count += len(triggered)
+        self.triggered += int(triggered.sum())
+        self.success += int(np.asarray(columns["Success"], dtype=bool).sum())
+        gas = np.asarray(columns["DefenseCost_Gas"])[triggered]
+        self.gas_sum += int(gas.sum())
+        self.gas_count += len(gas)
+        diffs = np.asarray(columns["BlockDiff"], dtype=float)
+        values, counts = np.unique(diffs[~np.isnan(diffs)].astype(int), return_counts=True)
+        for value, cnt in zip(values, counts):
+            key = str(int(value))
+            self.block_diff[key] = self.block_diff.get(key, 0) + int(cnt)
+
+    @property
+    def trigger_rate(self):
+        return self.triggered / self.count if self.count else 0.0
+
+    @property
+    def success_rate(self):
+        # 방어가 시도된 건 중 성공 비율 (Experiment Runner와 같은 정의)
+        return self.success / max(1, self.triggered)
+
+    @property
+    def mean_gas(self):
+        return self.gas_sum / self.gas_count if self.gas_count else 0.0
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "triggered": self.triggered,
+            "success": self.success,
+            "gas_sum": self.gas_sum,
+            "gas_count": self.gas_count,
+            "block_diff": self.block_diff,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+# --------------------------------------------------------------------------
+# 실행(run) 단위 기록기
+# --------------------------------------------------------------------------
+class RunWriter:
+    """
+    하나의 실험 실행 결과를 append-only Parquet 파트 파일로 기록한다.
+
+    <root>/run_id=<id>/meta.json      설정 + 시작/종료 시각
+    <root>/run_id=<id>/summary.json   증분 집계
+    <root>/run_id=<id>/part-00000.parquet ...
+    """
+
+    def __init__(self, root, cfg, run_id=None, row_group_size=ROW_GROUP_SIZE):
+        self.run_id = run_id or time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+        self.path = os.path.join(root, f"run_id={self.run_id}")
+        self.row_group_size = row_group_size
+        self.summary = RunningSummary()
+        self._buffer = []
+        self._parts = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+        self.meta = {"run_id": self.run_id, "config": cfg.to_dict(), "started_at": time.time(), "finished_at": None}
+        self._write_json("meta.json", self.meta)
+
+    def _write_json(self, name, data):
+        tmp = os.path.join(self.path, name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, os.path.join(self.path, name))
+
+    def write(self, row):
+        with self._lock:
+            self.summary.update(row)
+            self._buffer.append(row)
+            if len(self._buffer) >= self.row_group_size:
+                self._flush()
+
+    def write_columns(self, columns):
+        """컬럼 배열을 그대로 파트 파일로 기록 (행 dict로 풀지 않음)"""
+        with self._lock:
+            self._flush()
+            self.summary.update_columns(columns)
+            types = _column_types()
+            n = len(columns["Iteration"])
+            for start in range(0, n, self.row_group_size * 100):
+                part = slice(start, start + self.row_group_size * 100)
+                self._write_part({
+                    col: pa.array(values[part], type=types.get(col), from_pandas=True)  # NaN -> null
+                    for col, values in columns.items()
+                })
+            self._write_json("summary.json", self.summary.to_dict())
+
+    def _write_part(self, arrays):
+        pq.write_table(pa.table(arrays), os.path.join(self.path, f"part-{self._parts:05d}.parquet"))
+        self._parts += 1
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        types = _column_types()
+        columns = []
+        for row in self._buffer:
+            columns.extend(k for k in row if k not in columns)
+        self._write_part({
+            col: pa.array([row.get(col) for row in self._buffer], type=types.get(col))
+            for col in columns
+        })
+        self._buffer = []
+        self._write_json("summary.json", self.summary.to_dict())
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self.meta["finished_at"] = time.time()
+            self._write_json("meta.json", self.meta)
+            self._write_json("summary.json", self.summary.to_dict())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# --------------------------------------------------------------------------
+# 결과 저장소
+# --------------------------------------------------------------------------
+class ResultStore:
+    def __init__(self, root=RESULTS_DIR):
+        if pa is None:
+            raise ImportError("ResultStore requires pyarrow (pip install pyarrow)")
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def create_run(self, cfg, run_id=None, row_group_size=ROW_GROUP_SIZE):
+        return RunWriter(self.root, cfg, run_id=run_id, row_group_size=row_group_size)
+
+    def _run_dirs(self):
+        return sorted(
+            d for d in os.listdir(self.root)
+            if d.startswith("run_id=") and os.path.isdir(os.path.join(self.root, d))
+        )
+
+    def list_runs(self):
+        """실행 목록 + 요약 (meta.json / summary.json만 읽음)"""
+        runs = []
+        for d in self._run_dirs():
+            path = os.path.join(self.root, d)
+            try:
+                with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            summary_path = os.path.join(path, "summary.json")
+            if os.path.exists(summary_path):
+                with open(summary_path, encoding="utf-8") as f:
+                    meta["summary"] = RunningSummary.from_dict(json.load(f))
+            else:
+                meta["summary"] = RunningSummary()
+            runs.append(meta)
+        return runs
+
+    def version(self):
+        """데이터셋 버전 토큰: 파트 파일이 추가되면 바뀜 (캐시 키로 사용)"""
+        token = []
+        for d in self._run_dirs():
+            parts = [p for p in os.listdir(os.path.join(self.root, d)) if p.endswith(".parquet")]
+            token.append((d, len(parts)))
+        return tuple(token)
+
+    def dataset(self, run_ids=None):
+        dirs = self._run_dirs()
+        if run_ids is not None:
+            wanted = {f"run_id={r}" for r in run_ids}
+            dirs = [d for d in dirs if d in wanted]
+        files = [
+            os.path.join(self.root, d, p)
+            for d in dirs
+            for p in sorted(os.listdir(os.path.join(self.root, d)))
+            if p.endswith(".parquet")
+        ]
+        if not files:
+            return None
+        # 파트마다 컬럼 구성이 조금 다를 수 있으므로 스키마를 합쳐서 사용 (run_id는 디렉터리 이름에서)
+        schema = pa.unify_schemas([pq.read_schema(f) for f in files])
+        schema = schema.append(pa.field("run_id", pa.string()))
+        return ds.dataset(
+            files, schema=schema, format="parquet",
+            partitioning=ds.partitioning(pa.schema([("run_id", pa.string())]), flavor="hive"),
+            partition_base_dir=self.root,
+        )
+
+    def load(self, run_ids=None, columns=None, filter=None):
+        """
+        필요한 실행/컬럼/행만 DataFrame으로 로드 (Parquet predicate pushdown)
+        filter 예: ds.field("Triggered") == True
+        """
+        dataset = self.dataset(run_ids)
+        if dataset is None:
+            return None
+        return dataset.to_table(columns=columns, filter=filter).to_pandas()
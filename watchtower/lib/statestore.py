@@ -0,0 +1,174 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from dataclasses import asdict
+
+# --------------------------------------------------------------------------
+# 상수 및 설정
+# --------------------------------------------------------------------------
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "watchtower.sqlite")
+HEARTBEAT_TIMEOUT = 10.0  # 이보다 오래 heartbeat가 없으면 daemon이 멈춘 것으로 간주
+KEEP_SNAPSHOTS = 512
+KEEP_EVENTS = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS snapshots (
+    block_number INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    state TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    source TEXT NOT NULL,
+    rule TEXT NOT NULL,
+    message TEXT NOT NULL,
+    block_number INTEGER,
+    tx_hash TEXT,
+    details TEXT
+);
+CREATE TABLE IF NOT EXISTS defenses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    reason TEXT NOT NULL,
+    alert_id INTEGER,
+    tx_hash TEXT NOT NULL,
+    gas_price INTEGER,
+    status TEXT NOT NULL,
+    block_number INTEGER,
+    gas_used INTEGER,
+    latency REAL
+);
+CREATE TABLE IF NOT EXISTS commands (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT,
+    processed_at REAL
+);
+"""
+
+# --------------------------------------------------------------------------
+# Daemon <-> Streamlit 공유 저장소 (SQLite WAL)
+# --------------------------------------------------------------------------
+class StateStore:
+    """
+    watchtowerd가 유일한 writer로 상태/알림/방어 기록을 남기고, Streamlit 페이지는 읽기만 한다.
+    페이지에서 daemon으로 보내는 요청(auto defense on/off 등)은 commands 테이블로 전달한다.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, readonly=False):
+        self.db_path = db_path
+        self.readonly = readonly
+        self._lock = threading.Lock()
+        if readonly:
+            self.db = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            # WAL: writer가 기록 중이어도 페이지의 읽기가 막히지 않음
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.executescript(SCHEMA)
+            self.db.commit()
+
+    def _write(self, sql, params=()):
+        with self._lock:
+            cur = self.db.execute(sql, params)
+            self.db.commit()
+            return cur.lastrowid
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            cur = self.db.execute(sql, params)
+            columns = [c[0] for c in cur.description]
+            return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+    # ----------------------------------------------------------------------
+    # daemon 상태 (heartbeat / 설정 / 통계)
+    # ----------------------------------------------------------------------
+    def set_meta(self, **values):
+        with self._lock:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [(k, json.dumps(v, default=str)) for k, v in values.items()],
+            )
+            self.db.commit()
+
+    def meta(self):
+        return {r["key"]: json.loads(r["value"]) for r in self._query("SELECT key, value FROM meta")}
+
+    def status(self):
+        """meta + online 여부 (heartbeat 기준)"""
+        meta = self.meta()
+        heartbeat = meta.get("heartbeat")
+        meta["online"] = heartbeat is not None and time.time() - heartbeat < HEARTBEAT_TIMEOUT
+        return meta
+
+    # ----------------------------------------------------------------------
+    # 체인 상태 스냅샷
+    # ----------------------------------------------------------------------
+    def put_snapshot(self, snap):
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO snapshots (block_number, created_at, state) VALUES (?, ?, ?)",
+                (snap.block_number, time.time(), json.dumps(asdict(snap))),
+            )
+            self.db.execute("DELETE FROM snapshots WHERE block_number <= ?", (snap.block_number - KEEP_SNAPSHOTS,))
+            self.db.commit()
+
+    def latest_snapshot(self):
+        """가장 최근 StateSnapshot (없으면 None)"""
+        from lib.utils import StateSnapshot
+        rows = self._query("SELECT state FROM snapshots ORDER BY block_number DESC LIMIT 1")
+        return StateSnapshot(**json.loads(rows[0]["state"])) if rows else None
+
+    # ----------------------------------------------------------------------
+    # 알림 / 방어 기록
+    # ----------------------------------------------------------------------
+    def add_alert(self, source, rule, message, block_number=None, tx_hash=None, details=None):
+        alert_id = self._write(
+            "INSERT INTO alerts (created_at, source, rule, message, block_number, tx_hash, details) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (time.time(), source, rule, message, block_number, tx_hash, json.dumps(details or {}, default=str)),
+        )
+        if alert_id % 100 == 0:
+            self._write("DELETE FROM alerts WHERE id <= ?", (alert_id - KEEP_EVENTS,))
+        return alert_id
+
+    def add_defense(self, reason, tx_hash, gas_price, alert_id=None):
+        return self._write(
+            "INSERT INTO defenses (created_at, reason, alert_id, tx_hash, gas_price, status) VALUES (?, ?, ?, ?, ?, 'pending')",
+            (time.time(), reason, alert_id, tx_hash, gas_price),
+        )
+
+    def finish_defense(self, defense_id, status, block_number=None, gas_used=None, latency=None):
+        self._write(
+            "UPDATE defenses SET status = ?, block_number = ?, gas_used = ?, latency = ? WHERE id = ?",
+            (status, block_number, gas_used, latency, defense_id),
+        )
+
+    def alerts(self, limit=20):
+        return self._query("SELECT * FROM alerts ORDER BY id DESC LIMIT ?", (limit,))
+
+    def defenses(self, limit=20):
+        return self._query("SELECT * FROM defenses ORDER BY id DESC LIMIT ?", (limit,))
+
+    # ----------------------------------------------------------------------
+    # 페이지 -> daemon 요청
+    # ----------------------------------------------------------------------
+    def send_command(self, name, value=None):
+        # 읽기 전용 연결로는 쓸 수 없으므로 요청만 별도 연결로 기록
+        with closing(sqlite3.connect(self.db_path)) as db, db:
+            db.execute("INSERT INTO commands (created_at, name, value) VALUES (?, ?, ?)",
+                       (time.time(), name, json.dumps(value)))
+
+    def take_commands(self):
+        rows = self._query("SELECT id, name, value FROM commands WHERE processed_at IS NULL ORDER BY id")
+        if rows:
+            self._write("UPDATE commands SET processed_at = ? WHERE id <= ? AND processed_at IS NULL",
+                        (time.time(), rows[-1]["id"]))
+        return [(r["name"], json.loads(r["value"])) for r in rows]
@@ -0,0 +1,163 @@
+import json
+import threading
+import time
+from dataclasses import dataclass
+
+try:
+    from websockets.sync.client import connect as ws_connect
+except ImportError:  # websockets 미설치 시 polling으로만 동작
+    ws_connect = None
+
+# --------------------------------------------------------------------------
+# 상수 및 설정
+# --------------------------------------------------------------------------
+WS_URL = "ws://127.0.0.1:8545"  # Hardhat 노드는 HTTP와 같은 포트에서 WebSocket도 받음
+POLL_INTERVAL = 0.5
+WS_RETRY_INTERVAL = 30.0
+
+@dataclass(frozen=True)
+class BlockHead:
+    number: int
+    hash: str
+    parent_hash: str
+    timestamp: int
+
+    @classmethod
+    def from_rpc(cls, header):
+        def as_int(v):
+            return int(v, 16) if isinstance(v, str) else int(v)
+
+        def as_hex(v):
+            return v if isinstance(v, str) else "0x" + bytes(v).hex()
+
+        return cls(
+            number=as_int(header["number"]),
+            hash=as_hex(header["hash"]),
+            parent_hash=as_hex(header["parentHash"]),
+            timestamp=as_int(header["timestamp"]),
+        )
+
+# --------------------------------------------------------------------------
+# newHeads 구독 (WebSocket 우선, 실패 시 polling)
+# --------------------------------------------------------------------------
+class BlockFeed:
+    """
+    백그라운드 스레드에서 새 블록을 받아 구독자에게 전달한다.
+
+    - subscribe(callback): 새 블록마다 callback(BlockHead) 호출
+    - wait_for_block(after, timeout): after보다 높은 블록이 올 때까지 대기
+      (노드 재시작 / reorg로 head가 되돌아가면 그 head로 바로 반환)
+    - 구독자 오류는 stats["errors"] / last_error에 기록
+    """
+
+    def __init__(self, w3, ws_url=WS_URL, poll_interval=POLL_INTERVAL):
+        self.w3 = w3
+        self.ws_url = ws_url
+        self.poll_interval = poll_interval
+        self.mode = "starting"
+        self.latest = None
+        self.stats = {"blocks": 0, "resets": 0, "errors": 0}
+        self.last_error = None
+        self._callbacks = []
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="block-feed", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    # ----------------------------------------------------------------------
+    # 구독자 관리
+    # ----------------------------------------------------------------------
+    def subscribe(self, callback):
+        with self._cond:
+            self._callbacks.append(callback)
+
+        def unsubscribe():
+            with self._cond:
+                if callback in self._callbacks:
+                    self._callbacks.remove(callback)
+        return unsubscribe
+
+    def wait_for_block(self, after, timeout=None):
+        """after 이후의 블록이 도착하면 그 BlockHead, head가 되돌아갔으면 그 head, 시간 초과면 None"""
+        with self._cond:
+            resets = self.stats["resets"]
+
+            def ready():
+                if self.latest is None:
+                    return False
+                return self.latest.number > after or self.stats["resets"] != resets
+
+            if self._cond.wait_for(ready, timeout=timeout):
+                return self.latest
+            return None
+
+    def _publish(self, head):
+        with self._cond:
+            if self.latest is not None and head.hash == self.latest.hash:
+                return
+            if self.latest is not None and head.number <= self.latest.number:
+                self.stats["resets"] += 1  # 노드 재시작 / reorg (같거나 낮은 높이의 다른 블록)
+            self.latest = head
+            self.stats["blocks"] += 1
+            self._cond.notify_all()
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try:
+                callback(head)
+            except Exception as e:
+                with self._cond:
+                    self.stats["errors"] += 1
+                    self.last_error = f"{type(e).__name__}: {e}"
+
+    # ----------------------------------------------------------------------
+    # 수신 루프
+    # ----------------------------------------------------------------------
+    def _run(self):
+        while not self._stop.is_set():
+            if ws_connect is not None:
+                try:
+                    self._run_websocket()
+                except Exception:
+                    pass
+            # WebSocket을 쓸 수 없으면 일정 시간 polling 후 다시 시도
+            self._run_polling(until=time.time() + WS_RETRY_INTERVAL)
+
+    def _run_websocket(self):
+        with ws_connect(self.ws_url, open_timeout=2) as ws:
+            ws.send(json.dumps({"jsonrpc": "2.0", "id": 1, "method": "eth_subscribe", "params": ["newHeads"]}))
+            reply = json.loads(ws.recv(timeout=5))
+            if "error" in reply:
+                raise RuntimeError(reply["error"])
+            self.mode = "websocket"
+            while not self._stop.is_set():
+                try:
+                    msg = json.loads(ws.recv(timeout=1))
+                except TimeoutError:
+                    continue
+                if msg.get("method") == "eth_subscription":
+                    self._publish(BlockHead.from_rpc(msg["params"]["result"]))
+
+    def _run_polling(self, until):
+        self.mode = "polling"
+        last_number = self.latest.number if self.latest else None
+        while not self._stop.is_set() and time.time() < until:
+            try:
+                number = self.w3.eth.block_number
+                if last_number is None or number < last_number:
+                    # 최초 실행 또는 노드 재시작
+                    last_number = number - 1
+                # 한꺼번에 많은 블록이 생겼으면 최근 것만 전달
+                for n in range(max(last_number + 1, number - 31), number + 1):
+                    self._publish(BlockHead.from_rpc(self.w3.eth.get_block(n)))
+                last_number = number
+            except Exception:
+                pass
+            self._stop.wait(self.poll_interval)
@@ -0,0 +1,243 @@
+import hashlib
+import itertools
+import json
+import os
+import time
+import uuid
+import numpy as np
+import pandas as pd
+from lib.utils import WATCHTOWER_DIR, rpc_batch, fetch_snapshot
+from lib.experiment import ExperimentConfig, ExperimentEngine
+from lib.results import RunningSummary
+
+# --------------------------------------------------------------------------
+# 상수 및 설정
+# --------------------------------------------------------------------------
+SWEEPS_DIR = os.path.join(WATCHTOWER_DIR, "data", "sweeps")
+CACHE_DIR = os.path.join(SWEEPS_DIR, "cache")
+
+SWEEP_PARAMS = ["fds_threshold", "attack_range", "gas_volatility", "delay_range", "defense_action"]
+RANGE_PARAMS = {"attack_range": ("attack_min", "attack_max"), "delay_range": ("delay_min", "delay_max")}
+METRICS = ["trigger_rate", "success_rate", "mean_gas"]
+
+# --------------------------------------------------------------------------
+# 셀(설정 조합) 생성
+# --------------------------------------------------------------------------
+def grid_cells(base, axes):
+    """axes: {파라미터: [값, ...]} -> 모든 조합의 ExperimentConfig"""
+    names = [n for n in SWEEP_PARAMS if n in axes]
+    cells = []
+    for values in itertools.product(*(axes[n] for n in names)):
+        data = base.to_dict()
+        data.update(zip(names, values))
+        cells.append(ExperimentConfig.from_dict(data))
+    return cells
+
+def latin_hypercube_cells(base, axes, samples, seed=0):
+    """
+    axes: 수치 파라미터는 [하한, 상한], 범위 파라미터(attack_range/delay_range)도 [하한, 상한]
+    (두 점을 뽑아 정렬), defense_action은 후보 리스트 (층마다 순환 배정)
+    """
+    rng = np.random.default_rng(seed)
+
+    def lhs_column():
+        # 구간을 samples개로 나누고 각 구간에서 하나씩 뽑은 뒤 섞음
+        return (rng.permutation(samples) + rng.uniform(0, 1, samples)) / samples
+
+    columns = {}
+    for name in SWEEP_PARAMS:
+        if name not in axes:
+            continue
+        if name == "defense_action":
+            choices = list(axes[name])
+            columns[name] = [choices[i % len(choices)] for i in rng.permutation(samples)]
+            continue
+        low, high = axes[name]
+        if name in RANGE_PARAMS:
+            a = low + (high - low) * lhs_column()
+            b = low + (high - low) * lhs_column()
+            columns[name] = [(float(min(x, y)), float(max(x, y))) for x, y in zip(a, b)]
+        else:
+            columns[name] = (low + (high - low) * lhs_column()).tolist()
+
+    cells = []
+    for i in range(samples):
+        data = base.to_dict()
+        data.update({name: col[i] for name, col in columns.items()})
+        cells.append(ExperimentConfig.from_dict(data))
+    return cells
+
+def cells_from_spec(spec):
+    base = ExperimentConfig.from_dict(spec.get("base", {}))
+    if base.seed is None:
+        # 캐시 키에 seed가 들어가므로 sweep에서는 항상 고정
+        base.seed = 0
+    axes = spec["axes"]
+    if spec.get("method", "grid") == "lhs":
+        return latin_hypercube_cells(base, axes, spec.get("samples", 32), seed=base.seed)
+    return grid_cells(base, axes)
+
+# --------------------------------------------------------------------------
+# 캐시 키: (설정, 반복 수, 백엔드, 컨트랙트 바이트코드 + 기준 상태)
+# --------------------------------------------------------------------------
+def contract_fingerprint(contracts):
+    keys = ["FDS", "Vault", "DEX", "Oracle", "USDT"]
+    w3 = contracts["FDS"].w3
+    codes = rpc_batch(w3, [("eth_getCode", [contracts["ADDRS"][k], "latest"]) for k in keys])
+    snap = fetch_snapshot(contracts)
+    h = hashlib.sha256()
+    for code in codes:
+        h.update(bytes.fromhex(code[2:]))
+    # 같은 바이트코드라도 시작 상태(잔고/준비금)가 다르면 결과가 달라짐
+    state = [snap.paused, snap.total_supply, snap.vault_usdt, snap.oracle_price,
+             snap.period_mint, snap.mint_limit, snap.reserve_fds, snap.reserve_usdt]
+    h.update(json.dumps(state).encode())
+    return h.hexdigest()
+
+def cell_key(cfg, iterations, backend, fingerprint):
+    payload = json.dumps(
+        {"config": cfg.to_dict(), "iterations": iterations, "backend": backend, "contracts": fingerprint},
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class CellCache:
+    """셀 하나의 요약 결과를 <key>.json으로 보관"""
+
+    def __init__(self, root=CACHE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def get(self, key):
+        path = os.path.join(self.root, f"{key}.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return RunningSummary.from_dict(json.load(f)["summary"])
+
+    def put(self, key, cfg, summary):
+        tmp = os.path.join(self.root, f"{key}.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"config": cfg.to_dict(), "summary": summary.to_dict()}, f, ensure_ascii=False)
+        os.replace(tmp, os.path.join(self.root, f"{key}.json"))
+
+# --------------------------------------------------------------------------
+# Sweep 실행
+# --------------------------------------------------------------------------
+def cell_row(cfg, summary, cached):
+    row = {}
+    for name in SWEEP_PARAMS:
+        value = getattr(cfg, name)
+        if name in RANGE_PARAMS:
+            row.update(zip(RANGE_PARAMS[name], value))
+        else:
+            row[name] = value
+    row.update({
+        "exp_type": cfg.exp_type,
+        "count": summary.count,
+        "trigger_rate": summary.trigger_rate,
+        "success_rate": summary.success_rate,
+        "mean_gas": summary.mean_gas,
+        "cached": cached,
+    })
+    return row
+
+class SweepEngine:
+    """
+    셀마다 실험을 실행해 탐지율/성공률 표면을 만든다. 바뀐 셀만 다시 계산한다.
+
+    backend="fast"  : FastSimulator (오프체인 모델, 기준 상태만 노드에서 읽음)
+    backend="chain" : 실제 트랜잭션 (pool이 있으면 셀 단위로 노드에 분배)
+    """
+
+    def __init__(self, contracts, accs, backend="fast", pool=None, cache=None):
+        self.contracts = contracts
+        self.accs = accs
+        self.backend = backend
+        self.pool = pool
+        self.cache = cache or CellCache()
+
+    def run(self, cells, iterations, on_cell=None):
+        """on_cell(done, total, row)는 셀이 끝날 때마다 호출 (캐시 적중 포함)"""
+        fingerprint = contract_fingerprint(self.contracts)
+        keys = [cell_key(cfg, iterations, self.backend, fingerprint) for cfg in cells]
+        rows = [None] * len(cells)
+        done = 0
+
+        def finish(i, summary, cached):
+            nonlocal done
+            if not cached:
+                self.cache.put(keys[i], cells[i], summary)
+            rows[i] = cell_row(cells[i], summary, cached)
+            done += 1
+            if on_cell:
+                on_cell(done, len(cells), rows[i])
+
+        pending = []
+        for i, key in enumerate(keys):
+            summary = self.cache.get(key)
+            if summary is not None:
+                finish(i, summary, True)
+            else:
+                pending.append(i)
+
+        if pending:
+            if self.backend == "fast":
+                from lib.fastsim import FastSimulator, ChainState
+                sim = FastSimulator(ChainState.read(self.contracts, self.accs))
+                for i in pending:
+                    summary = RunningSummary()
+                    summary.update_columns(sim.simulate(cells[i], iterations))
+                    finish(i, summary, False)
+            elif self.pool is not None:
+                self.pool.map_cells(
+                    [cells[i] for i in pending], iterations,
+                    on_result=lambda j, summary: finish(pending[j], summary, False),
+                )
+            else:
+                for i in pending:
+                    summary = RunningSummary()
+                    for row in ExperimentEngine(self.contracts, self.accs, cells[i]).run(iterations):
+                        summary.update(row)
+                    finish(i, summary, False)
+
+        return pd.DataFrame(rows)
+
+# --------------------------------------------------------------------------
+# 결과 저장 / 표면
+# --------------------------------------------------------------------------
+def save_sweep(df, spec, root=SWEEPS_DIR, sweep_id=None):
+    sweep_id = sweep_id or time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+    path = os.path.join(root, sweep_id)
+    os.makedirs(path, exist_ok=True)
+    df.to_parquet(os.path.join(path, "cells.parquet"), index=False)
+    with open(os.path.join(path, "spec.json"), "w", encoding="utf-8") as f:
+        json.dump({"sweep_id": sweep_id, "created_at": time.time(), **spec}, f, ensure_ascii=False, indent=2)
+    return sweep_id
+
+def list_sweeps(root=SWEEPS_DIR):
+    if not os.path.isdir(root):
+        return []
+    sweeps = []
+    for name in sorted(os.listdir(root)):
+        spec_path = os.path.join(root, name, "spec.json")
+        if os.path.exists(spec_path):
+            with open(spec_path, encoding="utf-8") as f:
+                sweeps.append(json.load(f))
+    return sweeps
+
+def load_sweep(sweep_id, root=SWEEPS_DIR):
+    return pd.read_parquet(os.path.join(root, sweep_id, "cells.parquet"))
+
+def sweep_axes(df):
+    """값이 2개 이상인 파라미터 컬럼 (표면의 x/y 후보)"""
+    columns = []
+    for name in SWEEP_PARAMS:
+        for col in RANGE_PARAMS.get(name, (name,)):
+            if col in df and df[col].nunique() > 1:
+                columns.append(col)
+    return columns
+
+def surface(df, x, y, metric="success_rate"):
+    """x/y 외의 파라미터는 평균을 내서 2차원 표면(long format)으로"""
+    return df.groupby([x, y], as_index=False)[metric].mean()
@@ -3,79 +3,161 @@ import json
 import os
 from web3 import Web3
 from eth_account import Account
-from eth_account.messages import encode_defunct
 import time
+from dataclasses import dataclass, asdict
+from lib.amm import spot_price, oracle_spread_pct
+from lib.latency import RECORDER, instrument, register_abi, batch_label, span
 
 # --------------------------------------------------------------------------
 # 상수 및 설정
 # --------------------------------------------------------------------------
 RPC_URL = "http://127.0.0.1:8545"
+OWNER_PK = "0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80" # Account #0 (deployer/owner)
 WATCHTOWER_PK = "0x59c6995e998f97a5a0044966f0945389dc9e86dae88c7a8412f4603b6b78690d" # Account #1
 HACKER_PK = "0xdf57089febbacf7ba0bc227dafbffa9fc08a93fdc68e1e42411a14efcf23656e"     # Account #19
+# 방어 TX를 동시에 보낼 RPC endpoint (2개 이상이면 lib.broadcast로 hedged 전송)
+BROADCAST_URLS = [RPC_URL]
+
+# 메인넷 포크 환경에서는 Multicall3가 표준 주소에 이미 배포되어 있음
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+MULTICALL3_ABI = [
+    {"inputs":[{"internalType":"bool","name":"requireSuccess","type":"bool"},{"components":[{"internalType":"address","name":"target","type":"address"},{"internalType":"bytes","name":"callData","type":"bytes"}],"internalType":"struct Multicall3.Call[]","name":"calls","type":"tuple[]"}],"name":"tryBlockAndAggregate","outputs":[{"internalType":"uint256","name":"blockNumber","type":"uint256"},{"internalType":"bytes32","name":"blockHash","type":"bytes32"},{"components":[{"internalType":"bool","name":"success","type":"bool"},{"internalType":"bytes","name":"returnData","type":"bytes"}],"internalType":"struct Multicall3.Result[]","name":"returnData","type":"tuple[]"}],"stateMutability":"payable","type":"function"},
+    {"inputs":[{"internalType":"address","name":"addr","type":"address"}],"name":"getEthBalance","outputs":[{"internalType":"uint256","name":"balance","type":"uint256"}],"stateMutability":"view","type":"function"}
+]
 
 # --------------------------------------------------------------------------
 # Singleton Web3 연결
 # --------------------------------------------------------------------------
 @st.cache_resource
 def get_web3():
-    return Web3(Web3.HTTPProvider(RPC_URL))
+    # 모든 RPC 호출의 메서드별 지연 시간을 기록 (Latency 페이지)
+    return instrument(Web3(Web3.HTTPProvider(RPC_URL)))
 
 # --------------------------------------------------------------------------
 # 리소스 로드 (주소/ABI)
 # --------------------------------------------------------------------------
+# watchtower/lib/utils.py -> watchtower/ (실행 위치와 무관하게 절대 경로 사용)
+WATCHTOWER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def read_abis(base_path=WATCHTOWER_DIR):
+    abis = {}
+    with open(os.path.join(base_path, "FDSStablecoin.json")) as f: abis["FDS"] = json.load(f)["abi"]
+    with open(os.path.join(base_path, "MockVault.json")) as f: abis["Vault"] = json.load(f)["abi"]
+    with open(os.path.join(base_path, "MockDEX.json")) as f: abis["DEX"] = json.load(f)["abi"]
+    
+    abis["Oracle"] = [{"inputs":[],"name":"getLatestPrice","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"}]
+    abis["USDT"] = [
+        {"inputs":[{"internalType":"address","name":"account","type":"address"}],"name":"balanceOf","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},
+        {"inputs":[],"name":"totalSupply","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"}
+    ]
+    return abis
+
+def build_contracts(w3, addrs, abis):
+    """Streamlit 없이도 쓸 수 있는 컨트랙트 묶음 생성 (워커 프로세스/CLI용)"""
+    for abi in list(abis.values()) + [MULTICALL3_ABI]:
+        register_abi(abi)  # eth_call 지연 시간을 함수 이름별로 집계
+    return {
+        "FDS": w3.eth.contract(address=addrs["FDS"], abi=abis["FDS"]),
+        "Vault": w3.eth.contract(address=addrs["Vault"], abi=abis["Vault"]),
+        "DEX": w3.eth.contract(address=addrs["DEX"], abi=abis["DEX"]),
+        "Oracle": w3.eth.contract(address=addrs["Oracle"], abi=abis["Oracle"]),
+        "USDT": w3.eth.contract(address=addrs["USDT"], abi=abis["USDT"]),
+        "ADDRS": addrs,
+        "ABIS": abis
+    }
+
 @st.cache_resource
 def load_contracts():
     w3 = get_web3()
-    
-    # 루트 디렉토리 찾기 (watchtower/lib/.. -> watchtower/.. -> root)
-    # 현재 실행 위치가 root라고 가정 (streamlit run watchtower/app.py)
-    # 하지만 import 위치에 따라 다를 수 있으므로 절대 경로 사용 권장
-    # 여기서는 간단히 상대경로 시도 후 실패시 절대경로 처리 등 로직이 필요하나
-    # 사용자 환경(fds-research)에 맞춰 하드코딩된 경로 사용 가능
-    
-    base_path = "."
-    address_path = os.path.join(base_path, "watchtower", "addresses.json")
-    if not os.path.exists(address_path):
-         # 만약 streamlit을 watchtower 폴더 안에서 실행했다면
-         address_path = "addresses.json"
-         base_path = "."
-    else:
-         base_path = "watchtower"
 
     try:
-        with open(os.path.join(base_path, "addresses.json")) as f:
+        with open(os.path.join(WATCHTOWER_DIR, "addresses.json")) as f:
             addrs = json.load(f)
-        
-        abis = {}
-        with open(os.path.join(base_path, "FDSStablecoin.json")) as f: abis["FDS"] = json.load(f)["abi"]
-        with open(os.path.join(base_path, "MockVault.json")) as f: abis["Vault"] = json.load(f)["abi"]
-        with open(os.path.join(base_path, "MockDEX.json")) as f: abis["DEX"] = json.load(f)["abi"]
-        
-        abis["Oracle"] = [{"inputs":[],"name":"getLatestPrice","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"}]
-        abis["USDT"] = [
-            {"inputs":[{"internalType":"address","name":"account","type":"address"}],"name":"balanceOf","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},
-            {"inputs":[],"name":"totalSupply","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"}
-        ]
-        
-        contracts = {
-            "FDS": w3.eth.contract(address=addrs["FDS"], abi=abis["FDS"]),
-            "Vault": w3.eth.contract(address=addrs["Vault"], abi=abis["Vault"]),
-            "DEX": w3.eth.contract(address=addrs["DEX"], abi=abis["DEX"]),
-            "Oracle": w3.eth.contract(address=addrs["Oracle"], abi=abis["Oracle"]),
-            "USDT": w3.eth.contract(address=addrs["USDT"], abi=abis["USDT"]),
-            "ADDRS": addrs,
-            "ABIS": abis
-        }
-        return contracts
+        return build_contracts(w3, addrs, read_abis())
     except Exception as e:
         st.error(f"Failed to load contracts: {e}")
         return None
 
+# --------------------------------------------------------------------------
+# Transfer 이벤트 인덱서 (Top Holders)
+# --------------------------------------------------------------------------
+@st.cache_resource
+def get_indexer():
+    from lib.indexer import TransferIndexer
+    contracts = load_contracts()
+    return TransferIndexer(get_web3(), contracts["ADDRS"])
+
+# --------------------------------------------------------------------------
+# 블록 캐시 (Live Blocks) / 범위 스캐너
+# --------------------------------------------------------------------------
+@st.cache_resource
+def get_block_cache():
+    from lib.blocks import BlockCache
+    return BlockCache(get_web3())
+
+@st.cache_resource
+def get_range_scanner():
+    from lib.blocks import RangeScanner
+    return RangeScanner(get_web3(), load_contracts())
+
+# --------------------------------------------------------------------------
+# 실험 결과 저장소 (Parquet)
+# --------------------------------------------------------------------------
+@st.cache_resource
+def get_result_store():
+    from lib.results import ResultStore
+    return ResultStore()
+
+# --------------------------------------------------------------------------
+# 새 블록 구독 (newHeads)
+# --------------------------------------------------------------------------
+@st.cache_resource
+def get_block_feed():
+    from lib.subscription import BlockFeed
+    return BlockFeed(get_web3()).start()
+
+# --------------------------------------------------------------------------
+# watchtowerd 공유 상태 (읽기 전용)
+# --------------------------------------------------------------------------
+@st.cache_resource
+def _open_state_store(db_path):
+    from lib.statestore import StateStore
+    return StateStore(db_path, readonly=True)
+
+def get_state_store():
+    """daemon이 기록한 상태 저장소. 아직 만들어지지 않았으면 None (daemon 기동 후 다시 확인)"""
+    from lib.statestore import DEFAULT_DB_PATH
+    if not os.path.exists(DEFAULT_DB_PATH):
+        return None
+    return _open_state_store(DEFAULT_DB_PATH)
+
+def wait_for_next_block(after, status=None, tick=1.0, max_wait=60.0):
+    """
+    after 이후 블록이 도착할 때까지 대기 (Streamlit 페이지용).
+    tick마다 status 요소를 갱신해서 사용자가 다른 위젯을 조작하면 바로 중단되도록 한다.
+    노드가 더 낮은 높이로 재시작했으면 그 head를, max_wait 동안 블록이 없으면 None을 돌려준다 (페이지는 다시 그림).
+    """
+    feed = get_block_feed()
+    deadline = time.time() + max_wait
+    behind = 0
+    while time.time() < deadline:
+        head = feed.wait_for_block(after, timeout=tick)
+        if head is not None:
+            return head
+        # feed의 head가 계속 after보다 낮으면 (잠깐 뒤처진 것이 아니라) 노드가 더 낮은 높이로 재시작한 것
+        behind = behind + 1 if feed.latest is not None and feed.latest.number < after else 0
+        if behind >= 3:
+            return feed.latest
+        if status is not None:
+            status.caption(f"⏳ Waiting for block #{after + 1} ({feed.mode})")
+    return None
+
 # --------------------------------------------------------------------------
 # 계정 객체
 # --------------------------------------------------------------------------
 def get_accounts():
     return {
+        "owner": Account.from_key(OWNER_PK),
         "watchtower": Account.from_key(WATCHTOWER_PK),
         "hacker": Account.from_key(HACKER_PK)
     }
@@ -83,33 +165,203 @@ def get_accounts():
 # --------------------------------------------------------------------------
 # 방어 트랜잭션 공통 함수
 # --------------------------------------------------------------------------
-def send_defense_tx(contracts, reason="EMERGENCY"):
-    w3 = get_web3()
-    accs = get_accounts()
-    fds = contracts["FDS"]
-    
+_defense_engines = {}
+
+def check_watchtower_key(w3):
+    """같은 노드에서 watchtowerd가 실행 중이면 watchtower 키로 서명하지 않는다 (nonce는 daemon만 관리)"""
+    from lib.daemon import daemon_on_node
+    daemon = daemon_on_node(w3)
+    if daemon is not None:
+        raise RuntimeError(
+            f"watchtowerd (pid {daemon.get('pid')}) is the only signer of the watchtower key on "
+            f"{getattr(w3.provider, 'endpoint_uri', 'this node')}; stop it or run on another node"
+        )
+
+def get_defense_engine(contracts):
+    """노드/컨트랙트별로 하나의 DefenseEngine (미리 서명된 방어 TX 보관)"""
+    from lib.defense import DefenseEngine
+    w3 = contracts["FDS"].w3
+    # 캐시된 엔진도 매번 확인 (엔진을 만든 뒤 daemon이 기동했을 수 있음)
+    check_watchtower_key(w3)
+    key = (getattr(w3.provider, "endpoint_uri", id(w3)), contracts["ADDRS"]["FDS"])
+    if key not in _defense_engines:
+        from lib.relayers import RelayerPool
+        app_node = st.runtime.exists() and w3 is get_web3()
+        broadcaster = get_broadcaster() if app_node else None
+        # 방어 TX 제출은 relayer 계정들이 나눠서 (동시 방어가 watchtower nonce 하나에 줄 서지 않도록)
+        receipts = get_receipt_resolver(w3)
+        engine = DefenseEngine(w3, contracts, WATCHTOWER_PK, broadcaster=broadcaster,
+                               relayers=RelayerPool(w3, contracts, broadcaster=broadcaster, receipts=receipts),
+                               receipts=receipts)
+        engine.refresh()
+        if app_node:
+            # (Streamlit 앱 안에서만) 새 블록마다 nonce/가스비를 갱신하고 다음 서명을 미리 만들어 둠
+            get_block_feed().subscribe(engine.refresh)
+        _defense_engines[key] = engine
+    return _defense_engines[key]
+
+@st.cache_resource
+def get_broadcaster():
+    """BROADCAST_URLS가 2개 이상일 때만 사용 (1개면 기존 w3 전송과 동일하므로 None)"""
+    if len(BROADCAST_URLS) < 2:
+        return None
+    from lib.broadcast import Broadcaster
+    return Broadcaster(BROADCAST_URLS)
+
+_receipt_resolvers = {}
+
+def get_receipt_resolver(w3):
+    """노드별 ReceiptResolver (대기 중인 TX receipt를 블록마다 한 번에 확인)"""
+    from lib.receipts import ReceiptResolver
+    key = getattr(w3.provider, "endpoint_uri", id(w3))
+    if key not in _receipt_resolvers:
+        # 앱 노드는 이미 떠 있는 BlockFeed 알림으로 깨어나고, 나머지(병렬 노드 등)는 polling
+        feed = get_block_feed() if st.runtime.exists() and w3 is get_web3() else None
+        _receipt_resolvers[key] = ReceiptResolver(w3, feed=feed)
+    return _receipt_resolvers[key]
+
+_gas_bidders = {}
+
+def get_gas_bidder(w3):
+    """노드별 GasBidder (입찰 기록은 data/bids.jsonl)"""
+    from lib.gas import GasBidder
+    key = getattr(w3.provider, "endpoint_uri", id(w3))
+    if key not in _gas_bidders:
+        _gas_bidders[key] = GasBidder(w3)
+    return _gas_bidders[key]
+
+def send_defense_tx(contracts, reason="EMERGENCY", attack=None, budget_gwei=None):
+    """attack(lib.gas.AttackGas)이 있으면 그보다 높은 수수료로 입찰 (예산 budget_gwei 이내)"""
     start_time = time.time()
-    nonce_val = fds.functions.nonces(accs["watchtower"].address).call()
-    chain_id = w3.eth.chain_id
-    
-    # 메시지 서명
-    message_hash = w3.solidity_keccak(
-        ['string', 'uint256', 'address', 'uint256'],
-        ["EMERGENCY_PAUSE", chain_id, contracts["ADDRS"]["FDS"], nonce_val]
-    )
-    message = encode_defunct(hexstr=message_hash.hex())
-    signed_message = w3.eth.account.sign_message(message, private_key=WATCHTOWER_PK)
-    
-    # TX 전송
-    func_call = fds.functions.pauseByWatchtower(signed_message.signature).build_transaction({
-        'from': accs["watchtower"].address,
-        'nonce': w3.eth.get_transaction_count(accs["watchtower"].address),
-        'gas': 300000,
-        'gasPrice': int(w3.eth.gas_price * 1.5) # 가스비 증액 (Front-running 시도)
-    })
-    
-    signed_tx = w3.eth.account.sign_transaction(func_call, private_key=WATCHTOWER_PK)
-    tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-    receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-    
+    engine = get_defense_engine(contracts)
+    firing = get_gas_bidder(engine.w3).fire(engine, attack, budget_gwei, source="experiment")
+    with span("include"):
+        receipt = firing.receipt.result()
+
     return receipt, time.time() - start_time
+
+# --------------------------------------------------------------------------
+# 배치 조회 (JSON-RPC batch / Multicall3)
+# --------------------------------------------------------------------------
+def rpc_batch(w3, requests, allow_errors=False):
+    """
+    [(method, params), ...]를 한 번의 HTTP 왕복으로 보내고 result 리스트를 돌려준다.
+    allow_errors=True면 실패한 요청만 None (아니면 하나라도 실패 시 RuntimeError)
+    """
+    if not requests:
+        return []
+    # provider를 직접 호출하므로 middleware를 거치지 않음 -> 여기서 기록
+    start = time.perf_counter()
+    responses = w3.provider.make_batch_request(requests)
+    RECORDER.record_method(batch_label(requests), time.perf_counter() - start)
+    if not isinstance(responses, list):
+        raise RuntimeError(f"Batch request failed: {responses.get('error')}")
+    results = []
+    for resp in responses:
+        if "error" in resp:
+            if allow_errors:
+                results.append(None)
+                continue
+            raise RuntimeError(f"Batch request failed: {resp['error']}")
+        results.append(resp["result"])
+    return results
+
+_multicall_available = {}
+
+def has_multicall(w3):
+    # 노드별로 한 번만 확인 (포크가 아닌 순수 로컬 노드에는 없음)
+    key = getattr(w3.provider, "endpoint_uri", id(w3))
+    if key not in _multicall_available:
+        try:
+            _multicall_available[key] = len(w3.eth.get_code(MULTICALL3_ADDRESS)) > 0
+        except Exception:
+            _multicall_available[key] = False
+    return _multicall_available[key]
+
+def aggregate_calls(w3, calls, block_identifier=None):
+    """
+    컨트랙트 view 함수 호출 목록을 한 블록 기준으로 한꺼번에 실행한다.
+
+    calls: ContractFunction 리스트 (예: fds.functions.paused())
+    반환: (block_number, [decoded value or None, ...]) - revert된 호출만 None (두 경로 동일)
+    Multicall3가 있으면 eth_call 1회, 없으면 블록 번호를 고정한 JSON-RPC batch로 처리한다.
+    """
+    encoded = [(fn.address, fn._encode_transaction_data()) for fn in calls]
+    output_types = [[o["type"] for o in fn.abi["outputs"]] for fn in calls]
+
+    if has_multicall(w3):
+        mc = w3.eth.contract(address=MULTICALL3_ADDRESS, abi=MULTICALL3_ABI)
+        block_number, _, raw_results = mc.functions.tryBlockAndAggregate(False, encoded).call(
+            block_identifier="latest" if block_identifier is None else block_identifier
+        )
+        raw = [data if ok else None for ok, data in raw_results]
+    else:
+        block_number = block_identifier if isinstance(block_identifier, int) else w3.eth.block_number
+        raw = rpc_batch(w3, [
+            ("eth_call", [{"to": to, "data": data}, hex(block_number)]) for to, data in encoded
+        ], allow_errors=True)
+        raw = [bytes.fromhex(r[2:]) if r and r != "0x" else None for r in raw]
+
+    values = []
+    for types, data in zip(output_types, raw):
+        if data is None:
+            values.append(None)
+            continue
+        decoded = w3.codec.decode(types, data)
+        values.append(decoded[0] if len(decoded) == 1 else decoded)
+    return block_number, values
+
+# --------------------------------------------------------------------------
+# 대시보드 상태 스냅샷
+# --------------------------------------------------------------------------
+# 실패해도 스냅샷을 만들 수 있는 값 (rate limit 뷰가 없는 컨트랙트 등)
+OPTIONAL_SNAPSHOT_FIELDS = ("period_mint", "mint_limit")
+
+@dataclass(frozen=True)
+class StateSnapshot:
+    """한 블록에서 읽은 시스템 상태 (단위: wei)"""
+    block_number: int
+    paused: bool
+    total_supply: int
+    vault_usdt: int
+    oracle_price: int
+    period_mint: int  # rate limit 조회가 실패하면 None (대시보드는 N/A로 표시)
+    mint_limit: int  # 〃
+    reserve_fds: int
+    reserve_usdt: int
+
+    @property
+    def dex_price(self):
+        # MockDEX.getSpotPrice와 동일: USDT / FDS
+        return float(spot_price(self.reserve_fds, self.reserve_usdt))
+
+    @property
+    def spread_pct(self):
+        return float(oracle_spread_pct(self.dex_price, self.oracle_price))
+
+    @property
+    def rate_limit_usage_pct(self):
+        """rate limit 조회 실패 / 한도 없음이면 None"""
+        if not self.mint_limit or self.period_mint is None:
+            return None
+        return self.period_mint / self.mint_limit * 100
+
+def fetch_snapshot(contracts, block_identifier=None):
+    fds = contracts["FDS"]
+    dex = contracts["DEX"]
+    calls = [
+        fds.functions.paused(),
+        fds.functions.totalSupply(),
+        contracts["USDT"].functions.balanceOf(contracts["ADDRS"]["Vault"]),
+        contracts["Oracle"].functions.getLatestPrice(),
+        fds.functions.currentPeriodMintAmount(),
+        fds.functions.mintLimitPerPeriod(),
+        dex.functions.reserveFDS(),
+        dex.functions.reserveUSDT(),
+    ]
+    block_number, values = aggregate_calls(fds.w3, calls, block_identifier)
+    snap = StateSnapshot(block_number, *values)
+    missing = [k for k, v in asdict(snap).items() if v is None and k not in OPTIONAL_SNAPSHOT_FIELDS]
+    if missing:
+        raise RuntimeError(f"Snapshot call reverted at block {block_number}: {', '.join(missing)}")
+    return snap
@@ -1,7 +1,8 @@
 import streamlit as st
 import pandas as pd
 import time
-from lib.utils import load_contracts, get_web3
+from lib.utils import load_contracts, get_web3, get_accounts, get_indexer, get_block_cache, get_range_scanner, wait_for_next_block
+from lib.portfolio import scan_portfolio, parse_addresses
 
 st.set_page_config(page_title="Block Explorer", page_icon="🔍", layout="wide")
 st.title("🔍 Block Analysis & Explorer")
@@ -58,13 +59,14 @@ with col_status:
     if st.button("🔄 즉시 새로고침"):
         st.rerun()
 
-latest_block_num = w3.eth.block_number
+# 헤더 + TX 해시만 조회, 이미 본 블록은 캐시에서 재사용 (보통 새 블록 1개만 RPC)
+block_cache = get_block_cache()
+recent_blocks = block_cache.latest(5)
+latest_block_num = recent_blocks[0]['number']
 block_data = []
 
-# Fetch last 5 blocks
-for i in range(latest_block_num, max(0, latest_block_num - 5), -1):
-    blk = w3.eth.get_block(i, full_transactions=True)
-    tx_hashes = [tx['hash'].hex() for tx in blk['transactions']]
+for blk in recent_blocks:
+    tx_hashes = [w3.to_hex(tx) for tx in blk['transactions']]
     
     block_data.append({
         "Height": blk['number'],
@@ -72,7 +74,8 @@ for i in range(latest_block_num, max(0, latest_block_num - 5), -1):
         "GasUsed": f"{blk['gasUsed']:,}",
         "TX Count": len(blk['transactions']),
         "TXs": tx_hashes,
-        "IsLatest": (i == latest_block_num)
+        "IsLatest": (blk['number'] == latest_block_num),
+        "Block": blk
     })
 
 # 1-A. Visual Stack (Horizontal Cards)
@@ -104,14 +107,87 @@ for b in block_data:
         c1.metric("Gas Used", b['GasUsed'])
         
         if b['TXs']:
-            c2.markdown("**Transactions:**")
-            for tx in b['TXs']:
-                c2.code(tx, language=None)
+            # 전체 TX 본문은 요청할 때만 로드
+            if c1.toggle("Load TX details", key=f"txs_{b['Height']}_{b['TXs'][0]}"):
+                txs = block_cache.transactions(b['Block'])
+                c2.dataframe(pd.DataFrame([{
+                    "Hash": w3.to_hex(tx['hash']),
+                    "From": tx['from'],
+                    "To": tx['to'],
+                    "Value (ETH)": float(w3.from_wei(tx['value'], 'ether')),
+                    "Gas Price (Gwei)": tx.get('gasPrice', 0) / 1e9,
+                } for tx in txs]), use_container_width=True)
+            else:
+                c2.markdown("**Transactions:**")
+                for tx in b['TXs']:
+                    c2.code(tx, language=None)
         else:
             c2.info("No transactions in this block")
 
 
 
+# --------------------------------------------------------------------------
+# 1-C. Block Range Scanner (과거 구간 조사)
+# --------------------------------------------------------------------------
+st.markdown("##### 🗂️ 블록 범위 스캔 (Range Scanner)")
+sc1, sc2, sc3 = st.columns([2, 2, 1])
+scanner = get_range_scanner()
+# 포크 노드에서 배포 이전 블록은 원격 RPC에서 가져와야 하고 디코딩할 TX도 없음
+scan_start = sc1.number_input("From block", min_value=0, value=max(scanner.first_block(), latest_block_num - 1000), step=100)
+scan_end = sc2.number_input("To block", min_value=0, value=latest_block_num, step=100)
+sc3.write("")
+if sc3.button("🔎 Scan", use_container_width=True):
+    scan_bar = st.progress(0.0, text="Scanning...")
+    started = time.perf_counter()
+    try:
+        rows = scanner.scan(
+            int(scan_start), int(scan_end),
+            progress=lambda done, total: scan_bar.progress(done / total, text=f"Scanning... {done:,}/{total:,} blocks"),
+        )
+    except ValueError as e:
+        rows = None
+        st.error(str(e))
+    scan_bar.empty()
+    if rows is not None:
+        st.session_state["range_scan"] = {
+            "range": (int(scan_start), min(int(scan_end), latest_block_num)),
+            "elapsed": time.perf_counter() - started,
+            "df": pd.DataFrame(rows),
+        }
+        st.session_state["range_scan_page"] = 1
+
+scan = st.session_state.get("range_scan")
+if scan:
+    df = scan["df"]
+    (s, e), elapsed = scan["range"], scan["elapsed"]
+    st.caption(f"Blocks #{s:,} – #{e:,} · {len(df):,} TXs · {elapsed:.2f}s")
+    if df.empty:
+        st.info("No transactions in this range")
+    else:
+        f1, f2, f3 = st.columns(3)
+        sel_contract = f1.multiselect("Contract", sorted(df["Contract"].unique()))
+        sel_function = f2.multiselect("Function", sorted(df["Function"].unique()))
+        sel_status = f3.multiselect("Status", sorted(df["Status"].unique()))
+        view = df
+        if sel_contract:
+            view = view[view["Contract"].isin(sel_contract)]
+        if sel_function:
+            view = view[view["Function"].isin(sel_function)]
+        if sel_status:
+            view = view[view["Status"].isin(sel_status)]
+
+        # 현재 페이지 행만 그리드로 보냄 (st.dataframe은 보이는 행만 렌더링)
+        p1, p2, _ = st.columns([1, 1, 4])
+        page_size = p1.selectbox("Rows / page", [100, 500, 2000], index=1)
+        pages = max(1, -(-len(view) // page_size))
+        st.session_state["range_scan_page"] = min(st.session_state.get("range_scan_page", 1), pages)
+        page = p2.number_input(f"Page (1–{pages})", min_value=1, max_value=pages, key="range_scan_page")
+        page_df = view.iloc[(page - 1) * page_size: page * page_size].copy()
+        page_df["Timestamp"] = pd.to_datetime(page_df["Timestamp"], unit="s")
+        st.dataframe(page_df, use_container_width=True, hide_index=True, height=420)
+        st.download_button("⬇️ Download CSV", view.to_csv(index=False), file_name=f"txs_{s}_{e}.csv", mime="text/csv")
+
+
 # --------------------------------------------------------------------------
 # 2. Transaction Inspector
 # --------------------------------------------------------------------------
@@ -195,68 +271,83 @@ with col_tx:
 with col_addr:
     st.subheader("👤 주소 및 보유량 순위 (Address & Top Holders)")
     
-    # Simple Indexing: Scan Transfer events from Block 0
-    # Warning: This is slow for long chains, but fine for testnets/research.
-    def get_holders():
-        # RPC Error Fix: Alchemy Fork doesn't support get_logs well for local contracts.
-        # Instead of scraping logs, we scan known participants in this research environment.
-        
-        known_addresses = {
-            "Vault": contracts["ADDRS"]["Vault"],
-            "DEX": contracts["ADDRS"]["DEX"],
-            "Hacker": "0xdf57089febbacf7ba0bc227dafbffa9fc08a93fdc68e1e42411a14efcf23656e", # from app.py
-            "Watchtower (Owner)": "0x59c6995e998f97a5a0044966f0945389dc9e86dae88c7a8412f4603b6b78690d", # from app.py
+    # Transfer 이벤트 인덱서: 마지막 인덱싱 블록 이후 로그만 가져와 잔고 테이블을 갱신
+    def get_aliases():
+        accs = get_accounts()
+        aliases = {
+            contracts["ADDRS"]["Vault"]: "Vault",
+            contracts["ADDRS"]["DEX"]: "DEX",
+            accs["hacker"].address: "Hacker",
+            accs["watchtower"].address: "Watchtower",
         }
-        
-        # Add some default Hardhat accounts that might hold tokens (e.g. Deployer)
-        # Note: In Hardhat, Account #0 is usually the deployer.
-        # Check Account #0 to #2
         try:
-             # Account #0 (Deployer)
-             deployer_addr = w3.eth.accounts[0]
-             known_addresses["Deployer"] = deployer_addr
+            aliases[w3.eth.accounts[0]] = "Deployer"
         except:
-             pass
+            pass
+        return aliases
 
-        holder_list = []
-        
-        for name, addr in known_addresses.items():
-            try:
-                bal = contracts["FDS"].functions.balanceOf(addr).call()
-                if bal > 0:
-                    holder_list.append({
-                        "Address": addr,
-                        "Alias": name, # New column for readability
-                        "Balance": bal / 1e18
-                    })
-            except Exception as e:
-                pass # Ignore invalid addresses
-                
-        return sorted(holder_list, key=lambda x: x["Balance"], reverse=True)
+    def get_holders(token, limit=10):
+        indexer = get_indexer()
+        indexer.sync()
+        aliases = get_aliases()
+        return [
+            {"Address": addr, "Alias": aliases.get(addr, ""), "Balance": bal / 1e18}
+            for addr, bal in indexer.top_holders(token, limit)
+        ]
 
-    holders = get_holders()
-    top_holders = pd.DataFrame(holders)
-    
     tab_rank, tab_check = st.tabs(["🏆 Top Holders", "🔎 Check Balance"])
     
     with tab_rank:
-        st.dataframe(top_holders.head(10), use_container_width=True)
+        rank_token = st.radio("Token", ["FDS", "USDT"], horizontal=True)
+        try:
+            top_holders = pd.DataFrame(get_holders(rank_token))
+            st.dataframe(top_holders, use_container_width=True)
+            st.caption(f"Indexed up to block #{get_indexer().last_block} · {get_indexer().holder_count(rank_token):,} holders")
+        except Exception as e:
+            st.error(f"Indexer Error: {e}")
         
     with tab_check:
-        addr_input = st.text_input("Enter Address", placeholder="0x...")
-        if addr_input:
-            try:
-                bal_fds = contracts["FDS"].functions.balanceOf(addr_input).call()
-                bal_usdt = contracts["USDT"].functions.balanceOf(addr_input).call()
-                bal_eth = w3.eth.get_balance(addr_input)
-                
-                st.write(f"**FDS:** {w3.from_wei(bal_fds, 'ether'):,.2f}")
-                st.write(f"**USDT:** {w3.from_wei(bal_usdt, 'ether'):,.2f}")
-                st.write(f"**ETH:** {w3.from_wei(bal_eth, 'ether'):,.4f}")
-            except:
-                st.error("Invalid Address")
+        check_mode = st.radio("Mode", ["Single", "Bulk"], horizontal=True, key="check_mode")
+        # 잔고 3종 + 블랙리스트를 한 번의 multicall (또는 batch)로 조회
+        if check_mode == "Single":
+            addr_input = st.text_input("Enter Address", placeholder="0x...")
+            if addr_input:
+                try:
+                    _, (row,) = scan_portfolio(w3, contracts, [w3.to_checksum_address(addr_input.strip())])
+                    st.write(f"**FDS:** {row['FDS']:,.2f}")
+                    st.write(f"**USDT:** {row['USDT']:,.2f}")
+                    st.write(f"**ETH:** {row['ETH']:,.4f}")
+                    if row["Blacklisted"]:
+                        st.error("⛔ Blacklisted")
+                except:
+                    st.error("Invalid Address")
+        else:
+            uploaded = st.file_uploader("Address list (CSV / TXT)", type=["csv", "txt"])
+            pasted = st.text_area("or paste addresses", placeholder="0x...\n0x...", height=100)
+            at_block = st.text_input("Block number (optional)", placeholder="latest")
+            addresses = parse_addresses((uploaded.getvalue().decode(errors="ignore") if uploaded else "") + "\n" + pasted)
+            if st.button(f"Scan {len(addresses):,} addresses", disabled=not addresses):
+                try:
+                    bulk_bar = st.progress(0.0)
+                    block_number, rows = scan_portfolio(
+                        w3, contracts, addresses, int(at_block) if at_block.strip() else None,
+                        progress=lambda done, total: bulk_bar.progress(done / total, text=f"{done:,}/{total:,} addresses"),
+                    )
+                    bulk_bar.empty()
+                    st.session_state["portfolio_scan"] = (block_number, pd.DataFrame(rows))
+                except Exception as e:
+                    st.error(f"Scan failed: {e}")
+
+            if "portfolio_scan" in st.session_state:
+                block_number, portfolio = st.session_state["portfolio_scan"]
+                st.caption(f"{len(portfolio):,} addresses at block #{block_number} · "
+                           f"{int(portfolio['Blacklisted'].fillna(False).sum())} blacklisted")
+                st.dataframe(portfolio, use_container_width=True, hide_index=True)
+                st.download_button("⬇️ Download CSV", portfolio.to_csv(index=False),
+                                   file_name=f"portfolio_{block_number}.csv", mime="text/csv")
 
-# Handle Auto-refresh loop at the very end to ensure full page render
+# Handle Auto-refresh at the very end to ensure full page render
+# (새 블록이 실제로 도착했을 때만 다시 그림)
 if is_live:
-    time.sleep(2) # 2 seconds pull interval
+    wait_for_next_block(latest_block_num, status=col_status.empty())
     st.rerun()
@@ -1,24 +1,122 @@
+import os
 import streamlit as st
 import pandas as pd
 import altair as alt
+import pyarrow.dataset as ds
+from lib.utils import get_result_store
+from lib.sweep import list_sweeps, load_sweep, sweep_axes, METRICS
+from lib.aggregate import histogram, density_grid, stratified_sample, bin_edges
+from lib.gas import load_bids, BIDS_PATH
 
 st.set_page_config(page_title="Research Metrics", page_icon="📈", layout="wide")
 st.title("📈 Research Data Analysis")
 
-if "exp_results" not in st.session_state or not st.session_state.exp_results:
+MAX_CHART_POINTS = 5000  # Altair 기본 행 제한 (초과 시 원본 대신 집계/표본을 그림)
+BID_BINS = 12
+
+store = get_result_store()
+runs = store.list_runs()
+sweeps = list_sweeps()
+
+view = st.sidebar.radio("View", ["Experiment Runs", "Sweep Surface"], disabled=not sweeps)
+
+# --------------------------------------------------------------------------
+# Sweep Surface: 파라미터 격자 결과 (run_experiments.py sweep)
+# --------------------------------------------------------------------------
+if view == "Sweep Surface":
+    labels = {s["sweep_id"]: f"{s['sweep_id']} · {s.get('base', {}).get('exp_type', '')} · {s.get('method', 'grid')}" for s in sweeps}
+    sweep_id = st.sidebar.selectbox("Sweep", list(labels)[::-1], format_func=labels.get)
+    cells = load_sweep(sweep_id)
+    axes = sweep_axes(cells)
+
+    st.subheader("🗺️ Detection / Success Surface")
+    st.caption(f"{len(cells)} cells · {int(cells['cached'].sum())} reused from cache · {int(cells['count'].sum()):,} trials")
+    if len(axes) < 2:
+        st.info("Surface needs at least two swept parameters.")
+        st.dataframe(cells, use_container_width=True)
+        st.stop()
+
+    s1, s2, s3 = st.columns(3)
+    x = s1.selectbox("X axis", axes, index=0)
+    y = s2.selectbox("Y axis", [a for a in axes if a != x], index=0)
+    metric = s3.selectbox("Metric", METRICS, index=1)
+
+    def encode(col, channel):
+        # 격자면 값 그대로, Latin hypercube(연속 값)면 구간으로 묶음
+        if cells[col].dtype == object:
+            return channel(col, type="nominal")
+        if cells[col].nunique() <= 12:
+            return channel(col, type="ordinal")
+        return channel(col, bin=alt.Bin(maxbins=12), type="quantitative")
+
+    surface = alt.Chart(cells).mark_rect().encode(
+        x=encode(x, alt.X),
+        y=encode(y, alt.Y),
+        color=alt.Color(f"mean({metric})", scale=alt.Scale(scheme="viridis")),
+        tooltip=[f"mean({metric})", "count()"],
+    )
+    st.altair_chart(surface, use_container_width=True)
+    st.dataframe(cells, use_container_width=True)
+    st.stop()
+
+if not runs and not len(st.session_state.get("exp_results", [])):
     st.info("No experiment data found. Please run simulations in the 'Experiment Runner' page first.")
-    
+
     # 셈플 데이터 생성 버튼 (테스트용)
     if st.button("Generate Sample Data"):
         data = [
-            {"Iteration": i, "GasPrice_Gwei": 20 + (i%5), "Latency_Sec": 0.1 * i, "Success": i%2==0, "BlockDiff": -1 if i%2==0 else 0} 
+            {"Iteration": i, "GasPrice_Gwei": 20 + (i%5), "Latency_Sec": 0.1 * i, "Success": i%2==0, "BlockDiff": -1 if i%2==0 else 0}
             for i in range(10)
         ]
         st.session_state.exp_results = data
         st.rerun()
     st.stop()
 
-df = pd.DataFrame(st.session_state.exp_results)
+# --------------------------------------------------------------------------
+# 0. Dataset Selection (저장된 실행 + 필터)
+# --------------------------------------------------------------------------
+@st.cache_data(max_entries=8)
+def load_runs(run_ids, types, outcome, version):
+    # version: 저장소에 파트 파일이 추가되면 바뀌어 캐시를 무효화
+    expr = ds.field("Type").isin(list(types)) if types else None
+    if outcome != "All":
+        cond = ds.field("Success") == (outcome == "Success")
+        expr = cond if expr is None else expr & cond
+    return get_result_store().load(run_ids=list(run_ids), filter=expr)
+
+@st.cache_data(max_entries=4)
+def export_csv(run_ids, types, outcome, version):
+    # 같은 선택이면 rerun마다 전체 행을 다시 직렬화하지 않음
+    return load_runs(run_ids, types, outcome, version).to_csv(index=False).encode('utf-8')
+
+with st.sidebar:
+    st.header("🗂️ Dataset")
+    if runs:
+        labels = {
+            m["run_id"]: f"{m['run_id']} · {m['config']['exp_type']} · {m['summary'].count} rows"
+            for m in runs
+        }
+        default = st.session_state.get("exp_run_id")
+        selected = st.multiselect(
+            "Runs", list(labels), default=[default if default in labels else runs[-1]["run_id"]],
+            format_func=labels.get,
+        )
+        types = st.multiselect("Attack Type", sorted({m["config"]["exp_type"] for m in runs}))
+        outcome = st.radio("Outcome", ["All", "Success", "Failure"], horizontal=True)
+    else:
+        selected = []
+
+if selected:
+    df = load_runs(tuple(selected), tuple(types), outcome, store.version())
+    if df is None or df.empty:
+        st.warning("선택한 조건에 맞는 결과가 없습니다.")
+        st.stop()
+else:
+    # 저장소가 비어 있으면 현재 세션 결과 사용 (샘플 데이터 포함)
+    df = pd.DataFrame(st.session_state.get("exp_results", []))
+    if df.empty:
+        st.info("Select at least one run in the sidebar.")
+        st.stop()
 
 # --------------------------------------------------------------------------
 # 1. High Level Summary
@@ -32,45 +130,170 @@ col1.metric("Total Experiments", total)
 col2.metric("Successful Prevented", success, f"{(success/total)*100:.1f}%")
 col3.metric("Failed (Too Late)", fail, delta_color="inverse")
 
+# 실행별 비교: summary.json의 증분 집계만 사용 (Parquet를 다시 읽지 않음)
+if len(selected) > 1:
+    st.subheader("Run Comparison")
+    by_id = {m["run_id"]: m for m in runs}
+    st.dataframe(pd.DataFrame([
+        {
+            "Run": run_id,
+            "Type": by_id[run_id]["config"]["exp_type"],
+            "Threshold": by_id[run_id]["config"]["fds_threshold"],
+            "Rows": by_id[run_id]["summary"].count,
+            "Trigger Rate (%)": by_id[run_id]["summary"].trigger_rate * 100,
+            "Success Rate (%)": by_id[run_id]["summary"].success_rate * 100,
+            "Mean Defense Gas": by_id[run_id]["summary"].mean_gas,
+        }
+        for run_id in selected
+    ]), use_container_width=True)
+
 # --------------------------------------------------------------------------
 # 2. Detailed Charts
 # --------------------------------------------------------------------------
 st.divider()
 
+# 차트에는 원본 행 대신 서버에서 집계한 결과만 전달 (행 수와 무관하게 수천 행 이하)
+def build_aggregates(data, scatter_mode):
+    if scatter_mode == "Density":
+        scatter = density_grid(data, "GasPrice_Gwei", "BlockDiff", rate="Success")
+    else:
+        scatter = stratified_sample(data[["Iteration", "GasPrice_Gwei", "BlockDiff", "Latency_Sec", "Success"]], "Success")
+    return {"hist": histogram(data, "Latency_Sec", by="Success"), "scatter": scatter}
+
+@st.cache_data(max_entries=16)
+def cached_aggregates(dataset_key, scatter_mode, _data):
+    # dataset_key에 저장소 version이 들어 있어 새 파트 파일이 추가되면 다시 집계
+    return build_aggregates(_data, scatter_mode)
+
+scatter_mode = st.radio(
+    "Scatter", ["Density", "Sample"], horizontal=True, index=0 if total > MAX_CHART_POINTS else 1,
+    help="Density: 구간별 개수/성공률 격자 · Sample: Success 기준 층화 표본",
+)
+if selected:
+    aggregates = cached_aggregates((tuple(selected), tuple(types), outcome, store.version()), scatter_mode, df)
+else:
+    aggregates = build_aggregates(df, scatter_mode)
+
 c1, c2 = st.columns(2)
 
 with c1:
     st.subheader("Gas Price vs Block Difference")
     # 차트: 가스비가 높을수록 Block Diff가 낮아지는가? (음수 = 선제 방어)
-    chart1 = alt.Chart(df).mark_circle(size=60).encode(
-        x='GasPrice_Gwei',
-        y='BlockDiff',
-        color='Success',
-        tooltip=['Iteration', 'GasPrice_Gwei', 'BlockDiff', 'Latency_Sec']
-    ).interactive()
+    scatter = aggregates["scatter"]
+    if scatter_mode == "Density":
+        chart1 = alt.Chart(scatter).mark_rect().encode(
+            x=alt.X('x_start', title='GasPrice_Gwei'),
+            x2='x_end',
+            y=alt.Y('y_start', title='BlockDiff'),
+            y2='y_end',
+            color=alt.Color('count', scale=alt.Scale(type='log', scheme='viridis')),
+            tooltip=['x_start', 'x_end', 'y_start', 'y_end', 'count', alt.Tooltip('Success', title='Success rate', format='.1%')]
+        )
+    else:
+        chart1 = alt.Chart(scatter).mark_circle(size=60).encode(
+            x='GasPrice_Gwei',
+            y='BlockDiff',
+            color='Success',
+            tooltip=['Iteration', 'GasPrice_Gwei', 'BlockDiff', 'Latency_Sec']
+        ).interactive()
+        if len(scatter) < total:
+            st.caption(f"Stratified sample of {len(scatter):,} / {total:,} rows.")
     st.altair_chart(chart1, use_container_width=True)
 
 with c2:
     st.subheader("Latency Impact Distribution")
-    # 차트: 지연시간에 따른 성공 여부
-    chart2 = alt.Chart(df).mark_bar().encode(
-        x=alt.X('Latency_Sec', bin=True),
-        y='count()',
+    # 차트: 지연시간에 따른 성공 여부 (구간 집계 결과만 전달)
+    chart2 = alt.Chart(aggregates["hist"]).mark_bar().encode(
+        x=alt.X('bin_start', title='Latency_Sec (binned)'),
+        x2='bin_end',
+        y=alt.Y('count', stack=True),
         color='Success'
     )
     st.altair_chart(chart2, use_container_width=True)
 
+# --------------------------------------------------------------------------
+# 2-B. Gas Bidding: 방어 TX 비용 vs 승률 (data/bids.jsonl)
+# --------------------------------------------------------------------------
+@st.cache_data(max_entries=4)
+def load_bid_frame(mtime):
+    # mtime: 기록이 추가되면 바뀌어 캐시를 무효화
+    bids = pd.DataFrame(load_bids())
+    if bids.empty:
+        return bids
+    # 공격 TX 대비 입찰 배율 (공격 정보가 없는 발사는 제외)
+    bids["premium"] = bids["bid_price_gwei"] / bids["attack_price_gwei"].where(bids["attack_price_gwei"] > 0)
+    return bids
+
+bids = load_bid_frame(os.path.getmtime(BIDS_PATH) if os.path.exists(BIDS_PATH) else None)
+if not bids.empty:
+    st.divider()
+    st.subheader("⛽ Gas Bidding: Cost vs Win Rate")
+    sources = st.multiselect("Source", sorted(bids["source"].unique()), key="bid_sources")
+    if sources:
+        bids = bids[bids["source"].isin(sources)]
+    b1, b2, b3, b4 = st.columns(4)
+    b1.metric("Defense Bids", len(bids))
+    b2.metric("Win Rate", f"{bids['won'].mean() * 100:.1f}%")
+    b3.metric("Mean Cost (ETH)", f"{bids['cost_eth'].mean():.6f}")
+    b4.metric("Capped by Budget", int(bids["capped"].sum()))
+
+    priced = bids.dropna(subset=["premium"])
+    if not priced.empty:
+        # 입찰 배율 구간별 건수 / 승률 / 평균 비용
+        edges = bin_edges(priced["premium"].to_numpy(dtype=float), BID_BINS)
+        priced = priced.assign(bin=pd.cut(priced["premium"], edges, include_lowest=True))
+        grouped = priced.groupby("bin", observed=True).agg(
+            count=("won", "size"), win_rate=("won", "mean"), cost_eth=("cost_eth", "mean"), bumps=("bumps", "mean"),
+        ).reset_index()
+        grouped["premium_start"] = grouped["bin"].map(lambda b: b.left).astype(float)
+        grouped["premium_end"] = grouped["bin"].map(lambda b: b.right).astype(float)
+        grouped = grouped.drop(columns="bin")
+
+        g1, g2 = st.columns(2)
+        with g1:
+            st.caption("Win rate by bid premium (bid price / attack price)")
+            st.altair_chart(alt.Chart(grouped).mark_rect().encode(
+                x=alt.X('premium_start', title='Bid premium (x attack)'),
+                x2='premium_end',
+                y=alt.Y('win_rate', title='Win rate', axis=alt.Axis(format='%')),
+                color=alt.Color('count', scale=alt.Scale(scheme='viridis')),
+                tooltip=['premium_start', 'premium_end', 'count', alt.Tooltip('win_rate', format='.1%'),
+                         alt.Tooltip('cost_eth', format='.6f'), alt.Tooltip('bumps', format='.2f')]
+            ), use_container_width=True)
+        with g2:
+            st.caption("Mean defense cost vs win rate (one point per premium bin)")
+            st.altair_chart(alt.Chart(grouped).mark_circle().encode(
+                x=alt.X('cost_eth', title='Mean cost (ETH)'),
+                y=alt.Y('win_rate', title='Win rate', axis=alt.Axis(format='%')),
+                size='count',
+                tooltip=['premium_start', 'premium_end', 'count', alt.Tooltip('win_rate', format='.1%'),
+                         alt.Tooltip('cost_eth', format='.6f')]
+            ), use_container_width=True)
+
 # --------------------------------------------------------------------------
 # 3. Raw Data Export
 # --------------------------------------------------------------------------
 st.subheader("💾 Export Data")
-csv = df.to_csv(index=False).encode('utf-8')
-st.download_button(
-    "Download CSV for Paper",
-    csv,
-    "experiment_results.csv",
-    "text/csv",
-    key='download-csv'
-)
+if selected:
+    # 큰 데이터셋은 요청했을 때만 CSV를 만듦 (이후 같은 선택이면 캐시 사용)
+    export_key = (tuple(selected), tuple(types), outcome, store.version())
+    if total <= MAX_CHART_POINTS or st.session_state.get("csv_export_key") == export_key \
+            or st.button(f"Prepare CSV ({total:,} rows)"):
+        st.session_state["csv_export_key"] = export_key
+        csv = export_csv(*export_key)
+    else:
+        csv = None
+else:
+    csv = df.to_csv(index=False).encode('utf-8')
+if csv is not None:
+    st.download_button(
+        "Download CSV for Paper",
+        csv,
+        "experiment_results.csv",
+        "text/csv",
+        key='download-csv'
+    )
 
-st.dataframe(df)
+if total > MAX_CHART_POINTS:
+    st.caption(f"Showing the first {MAX_CHART_POINTS:,} / {total:,} rows (full data in the CSV).")
+st.dataframe(df.head(MAX_CHART_POINTS))
@@ -0,0 +1,63 @@
+import time
+import streamlit as st
+import pandas as pd
+import altair as alt
+from lib.latency import RECORDER, PHASES
+
+st.set_page_config(page_title="Latency", page_icon="⏱️", layout="wide")
+st.title("⏱️ RPC & Defense Latency")
+
+# RECORDER는 프로세스 전역이므로 대시보드/실험 러너에서 발생한 호출이 모두 모인다
+report = RECORDER.report()
+
+c1, c2 = st.columns([4, 1])
+c1.caption(f"Since {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(RECORDER.started_at))} · "
+           "HDR 히스토그램 (상대 오차 ~1.6%)")
+if c2.button("🔄 Reset", use_container_width=True):
+    RECORDER.reset()
+    st.rerun()
+
+def to_frame(table, name):
+    df = pd.DataFrame.from_dict(table, orient="index")
+    df.index.name = name
+    return df.reset_index()
+
+def tail_chart(df, name):
+    # p50/p95/p99를 나란히 그려 꼬리 지연을 비교
+    long = df.melt(id_vars=[name], value_vars=["p50_ms", "p95_ms", "p99_ms"], var_name="Percentile", value_name="ms")
+    return alt.Chart(long).mark_bar().encode(
+        x=alt.X("ms:Q", title="Latency (ms)"),
+        y=alt.Y(f"{name}:N", sort="-x", title=None),
+        color="Percentile:N",
+        yOffset="Percentile:N",
+        tooltip=[name, "Percentile", alt.Tooltip("ms:Q", format=".2f")],
+    )
+
+# --------------------------------------------------------------------------
+# 1. Defense Pipeline (detect -> sign -> broadcast -> include)
+# --------------------------------------------------------------------------
+st.subheader("🛡️ Defense Pipeline Phases")
+if report["phases"]:
+    phases = to_frame(report["phases"], "Phase")
+    order = {p: i for i, p in enumerate(PHASES)}
+    phases = phases.sort_values("Phase", key=lambda s: s.map(lambda p: order.get(p, len(order))))
+    cols = st.columns(len(phases))
+    for col, (_, r) in zip(cols, phases.iterrows()):
+        col.metric(r["Phase"], f"{r['p50_ms']:.1f} ms", f"p99 {r['p99_ms']:.1f} ms", delta_color="off")
+    st.altair_chart(tail_chart(phases, "Phase"), use_container_width=True)
+    st.dataframe(phases, use_container_width=True, hide_index=True)
+else:
+    st.info("아직 기록된 방어 단계가 없습니다. Experiment Runner나 Auto-Defense를 실행하세요.")
+st.caption("실험 결과 행에도 Detect_ms / Sign_ms / Broadcast_ms / Include_ms 컬럼으로 단계별 시간이 저장됩니다.")
+
+# --------------------------------------------------------------------------
+# 2. RPC Methods
+# --------------------------------------------------------------------------
+st.divider()
+st.subheader("📡 RPC Methods")
+if report["methods"]:
+    methods = to_frame(report["methods"], "Method").sort_values("p99_ms", ascending=False)
+    st.altair_chart(tail_chart(methods.head(20), "Method"), use_container_width=True)
+    st.dataframe(methods, use_container_width=True, hide_index=True)
+else:
+    st.info("기록된 RPC 호출이 없습니다.")
@@ -0,0 +1,316 @@
+"""
+Headless 실험 실행기 (Streamlit 없이 장시간 스윕 실행용)
+
+사용 예:
+    python watchtower/run_experiments.py run --config watchtower/experiment.example.json
+    python watchtower/run_experiments.py run --config my.json --iterations 5000 --nodes 4 --jsonl results.jsonl
+    python watchtower/run_experiments.py run --config my.json --iterations 1000000 --fast
+    python watchtower/run_experiments.py calibrate --config my.json --samples 50
+    python watchtower/run_experiments.py sweep --spec watchtower/sweep.example.json
+    python watchtower/run_experiments.py bench --trials 20 --compare latest
+    python watchtower/run_experiments.py load --concurrency 1 4 8 16 --rate 8 --mix exploitMint=2 simulateDump=1
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from web3 import Web3
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from lib.utils import RPC_URL, WATCHTOWER_DIR, read_abis, build_contracts, get_accounts
+from lib.experiment import ExperimentConfig, ExperimentEngine, JsonlResultSink
+from lib.nodepool import NodePool
+from lib.results import ResultStore, RESULTS_DIR
+from lib.fastsim import FastSimulator, ChainState, CalibrationError, calibrate
+from lib.sweep import SweepEngine, cells_from_spec, save_sweep
+from lib.latency import instrument
+from lib.bench import BenchConfig, DefenseRace, ATTACKS, DEFENSES, MINING_MODES, BENCH_DIR, \
+    summarize, environment, save_bench, latest_bench, compare
+from lib.load import LoadConfig, LoadScenario, KEY_SOURCES, LOAD_DIR, save_load
+from lib.load import summarize as summarize_load
+
+# --------------------------------------------------------------------------
+# 설정 로드
+# --------------------------------------------------------------------------
+def load_config(path):
+    """
+    JSON 설정 파일 -> (ExperimentConfig, 실행 옵션)
+    실행 옵션 키: iterations, nodes, rpc_url, addresses (나머지는 ExperimentConfig 필드)
+    """
+    with open(path) as f:
+        data = json.load(f)
+    options = {key: data.pop(key) for key in ("iterations", "nodes", "rpc_url", "addresses") if key in data}
+    return ExperimentConfig.from_dict(data), options
+
+def load_main_contracts(rpc_url, addresses_path):
+    w3 = instrument(Web3(Web3.HTTPProvider(rpc_url)))
+    with open(addresses_path) as f:
+        addrs = json.load(f)
+    return build_contracts(w3, addrs, read_abis())
+
+# --------------------------------------------------------------------------
+# run: 시나리오 반복 실행 후 결과를 저장소(Parquet)로 스트리밍
+# --------------------------------------------------------------------------
+def cmd_run(args):
+    cfg, options = load_config(args.config)
+    iterations = args.iterations or options.get("iterations", 10)
+    nodes = args.nodes or options.get("nodes", 1)
+    rpc_url = args.rpc or options.get("rpc_url", RPC_URL)
+    addresses_path = options.get("addresses", os.path.join(WATCHTOWER_DIR, "addresses.json"))
+    writer = ResultStore(args.store).create_run(cfg)
+    jsonl = JsonlResultSink(args.jsonl, cfg, run_id=writer.run_id) if args.jsonl else None
+    summary = writer.summary
+    started = time.time()
+
+    def report(row):
+        writer.write(row)
+        if jsonl:
+            jsonl.write(row)
+        if not args.quiet:
+            print(f"[{summary.count}/{iterations}] #{row['Iteration']} {row['Status']}", flush=True)
+
+    print(f"run_id={writer.run_id} type={cfg.exp_type} iterations={iterations} nodes={nodes} -> {writer.path}")
+    try:
+        if args.fast:
+            # 오프체인 모델: 노드에서는 기준 상태만 한 번 읽음
+            contracts = load_main_contracts(rpc_url, addresses_path)
+            sim = FastSimulator(ChainState.read(contracts, get_accounts()), mining=args.mining)
+            writer.meta["mode"] = f"fast/{args.mining}"
+            writer.write_columns(sim.simulate(cfg, iterations))
+        elif nodes > 1:
+            with NodePool(nodes) as pool:
+                pool.run(cfg, iterations, on_result=report)
+        else:
+            contracts = load_main_contracts(rpc_url, addresses_path)
+            engine = ExperimentEngine(contracts, get_accounts(), cfg)
+            for row in engine.run(iterations):
+                report(row)
+    finally:
+        writer.close()
+        if jsonl:
+            jsonl.close()
+
+    elapsed = time.time() - started
+    print(
+        f"done: {summary.count} rows in {elapsed:.1f}s ({summary.count / max(elapsed, 1e-9):.2f} it/s) | "
+        f"trigger {summary.triggered}/{summary.count} | success {summary.success}/{summary.triggered} | "
+        f"mean gas {summary.mean_gas:,.0f}"
+    )
+
+# --------------------------------------------------------------------------
+# calibrate: Fast Mode 모델을 실제 노드 실행 결과와 비교
+# --------------------------------------------------------------------------
+def cmd_calibrate(args):
+    cfg, options = load_config(args.config)
+    rpc_url = args.rpc or options.get("rpc_url", RPC_URL)
+    addresses_path = options.get("addresses", os.path.join(WATCHTOWER_DIR, "addresses.json"))
+    iterations = args.iterations or options.get("iterations", args.samples)
+    contracts = load_main_contracts(rpc_url, addresses_path)
+
+    def log(idx, diffs):
+        if not args.quiet:
+            print(f"#{idx} {'OK' if not diffs else diffs}", flush=True)
+
+    try:
+        report = calibrate(contracts, get_accounts(), cfg, samples=args.samples, iterations=iterations, strict=False, log=log)
+    except CalibrationError as e:
+        sys.exit(str(e))
+    gas_off = [(e, a) for e, a in report["gas"] if e != a]
+    print(
+        f"calibration: {report['matched']}/{report['samples']} trials match "
+        f"({report['elapsed']:.1f}s on-chain) | defense gas mismatches {len(gas_off)}"
+    )
+    if report["mismatches"]:
+        sys.exit(1)
+
+# --------------------------------------------------------------------------
+# sweep: 파라미터 격자 / Latin hypercube 탐색 (셀 단위 캐시)
+# --------------------------------------------------------------------------
+def cmd_sweep(args):
+    with open(args.spec) as f:
+        spec = json.load(f)
+    backend = args.backend or spec.get("backend", "fast")
+    iterations = args.iterations or spec.get("iterations", 1000)
+    nodes = args.nodes or spec.get("nodes", 1)
+    rpc_url = args.rpc or spec.get("rpc_url", RPC_URL)
+    addresses_path = spec.get("addresses", os.path.join(WATCHTOWER_DIR, "addresses.json"))
+    cells = cells_from_spec(spec)
+    print(f"sweep: {len(cells)} cells x {iterations} iterations (backend={backend}, nodes={nodes})")
+
+    def on_cell(done, total, row):
+        if not args.quiet:
+            tag = "cached" if row["cached"] else "run"
+            print(f"[{done}/{total}] {tag} trigger {row['trigger_rate']*100:.1f}% success {row['success_rate']*100:.1f}%", flush=True)
+
+    started = time.time()
+    if backend == "chain" and nodes > 1:
+        with NodePool(nodes) as pool:
+            # 풀 노드는 새로 배포된 컨트랙트를 쓰므로 캐시 키도 풀 기준으로 계산
+            contracts = build_contracts(Web3(Web3.HTTPProvider(pool.urls[0])), pool.addresses[0], read_abis())
+            df = SweepEngine(contracts, get_accounts(), backend, pool=pool).run(cells, iterations, on_cell)
+    else:
+        contracts = load_main_contracts(rpc_url, addresses_path)
+        df = SweepEngine(contracts, get_accounts(), backend).run(cells, iterations, on_cell)
+
+    sweep_id = save_sweep(df, {**spec, "backend": backend, "iterations": iterations})
+    print(
+        f"done: {len(df)} cells ({int(df['cached'].sum())} cached) in {time.time() - started:.1f}s "
+        f"-> sweep_id={sweep_id}"
+    )
+
+# --------------------------------------------------------------------------
+# bench: 공격/방어 경주 벤치마크 (automine / interval, 가스비 차이별 p50/p99)
+# --------------------------------------------------------------------------
+def cmd_bench(args):
+    cfg = BenchConfig(trials=args.trials, block_time_ms=args.block_time_ms)
+    for name in ("attacks", "defenses", "mining", "gas_gaps"):
+        if getattr(args, name):
+            setattr(cfg, name, getattr(args, name))
+    contracts = load_main_contracts(args.rpc or RPC_URL, os.path.join(WATCHTOWER_DIR, "addresses.json"))
+    race = DefenseRace(contracts, get_accounts(), cfg)
+    print(f"bench: {len(cfg.cases())} cases x {cfg.trials} trials")
+
+    def on_trial(done, total, row):
+        if not args.quiet:
+            total_ms = f"{row['total_ms']:.1f}ms" if row.get("total_ms") is not None else "-"
+            print(f"[{done}/{total}] {row['attack']}/{row['defense']}/{row['mining']}/{row['gas_gap_pct']:+g}% "
+                  f"win={row['win']} total={total_ms}", flush=True)
+
+    rows = race.run(on_trial)
+    path = save_bench(rows, cfg, environment(contracts["FDS"].w3), args.out)
+    summary = summarize(rows)
+
+    print(f"{'case':<42} {'win':>6} {'same blk':>8} {'detect p50/p99':>16} {'total p50/p99':>18} {'def gas':>8}")
+    for key, s in summary.items():
+        fmt = lambda m: f"{s[m]['p50']:.1f}/{s[m]['p99']:.1f}" if s[m]["p50"] is not None else "-"
+        gas = f"{s['defense_gas_used']:.0f}" if s["defense_gas_used"] is not None else "-"
+        print(f"{key:<42} {s['win_rate']*100:>5.0f}% {s['same_block_rate']*100:>7.0f}% "
+              f"{fmt('detect_ms'):>16} {fmt('total_ms'):>18} {gas:>8}")
+    print(f"saved -> {path}")
+
+    previous = latest_bench(args.out, exclude=path) if args.compare == "latest" else args.compare
+    if previous:
+        with open(previous, encoding="utf-8") as f:
+            changes = compare(json.load(f)["summary"], summary)
+        print(f"vs {os.path.basename(previous)}:")
+        for key, delta in changes.items():
+            print(f"  {key:<42} " + "  ".join(f"{k} {v:+.2f}" for k, v in delta.items()))
+
+# --------------------------------------------------------------------------
+# load: 다중 공격자 동시 공격 (동시성 수준별 탐지/방어 처리량, 큐 대기, 성공률)
+# --------------------------------------------------------------------------
+def mix_entry(item):
+    """"exploitMint=2" -> ("exploitMint", 2.0), 가중치 생략 시 1"""
+    name, _, weight = item.partition("=")
+    if name not in ATTACKS:
+        raise argparse.ArgumentTypeError(f"unknown attack {name!r} (choose from {', '.join(ATTACKS)})")
+    return name, float(weight or 1)
+
+def cmd_load(args):
+    cfg = LoadConfig(rate=args.rate, attacks=args.attacks, mining=args.mining, block_time_ms=args.block_time_ms,
+                     keys=args.keys, seed=args.seed)
+    for name in ("concurrency", "defenses"):
+        if getattr(args, name):
+            setattr(cfg, name, getattr(args, name))
+    if args.mix:
+        cfg.mix = dict(args.mix)
+    contracts = load_main_contracts(args.rpc or RPC_URL, os.path.join(WATCHTOWER_DIR, "addresses.json"))
+    scenario = LoadScenario(contracts, cfg)
+    print(f"load: {len(cfg.cases())} levels x {cfg.attacks} attacks at {cfg.rate:g}/s "
+          f"(mix {', '.join(f'{k}={v:g}' for k, v in cfg.mix.items())}, {cfg.mining} mining)")
+
+    def on_level(done, total, level):
+        if not args.quiet:
+            print(f"[{done}/{total}] {level['defense']} c={level['concurrency']} sent={level['sent']} "
+                  f"errors={level['send_errors']}/{level['watchtower_errors']} defenses={level['defense_txs']} {level['elapsed_sec']:.1f}s", flush=True)
+
+    rows, levels = scenario.run(on_level)
+    path = save_load(rows, levels, cfg, environment(contracts["FDS"].w3), args.out)
+    summary = summarize_load(rows, levels)
+
+    print(f"{'level':<14} {'atk/s':>6} {'detect':>7} {'det/s':>6} {'cap/s':>7} {'util':>5} {'def/s':>6} "
+          f"{'queue p50/p99':>15} {'detect p50/p99':>16} {'success':>8} {'defended':>9}")
+    for key, s in summary.items():
+        fmt = lambda m: f"{s[m]['p50']:.1f}/{s[m]['p99']:.1f}" if s[m]["p50"] is not None else "-"
+        capacity = f"{s['detect_capacity']:.1f}" if s["detect_capacity"] is not None else "-"
+        print(f"{key:<14} {s['attack_rate']:>6.1f} {s['detect_rate']*100:>6.0f}% {s['detect_throughput']:>6.1f} "
+              f"{capacity:>7} {s['utilization']*100:>4.0f}% {s['defense_throughput']:>6.2f} "
+              f"{fmt('queue_ms'):>15} {fmt('detect_ms'):>16} {s['success_rate']*100:>7.0f}% {s['defended_rate']*100:>8.0f}%")
+    for key, s in summary.items():
+        if s["watchtower_errors"]:
+            print(f"{key}: {s['watchtower_errors']} watchtower batches failed, {s['watchtower_error_txs']} TXs not evaluated "
+                  f"(last: {s['watchtower_last_error']})")
+    print(f"saved -> {path}")
+
+# --------------------------------------------------------------------------
+# Entry point
+# --------------------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="FDS headless experiment runner")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="Run one experiment configuration")
+    p_run.add_argument("--config", required=True, help="JSON config file (ExperimentConfig fields + iterations/nodes/rpc_url)")
+    p_run.add_argument("--iterations", type=int, help="Override iterations from config")
+    p_run.add_argument("--nodes", type=int, help="Parallel Hardhat nodes (1 = use the main node)")
+    p_run.add_argument("--rpc", help=f"Main node RPC URL (default {RPC_URL})")
+    p_run.add_argument("--store", default=RESULTS_DIR, help=f"Result store directory (default {RESULTS_DIR})")
+    p_run.add_argument("--jsonl", help="Also stream rows to a JSON Lines file")
+    p_run.add_argument("--fast", action="store_true", help="Use the vectorized off-chain model instead of real transactions")
+    p_run.add_argument("--mining", choices=["auto", "interval"], default="auto", help="Block model for --fast")
+    p_run.add_argument("--quiet", action="store_true", help="Only print the summary")
+    p_run.set_defaults(func=cmd_run)
+
+    p_cal = sub.add_parser("calibrate", help="Replay sampled trials on the node and compare with the fast model")
+    p_cal.add_argument("--config", required=True, help="JSON config file")
+    p_cal.add_argument("--samples", type=int, default=20, help="Number of trials to replay on-chain")
+    p_cal.add_argument("--iterations", type=int, help="Sample trial indices from 1..N (default: config iterations)")
+    p_cal.add_argument("--rpc", help=f"Main node RPC URL (default {RPC_URL})")
+    p_cal.add_argument("--quiet", action="store_true", help="Only print the summary")
+    p_cal.set_defaults(func=cmd_calibrate)
+
+    p_sweep = sub.add_parser("sweep", help="Grid / Latin-hypercube parameter sweep with per-cell caching")
+    p_sweep.add_argument("--spec", required=True, help="JSON sweep spec (base config, axes, method, iterations)")
+    p_sweep.add_argument("--backend", choices=["fast", "chain"], help="Override backend from spec")
+    p_sweep.add_argument("--iterations", type=int, help="Iterations per cell")
+    p_sweep.add_argument("--nodes", type=int, help="Parallel Hardhat nodes for the chain backend")
+    p_sweep.add_argument("--rpc", help=f"Main node RPC URL (default {RPC_URL})")
+    p_sweep.add_argument("--quiet", action="store_true", help="Only print the summary")
+    p_sweep.set_defaults(func=cmd_sweep)
+
+    p_bench = sub.add_parser("bench", help="Defense-race benchmark (attack vs defense, automine / interval mining)")
+    p_bench.add_argument("--trials", type=int, default=20, help="Trials per case")
+    p_bench.add_argument("--attacks", nargs="+", choices=ATTACKS, help="Attack functions (default: all)")
+    p_bench.add_argument("--defenses", nargs="+", choices=DEFENSES, help="Defense actions (default: all)")
+    p_bench.add_argument("--mining", nargs="+", choices=MINING_MODES, help="Mining modes (default: all)")
+    p_bench.add_argument("--gas-gaps", dest="gas_gaps", nargs="+", type=float, help="Defense gas price vs attack, %% (interval mode)")
+    p_bench.add_argument("--block-time-ms", type=int, default=1000, help="Block interval for interval mining")
+    p_bench.add_argument("--rpc", help=f"Node RPC URL (default {RPC_URL})")
+    p_bench.add_argument("--out", default=BENCH_DIR, help=f"Result directory (default {BENCH_DIR})")
+    p_bench.add_argument("--compare", help="Previous result JSON to diff against, or 'latest'")
+    p_bench.add_argument("--quiet", action="store_true", help="Only print the summary")
+    p_bench.set_defaults(func=cmd_bench)
+
+    p_load = sub.add_parser("load", help="Concurrent multi-attacker load scenario (throughput / queueing vs concurrency)")
+    p_load.add_argument("--concurrency", nargs="+", type=int, help="Attacker counts to run (default: 1 2 4 8)")
+    p_load.add_argument("--mix", nargs="+", type=mix_entry, metavar="ATTACK[=WEIGHT]", help="Attack mix (default: all attacks equally)")
+    p_load.add_argument("--rate", type=float, default=4.0, help="Total attack send rate per second")
+    p_load.add_argument("--attacks", type=int, default=24, help="Attacks per concurrency level")
+    p_load.add_argument("--defenses", nargs="+", choices=DEFENSES, help="Defense actions (default: all)")
+    p_load.add_argument("--mining", choices=MINING_MODES, default="interval", help="Block production mode")
+    p_load.add_argument("--block-time-ms", type=int, default=1000, help="Block interval for interval mining")
+    p_load.add_argument("--keys", choices=KEY_SOURCES, default="hardhat",
+                        help="Attacker accounts: local Hardhat accounts #6-#19 (then new keys) or always new funded keys")
+    p_load.add_argument("--seed", type=int, default=0, help="Seed for the attack mix")
+    p_load.add_argument("--rpc", help=f"Node RPC URL (default {RPC_URL})")
+    p_load.add_argument("--out", default=LOAD_DIR, help=f"Result directory (default {LOAD_DIR})")
+    p_load.add_argument("--quiet", action="store_true", help="Only print the summary")
+    p_load.set_defaults(func=cmd_load)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from lib.amm import DumpImpactModel
+
+E18 = 10 ** 18
+
+# 오라클 $1, 준비금 1:1 -> 괴리 0%
+POOL = DumpImpactModel(reserve_fds=500_000 * E18, reserve_usdt=500_000 * E18, oracle_price=E18)
+
+@pytest.mark.parametrize("threshold", [0.5, 5.0, 20.0, 60.0])
+def test_dump_to_breach_hits_threshold(threshold):
+    x = POOL.dump_to_breach(threshold)
+    assert 0 < x < float("inf")
+    # 닫힌 형태의 해가 시뮬레이션한 괴리율과 정확히 맞고, 그보다 조금 적으면 미달
+    assert POOL.spread_after(x) == pytest.approx(threshold, rel=1e-9)
+    assert POOL.spread_after(x * (1 - 1e-6)) < threshold
+    assert POOL.spread_after(x * (1 + 1e-6)) > threshold
+    assert bool(POOL.impact(x)[2])
+
+def test_dump_to_breach_already_breached():
+    pool = DumpImpactModel(reserve_fds=500_000 * E18, reserve_usdt=450_000 * E18, oracle_price=E18)
+    assert pool.spread_pct == pytest.approx(10.0)
+    assert pool.dump_to_breach(10.0) == 0.0
+    assert pool.dump_to_breach(5.0) == 0.0
+
+def test_dump_to_breach_unreachable():
+    # 괴리 100% (가격 0)는 reserveUSDT를 모두 비워야 하므로 도달 불가
+    assert POOL.dump_to_breach(100.0) == float("inf")
+    assert POOL.dump_to_breach(150.0) == float("inf")
+
+def test_impact_underflow_infeasible():
+    # reserveUSDT -= x/2 가 음수가 되는 물량은 revert (가격은 0으로 고정)
+    price, spread, feasible = POOL.impact(np.array([0, 999_999, 1_000_000, 1_000_001]))
+    assert list(feasible) == [True, True, True, False]
+    assert price[0] == pytest.approx(1.0)
+    assert spread[0] == pytest.approx(0.0)
+    assert price[-1] == 0.0
+    assert spread[-1] == pytest.approx(100.0)
+
+def test_spread_after_scalar_and_zero_oracle():
+    assert float(POOL.spread_after(0)) == pytest.approx(0.0)
+    # (500k - 50k) / 600k = 0.75 -> 25%
+    assert float(POOL.spread_after(100_000)) == pytest.approx(25.0)
+    dead = DumpImpactModel(POOL.reserve_fds, POOL.reserve_usdt, 0)
+    assert list(dead.spread_after([0, 100_000])) == [0.0, 0.0]
@@ -0,0 +1,112 @@
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from lib.anomaly import RollingStat, AnomalyDetector
+
+def snap(block_number, total_supply=1_000_000, vault_usdt=1_000_000, spread_pct=0.0):
+    # block_metrics가 읽는 필드만 가진 StateSnapshot 대용
+    return SimpleNamespace(
+        block_number=block_number,
+        total_supply=total_supply * 10 ** 18,
+        vault_usdt=vault_usdt * 10 ** 18,
+        spread_pct=spread_pct,
+    )
+
+# --------------------------------------------------------------------------
+# RollingStat
+# --------------------------------------------------------------------------
+def test_rolling_stat_matches_numpy_after_eviction():
+    rng = np.random.default_rng(7)
+    xs = rng.normal(1_000.0, 50.0, size=200)
+    stat = RollingStat(window=16)
+    for i, x in enumerate(xs):
+        stat.update(x)
+        window = xs[max(0, i - 15):i + 1]
+        assert stat.count == len(window)
+        assert stat.mean == pytest.approx(window.mean(), rel=1e-9)
+        if len(window) >= 2:
+            # 모표준편차 (ddof=0)
+            assert stat.std == pytest.approx(window.std(), rel=1e-6)
+    assert stat.count == 16
+
+def test_rolling_stat_ewma_and_roc():
+    stat = RollingStat(window=4, alpha=0.5)
+    assert stat.update(0.0) is None
+    assert stat.update(10.0) is None  # 직전 값 0 -> 변화율 없음
+    assert stat.update(15.0) == pytest.approx(0.5)
+    # ewma: 0 -> 5 -> 10, ewm_var: 0 -> 0.5*(0+0.5*100)=25 -> 0.5*(25+0.5*100)=37.5
+    assert stat.ewma == pytest.approx(10.0)
+    assert stat.ewm_var == pytest.approx(37.5)
+    assert stat.std == pytest.approx(np.std([0.0, 10.0, 15.0]))
+
+def test_rolling_stat_single_value():
+    stat = RollingStat()
+    stat.update(5.0)
+    assert stat.mean == 5.0
+    assert stat.std == 0.0 and stat.ewm_std == 0.0
+
+# --------------------------------------------------------------------------
+# AnomalyDetector
+# --------------------------------------------------------------------------
+def test_no_alert_during_warmup():
+    det = AnomalyDetector(warmup=8)
+    supply = 1_000_000
+    for b in range(1, 8):
+        # warmup 중에는 큰 발행도 판정하지 않음
+        supply += 1_000_000 if b == 7 else 10
+        assert det.update(snap(b, total_supply=supply)) == []
+    assert not det.summary()["mint_volume"]["ready"]
+
+def test_mint_spike_after_warmup():
+    det = AnomalyDetector(warmup=8)
+    supply = 1_000_000
+    for b in range(1, 20):
+        supply += 10
+        assert det.update(snap(b, total_supply=supply)) == []
+    supply += 500_000
+    anomalies = det.update(snap(20, total_supply=supply))
+    # 발행으로 공급량이 늘어 준비금 비율도 함께 하락
+    assert [a.metric for a in anomalies] == ["mint_volume", "reserve_ratio"]
+    a = anomalies[0]
+    assert a.value == pytest.approx(500_000)
+    assert a.block_number == 20
+    # 임계값은 갱신 전 통계 기준 (min_std가 하한)
+    assert a.threshold == pytest.approx(10 + 4.0 * 1000.0, rel=1e-3)
+
+def test_reserve_ratio_drop_is_downward():
+    det = AnomalyDetector(warmup=4)
+    for b in range(1, 10):
+        det.update(snap(b))
+    anomalies = det.update(snap(10, vault_usdt=500_000))
+    metrics = {a.metric for a in anomalies}
+    assert "reserve_ratio" in metrics and "vault_outflow" in metrics
+
+def test_duplicate_block_ignored():
+    det = AnomalyDetector(warmup=1)
+    for b in range(1, 5):
+        det.update(snap(b))
+    counts = {name: stat.count for name, stat in det.stats.items()}
+    # 같은 블록을 다시 넣으면 통계도 prev도 바뀌지 않음
+    assert det.update(snap(4, total_supply=9_000_000)) == []
+    assert {name: stat.count for name, stat in det.stats.items()} == counts
+    assert det.prev.block_number == 4
+    assert det.update(snap(5)) == []
+
+def test_chain_going_backwards_resets_window():
+    # 노드 재시작 / evm_revert: 이전 높이보다 낮은 블록부터 새 체인으로 다시 학습
+    det = AnomalyDetector(warmup=8)
+    supply = 1_000_000
+    for b in range(100, 140):
+        supply += 10
+        det.update(snap(b, total_supply=supply))
+
+    supply = 1_000_000
+    assert det.update(snap(5, total_supply=supply)) == []
+    assert det.prev.block_number == 5
+    assert all(stat.count == 1 for stat in det.stats.values())
+    for b in range(6, 20):
+        supply += 10
+        assert det.update(snap(b, total_supply=supply)) == []
+    # 예전 높이(139)보다 낮은 블록에서도 탐지
+    anomalies = det.update(snap(20, total_supply=supply * 2))
+    assert "mint_volume" in {a.metric for a in anomalies}
@@ -0,0 +1,114 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from web3 import Web3
+from web3.exceptions import Web3RPCError
+from lib.broadcast import Broadcaster, endpoint_label
+
+RAW_TX = b"\x02\xf8\x70defense"
+TX_HASH = Web3.to_hex(Web3.keccak(RAW_TX))
+
+# --------------------------------------------------------------------------
+# stand-in endpoint: eth_sendRawTransaction에 정해진 응답만 돌려주는 로컬 HTTP 서버
+# --------------------------------------------------------------------------
+def _serve(error=None):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            req = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if error is None:
+                body = {"jsonrpc": "2.0", "id": req["id"], "result": Web3.to_hex(Web3.keccak(hexstr=req["params"][0]))}
+            else:
+                body = {"jsonrpc": "2.0", "id": req["id"], "error": {"code": -32000, "message": error}}
+            data = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+@pytest.fixture
+def endpoints():
+    servers = []
+
+    def make(error=None):
+        server, url = _serve(error)
+        servers.append(server)
+        return url
+
+    yield make
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+# --------------------------------------------------------------------------
+# 테스트
+# --------------------------------------------------------------------------
+def test_first_accept_wins(endpoints):
+    fast, slow = endpoints(), endpoints()
+    with Broadcaster([slow, fast], delays={slow: 0.5}) as b:
+        started = time.perf_counter()
+        result = b.send(RAW_TX)
+        elapsed = time.perf_counter() - started
+
+        assert result.tx_hash == TX_HASH
+        assert result.endpoint == fast
+        assert elapsed < 0.5  # 느린 endpoint 응답을 기다리지 않음
+        assert result.latency <= elapsed
+        assert slow not in result.responses
+        # 늦은 응답도 도착하면 기록됨
+        assert _wait_for(lambda: slow in result.responses)
+        assert result.responses[slow][0] is True
+
+def test_already_known_counts_as_accepted(endpoints):
+    known = endpoints("already known")
+    with Broadcaster([known]) as b:
+        result = b.send(RAW_TX)
+        assert result.endpoint == known
+        assert result.tx_hash == TX_HASH
+        accepted, _, error = result.responses[known]
+        assert accepted and error is None
+        assert b.stats[known] == {"sent": 1, "accepted": 1, "first": 1, "errors": 0}
+
+def test_all_endpoints_failing_raises(endpoints):
+    urls = [endpoints("nonce too low"), endpoints("insufficient funds for gas")]
+    with Broadcaster(urls) as b:
+        with pytest.raises(Web3RPCError) as exc:
+            b.send(RAW_TX)
+        message = str(exc.value)
+        assert "All 2 endpoints rejected" in message
+        assert "nonce too low" in message and "insufficient funds" in message
+        for url in urls:
+            assert b.stats[url] == {"sent": 1, "accepted": 0, "first": 0, "errors": 1}
+
+def test_per_endpoint_stats(endpoints):
+    ok, bad, slow = endpoints(), endpoints("invalid sender"), endpoints()
+    with Broadcaster([ok, bad, slow], delays={slow: 0.3}) as b:
+        for _ in range(3):
+            b.send(RAW_TX)
+        assert _wait_for(lambda: b.stats[slow]["sent"] == 3)
+
+        assert b.stats[ok] == {"sent": 3, "accepted": 3, "first": 3, "errors": 0}
+        assert b.stats[bad] == {"sent": 3, "accepted": 0, "first": 0, "errors": 3}
+        assert b.stats[slow] == {"sent": 3, "accepted": 3, "first": 0, "errors": 0}
+        summary = b.summary()
+        assert set(summary) == {endpoint_label(u) for u in (ok, bad, slow)}
+        assert summary[endpoint_label(ok)]["first"] == 3
+
+def test_needs_an_endpoint():
+    with pytest.raises(ValueError):
+        Broadcaster([])
@@ -0,0 +1,156 @@
+from dataclasses import replace
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from lib.experiment import ExperimentConfig, DEFENSE_ACTIONS
+from lib.gas import GasBidder, AttackGas
+from lib.fastsim import (
+    FastSimulator, ChainState, DEFENSE_GAS_USED, defense_bids,
+    STATUS_UNDETECTED, STATUS_LATE, STATUS_BACKSTOP, STATUS_PRIORITY_WIN, STATUS_PRIORITY_LOSS,
+)
+
+E18 = 10 ** 18
+
+# 배포 직후와 비슷한 상태를 노드 없이 직접 구성
+STATE = ChainState(
+    paused=False,
+    vault_usdt=1_000_000 * E18,
+    oracle_price=E18,
+    period_mint=0,
+    period_end=2_000,
+    mint_limit=500_000 * E18,
+    reserve_fds=500_000 * E18,
+    reserve_usdt=500_000 * E18,
+    deployer_fds=500_000 * E18,
+    hacker_blacklisted=False,
+    timestamp=1_000,
+    gas_price=10 ** 9,
+)
+
+MINT = ExperimentConfig(exp_type="Infinite Mint", fds_threshold=100_000)
+DEPEG = ExperimentConfig(exp_type="Flash Loan Depeg", fds_threshold=5)
+
+def trials(amounts, gas_mult=None):
+    n = len(amounts)
+    return {
+        "Iteration": np.arange(1, n + 1),
+        "gas_mult": np.asarray(gas_mult if gas_mult is not None else [1.0] * n, dtype=float),
+        "delay": np.full(n, 0.1),
+        "amount": np.asarray(amounts, dtype=float),
+    }
+
+def run(state, cfg, amounts, gas_mult=None, mining="auto"):
+    return FastSimulator(state, mining=mining).run(cfg, trials(amounts, gas_mult))
+
+# --------------------------------------------------------------------------
+# Rate limit backstop
+# --------------------------------------------------------------------------
+def test_rate_limit_backstop():
+    out = run(replace(STATE, period_mint=400_000 * E18), MINT, [50_000, 100_000, 150_000])
+
+    # 한도 이내, 임계값 미만 -> 미탐지
+    assert out["Status"][0] == STATUS_UNDETECTED
+    assert not out["Triggered"][0] and not out["Success"][0]
+    assert np.isnan(out["BlockDiff"][0])
+    # 400k + 100k == 한도 -> revert 아님, automine이므로 방어는 다음 블록
+    assert out["Status"][1] == STATUS_LATE
+    assert out["BlockDiff"][1] == 1
+    assert out["DefenseCost_Gas"][1] == DEFENSE_GAS_USED["pause"]
+    # 400k + 150k > 한도 -> run_iteration의 예외 분기와 같은 Backstop 행
+    assert out["Status"][2] == STATUS_BACKSTOP
+    assert out["Triggered"][2] and out["Success"][2]
+    assert out["AttackAmt"][2] == -1.0
+    assert out["BlockDiff"][2] == 0
+    assert out["DefenseCost_Gas"][2] == 0
+
+@pytest.mark.parametrize("timestamp, expected", [
+    (1_998, STATUS_BACKSTOP),  # 다음 블록 1999 <= period_end -> 누적 유지
+    (1_999, STATUS_BACKSTOP),  # 다음 블록 2000 == period_end -> 아직 같은 기간
+    (2_000, STATUS_LATE),  # 다음 블록 2001 > period_end -> 리셋 후 150k만 누적
+])
+def test_period_reset(timestamp, expected):
+    out = run(replace(STATE, period_mint=400_000 * E18, timestamp=timestamp), MINT, [150_000])
+    assert out["Status"][0] == expected
+
+# --------------------------------------------------------------------------
+# 공격 TX가 revert 되는 행 제외
+# --------------------------------------------------------------------------
+@pytest.mark.parametrize("cfg", [MINT, DEPEG])
+@pytest.mark.parametrize("flag", ["paused", "hacker_blacklisted"])
+def test_paused_or_blacklisted_drops_rows(cfg, flag):
+    out = run(replace(STATE, **{flag: True}), cfg, [50_000, 150_000])
+    assert len(out["Iteration"]) == 0
+    assert all(len(col) == 0 for col in out.values())
+
+def test_vault_drain_ignores_pause():
+    # Vault 호출은 pause/blacklist 영향을 받지 않고 잔고를 넘는 금액만 제외
+    cfg = ExperimentConfig(exp_type="Vault Drain", fds_threshold=10)
+    out = run(replace(STATE, paused=True), cfg, [50_000, 2_000_000])
+    assert list(out["Iteration"]) == [1]
+
+def test_depeg_rows_beyond_reserves_dropped():
+    # deployer 잔고 초과 또는 reserveUSDT underflow (x/2 > reserve) -> 행 없음
+    out = run(replace(STATE, deployer_fds=2_000_000 * E18), DEPEG, [10_000, 1_200_000, 600_000])
+    assert list(out["Iteration"]) == [1, 3]
+    # automine: 차입 + 덤프 두 TX 뒤에 방어
+    assert out["Triggered"][1] and out["BlockDiff"][1] == 2
+
+# --------------------------------------------------------------------------
+# interval mining: 같은 블록에서 tip 순서로 승패 (방어 수수료는 GasBidder 입찰)
+# --------------------------------------------------------------------------
+GWEI = 10 ** 9
+LONDON = replace(STATE, base_fee=GWEI, gas_price=2 * GWEI)
+
+def test_interval_outbids_attack_within_budget():
+    gas_mult = [0.8, 1.0, 1.5, 2.0]
+    out = run(LONDON, MINT, [150_000] * 4, gas_mult=gas_mult, mining="interval")
+
+    assert list(out["BlockDiff"]) == [0, 0, 0, 0]
+    # 공격 tip x 1.125 + 1 -> 예산(500 Gwei) 안에서는 항상 먼저 포함
+    assert set(out["Status"]) == {STATUS_PRIORITY_WIN}
+    attack_tip = np.asarray(out["GasPrice_Gwei"]) * GWEI - GWEI
+    expected = (GWEI + np.floor(attack_tip * 1.125) + 1) / GWEI
+    assert np.allclose(out["DefenseGasPrice_Gwei"], expected)
+
+def test_interval_budget_cap_loses_priority():
+    # 예산 3 Gwei: max fee 3, tip 최대 2 Gwei (base 1)
+    cfg = replace(MINT, gas_budget_gwei=3)
+    out = run(LONDON, cfg, [150_000] * 3, gas_mult=[1.0, 1.5, 2.0], mining="interval")
+
+    # 공격 tip 1 -> 방어 1.125 (승리) / 공격 tip 2 -> 방어도 2 (같으면 먼저 도착한 공격 TX) / 공격 tip 3 -> 패배
+    assert list(out["Status"]) == [STATUS_PRIORITY_WIN, STATUS_PRIORITY_LOSS, STATUS_PRIORITY_LOSS]
+    assert list(out["Success"]) == [True, False, False]
+    assert list(out["DefenseGasPrice_Gwei"][1:]) == [3.0, 3.0]
+    assert out["GasPrice_Gwei"][2] == pytest.approx(4.0)
+
+def test_budget_below_base_fee_drops_defended_rows():
+    # 방어 TX를 보내지 않음 (run_iteration은 BudgetBelowBaseFee -> 행 없음), 미탐지 행과 backstop 행은 유지
+    cfg = replace(MINT, gas_budget_gwei=0.5)
+    state = replace(LONDON, period_mint=400_000 * E18)
+    out = run(state, cfg, [50_000, 100_000, 150_000], mining="interval")
+    assert list(out["Iteration"]) == [1, 3]
+    assert list(out["Status"]) == [STATUS_UNDETECTED, STATUS_BACKSTOP]
+
+@pytest.mark.parametrize("state", [STATE, LONDON], ids=["legacy", "eip1559"])
+@pytest.mark.parametrize("budget_gwei", [500.0, 2.5, 1.2])
+def test_defense_bids_match_gas_bidder(state, budget_gwei):
+    w3 = SimpleNamespace(eth=SimpleNamespace(
+        get_block=lambda _: {"baseFeePerGas": state.base_fee}, gas_price=state.gas_price))
+    bidder = GasBidder(w3)
+    prices = np.floor(state.gas_price * np.linspace(0.5, 2.5, 41))
+    attack_tip, tip, price, below_base = defense_bids(state, prices, budget_gwei)
+    for k, p in enumerate(prices):
+        bid = bidder.bid(AttackGas(gas_price=int(p)), budget_gwei)
+        assert (tip[k], price[k], below_base[k]) == (bid.tip, bid.price, bid.below_base)
+        assert attack_tip[k] == AttackGas(gas_price=int(p)).tip(bid.base_fee)
+
+def test_interval_untriggered_rows_keep_nan_block_diff():
+    out = run(STATE, MINT, [50_000], gas_mult=[1.0], mining="interval")
+    assert out["Status"][0] == STATUS_UNDETECTED
+    assert np.isnan(out["BlockDiff"][0])
+    assert out["DefenseCost_Gas"][0] == 0
+
+def test_wallet_freeze_uses_blacklist_gas():
+    cfg = replace(MINT, defense_action=DEFENSE_ACTIONS[1])  # Wallet Freeze
+    out = run(STATE, cfg, [150_000])
+    assert out["DefenseCost_Gas"][0] == DEFENSE_GAS_USED["blacklist"]
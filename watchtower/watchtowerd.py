@@ -0,0 +1,71 @@
+"""
+상시 실행 Watchtower daemon (Streamlit 페이지와 분리된 탐지/방어 프로세스)
+
+- watchtower 키로 방어 TX를 보내는 유일한 프로세스 (중복 실행 시 바로 종료)
+- 상태/알림/방어 기록은 data/watchtower.sqlite 에 기록하고 페이지는 이를 읽기만 한다
+
+사용 예:
+    python watchtower/watchtowerd.py
+    python watchtower/watchtowerd.py --rpc http://127.0.0.1:8545 --no-auto-defense
+    python watchtower/watchtowerd.py --broadcast http://10.0.0.2:8545 --broadcast http://10.0.0.3:8545
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+from web3 import Web3
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from lib.utils import RPC_URL, WATCHTOWER_DIR, WATCHTOWER_PK, read_abis, build_contracts
+from lib.latency import instrument
+from lib.subscription import WS_URL
+from lib.statestore import StateStore, DEFAULT_DB_PATH
+from lib.daemon import Watchtower, SingleInstanceLock, DEPEG_THRESHOLD
+from lib.gas import GAS_BUDGET_GWEI
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="FDS watchtower daemon")
+    parser.add_argument("--rpc", default=RPC_URL, help=f"Node RPC URL (default {RPC_URL})")
+    parser.add_argument("--ws", default=WS_URL, help=f"Node WebSocket URL (default {WS_URL})")
+    parser.add_argument("--addresses", default=os.path.join(WATCHTOWER_DIR, "addresses.json"), help="Contract address file")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help=f"Shared state store (default {DEFAULT_DB_PATH})")
+    parser.add_argument("--depeg-threshold", type=float, default=DEPEG_THRESHOLD, help="Spread %% that triggers a pause")
+    parser.add_argument("--broadcast", action="append", default=[], metavar="URL",
+                        help="Extra RPC endpoint for defense TXs (repeatable, sent concurrently with --rpc)")
+    parser.add_argument("--no-relayers", action="store_true", help="Submit defense TXs from the watchtower account only")
+    parser.add_argument("--gas-budget-gwei", type=float, default=GAS_BUDGET_GWEI,
+                        help=f"Max fee per gas a defense TX may bid when outbidding an attack (default {GAS_BUDGET_GWEI:g})")
+    parser.add_argument("--no-auto-defense", action="store_true", help="Detect and record only (pages can turn it on)")
+    args = parser.parse_args(argv)
+
+    lock = SingleInstanceLock(args.db + ".lock")
+    if not lock.acquire():
+        print(f"watchtowerd is already running ({args.db}.lock)")
+        sys.exit(1)
+
+    w3 = instrument(Web3(Web3.HTTPProvider(args.rpc)))
+    with open(args.addresses) as f:
+        contracts = build_contracts(w3, json.load(f), read_abis())
+
+    tower = Watchtower(
+        w3, contracts, WATCHTOWER_PK, StateStore(args.db),
+        auto_defense=not args.no_auto_defense, depeg_threshold=args.depeg_threshold, ws_url=args.ws,
+        broadcast_urls=[args.rpc] + args.broadcast if args.broadcast else None, use_relayers=not args.no_relayers,
+        gas_budget_gwei=args.gas_budget_gwei,
+    )
+    signal.signal(signal.SIGTERM, signal.default_int_handler)  # kill -> KeyboardInterrupt -> 정리 후 종료
+    tower.start()
+    print(f"watchtowerd: watching {args.rpc} as {tower.engine.account.address} "
+          f"(auto defense {'on' if tower.auto_defense else 'off'}, store {args.db})")
+    try:
+        tower.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        tower.stop()
+        lock.release()
+
+if __name__ == "__main__":
+    main()